@@ -10,6 +10,8 @@ import openeo
 from openeo.api.process import Parameter
 from openeo.rest.udp import build_process_dict
 
+from esa_apex_toolbox.offline import OfflineConnection
+
 
 # TODO investigate setting max cloud cover and kernel size as parameters as well
 def generate() -> dict:
@@ -22,9 +24,7 @@ def generate() -> dict:
     temporal_extent = Parameter.temporal_interval(default=["2023-05-01", "2023-09-30"])
 
     # load the input data
-    conn = openeo.connect(
-        "openeofed.dataspace.copernicus.eu"
-    ).authenticate_oidc()
+    conn = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
     s2_cube = conn.load_collection(
         collection_id="SENTINEL2_L2A",
@@ -55,8 +55,11 @@ def generate() -> dict:
     s2_cube = s2_cube.reduce_dimension(dimension="t", reducer="median")
 
     # Run ML inference to get the classification output
-    udf = openeo.UDF.from_file(
-        Path(__file__).parent / "udf_eurac_pvfarm_onnx.py",
+    # (with the shared ONNX session helpers prepended to the UDF code)
+    onnx_session_helpers = Path(__file__).parents[4] / "utils" / "udf_helpers" / "onnx_session.py"
+    udf = openeo.UDF(
+        code=onnx_session_helpers.read_text() + "\n" + (Path(__file__).parent / "udf_eurac_pvfarm_onnx.py").read_text(),
+        runtime="Python",
         version="3.8",
     )
 
@@ -10,29 +10,47 @@ sys.path.append("onnx_deps")
 sys.path.append("onnx_models") 
 import onnxruntime as ort
 
+try:
+    # Shared ONNX session helpers: prepended to this UDF by generate.py, importable for local development
+    from onnx_session import OnnxSessionSettings, create_onnx_session
+except ImportError:
+    pass
+
+# Value given to nan pixels before inference
+NAN_FILL_VALUE = -999999
+# Number of pixels per inference block (context key "inference_block_pixels")
+DEFAULT_BLOCK_PIXELS = 256 * 256
+# Label of the nodata pixels skipped with the "skip_nodata" context option (context key "nodata_label")
+DEFAULT_NODATA_LABEL = 0
 
 
 @functools.lru_cache(maxsize=1)
-def load_onnx_model(model_name: str) -> ort.InferenceSession:
+def load_onnx_model(model_name: str, settings: OnnxSessionSettings) -> ort.InferenceSession:
     """
-    Loads an ONNX model from the onnx_models folder and returns an ONNX runtime session.
-
+    Loads an ONNX model from the onnx_models folder and returns an ONNX runtime session,
+    configured with the given session settings (threads, graph optimization, memory arena, ...).
     """
     # The onnx_models folder contains the content of the model archive provided in the job options
-    return ort.InferenceSession(f"onnx_models/{model_name}")
+    return create_onnx_session(f"onnx_models/{model_name}", settings)
 
-def preprocess_input(
-    input_xr: xr.DataArray, ort_session: ort.InferenceSession
-) -> tuple:
+def preprocess_block(block: np.ndarray, n_features: int, skip_nodata: bool = False) -> tuple:
     """
-    Preprocess the input DataArray by ensuring the dimensions are in the correct order,
-    reshaping it, and returning the reshaped numpy array and the original shape.
+    Preprocess a block of rows of the (y, x, bands) input by reshaping it to a (pixels, bands)
+    float32 array and filling the nan values. Only the block is copied, never the full chunk.
+
+    With `skip_nodata`, the nodata pixels (nan in all bands, e.g. masked clouds) are left out,
+    and the boolean mask of the kept pixels is returned as well (None otherwise).
     """
-    input_xr = input_xr.transpose("y", "x", "bands")
-    input_shape = input_xr.shape
-    input_np = input_xr.values.reshape(-1, ort_session.get_inputs()[0].shape[1])
-    input_np = input_np.astype(np.float32)
-    return input_np, input_shape
+    pixels = block.reshape(-1, n_features)
+    if skip_nodata:
+        valid = ~np.isnan(pixels).all(axis=1)
+        # Boolean indexing already returns a (compact) copy
+        input_np = pixels[valid].astype(np.float32, copy=False)
+    else:
+        valid = None
+        input_np = pixels.astype(np.float32)
+    input_np[np.isnan(input_np)] = NAN_FILL_VALUE
+    return input_np, valid
 
 
 def run_inference(input_np: np.ndarray, ort_session: ort.InferenceSession) -> tuple:
@@ -45,15 +63,6 @@ def run_inference(input_np: np.ndarray, ort_session: ort.InferenceSession) -> tu
     return predicted_labels
 
 
-def postprocess_output(predicted_labels: np.ndarray, input_shape: tuple) -> tuple:
-    """
-    Postprocess the output by reshaping the predicted labels and probabilities into the original spatial structure.
-    """
-    predicted_labels = predicted_labels.reshape(input_shape[0], input_shape[1])
-
-    return predicted_labels
-
-
 def create_output_xarray(
     predicted_labels: np.ndarray, input_xr: xr.DataArray
 ) -> xr.DataArray:
@@ -68,29 +77,51 @@ def create_output_xarray(
     )
 
 
-def apply_model(input_xr: xr.DataArray) -> xr.DataArray:
+def apply_model(
+    input_xr: xr.DataArray,
+    settings: OnnxSessionSettings,
+    block_pixels: int = DEFAULT_BLOCK_PIXELS,
+    skip_nodata: bool = False,
+    nodata_label: int = DEFAULT_NODATA_LABEL,
+) -> xr.DataArray:
     """
     Run inference on the given input data using the provided ONNX runtime session.
-    This method is called for each timestep in the chunk received by apply_datacube.
+    The pixels are streamed through the model in blocks of rows of about `block_pixels` pixels,
+    so peak memory does not depend on the chunk size.
+
+    With `skip_nodata`, only the valid pixels are passed to the model: the nodata pixels
+    get `nodata_label`, so the inference cost scales with the number of valid pixels.
     """
 
     # Step 1: Load the ONNX model
     inspect(message="load onnx model")
-    ort_session = load_onnx_model("rf_1_median_depth_15.onnx")
-
-    # Step 2: Preprocess the input
-    inspect(message="preprocess input")
-    input_np, input_shape = preprocess_input(input_xr, ort_session)
+    ort_session = load_onnx_model("rf_1_median_depth_15.onnx", settings)
+    n_features = ort_session.get_inputs()[0].shape[1]
 
-    # Step 3: Perform inference
+    # Step 2: Preprocess, run inference and store the predictions block per block
     inspect(message="run model inference")
-    predicted_labels = run_inference(input_np, ort_session)
-
-    # Step 4: Postprocess the output
-    inspect(message="post process output")
-    predicted_labels = postprocess_output(predicted_labels, input_shape)
-
-    # Step 5: Create the output xarray
+    # Transposing returns a view: no copy of the chunk
+    input_np = input_xr.transpose("y", "x", "bands").values
+    n_rows, n_cols = input_np.shape[:2]
+    block_rows = max(1, block_pixels // max(1, n_cols))
+    predicted_labels = None
+    for row in range(0, n_rows, block_rows):
+        block_np, valid = preprocess_block(input_np[row : row + block_rows], n_features, skip_nodata=skip_nodata)
+        if len(block_np) == 0:
+            continue
+        block_labels = run_inference(block_np, ort_session)
+        if predicted_labels is None:
+            predicted_labels = np.full((n_rows, n_cols), nodata_label, dtype=block_labels.dtype)
+        if valid is None:
+            predicted_labels[row : row + block_rows] = block_labels.reshape(-1, n_cols)
+        else:
+            # Scatter the predictions back to the valid pixels (reshape of the row slice is a view)
+            predicted_labels[row : row + block_rows].reshape(-1)[valid] = block_labels.reshape(-1)
+    if predicted_labels is None:
+        # No valid pixels at all in this chunk
+        predicted_labels = np.full((n_rows, n_cols), nodata_label)
+
+    # Step 3: Create the output xarray
     inspect(message="create output xarray")
     return create_output_xarray(predicted_labels, input_xr)
 
@@ -100,10 +131,14 @@ def apply_datacube(cube: xr.DataArray, context: Dict) -> xr.DataArray:
     Function that is called for each chunk of data that is processed.
     The function name and arguments are defined by the UDF API.
     """
-    # Define how you want to handle nan values
-    cube = cube.fillna(-999999)
-
-    # Apply the model for each timestep in the chunk
-    output_data = apply_model(cube)
+    # Nan values are filled with NAN_FILL_VALUE per block in `preprocess_block`
+    output_data = apply_model(
+        cube,
+        # 0 threads: keep the onnxruntime default threading (all cores) of this UDF
+        settings=OnnxSessionSettings.from_context(context, intra_op_num_threads=0, inter_op_num_threads=0),
+        block_pixels=int((context or {}).get("inference_block_pixels", DEFAULT_BLOCK_PIXELS)),
+        skip_nodata=bool((context or {}).get("skip_nodata", False)),
+        nodata_label=(context or {}).get("nodata_label", DEFAULT_NODATA_LABEL),
+    )
 
     return output_data
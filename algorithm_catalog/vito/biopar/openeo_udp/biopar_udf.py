@@ -1,51 +1,77 @@
+"""
+Import the biopar library and the BioParNp class to calculate biophysical parameters.
+It is the Python implementation of biophysical parameter computation,
+as described here: http://step.esa.int/docs/extra/ATBD_S2ToolBox_L2B_V1.1.pdf
+
+The "biopar_type" context entry selects the parameter(s):
+- a single name (e.g. "FAPAR") returns the parameter without "bands" dimension (to reduce the bands),
+- a list of names (e.g. ["FAPAR", "LAI", "FCOVER"]) returns all of them along the "bands" dimension
+  (to use with `apply_dimension`): the bands are only loaded and preprocessed once.
+With the "output_bands" context entry set, a single name is also returned along the "bands" dimension,
+so `apply_dimension` can be used whether the name or list comes from a UDP parameter.
+"""
 from functools import lru_cache
 import numpy as np
 from typing import Dict
+from openeo.metadata import CollectionMetadata
 from openeo.udf.xarraydatacube import XarrayDataCube
 from openeo.udf.debug import inspect
 from biopar.bioparnp import BioParNp
 
+try:
+    # Shared BioPAR input helpers: prepended to this UDF by generate.py, importable for local development
+    from biopar_inputs import get_biopar_inputs, to_biopar_array
+except ImportError:
+    pass
+
+VALID_BIOPARS = ['FAPAR', 'LAI', 'FCOVER', 'CWC', 'CCC']
+
+
 @lru_cache(maxsize=6)
 def get_bioparrun(biopar) -> BioParNp:
     return BioParNp(version='3band', parameter=biopar, singleConfig = True)
-    
+
+
+def get_biopar_types(context: Dict) -> list:
+    """Validated, deduplicated list of the requested biopar types (invalid types default to FAPAR)."""
+    requested = context.get('biopar_type', 'FAPAR')
+    biopars = []
+    for biopar in [requested] if isinstance(requested, str) else requested:
+        if biopar not in VALID_BIOPARS:
+            inspect(biopar, "is not in valid Biopar list, defaulting to FAPAR")
+            biopar = 'FAPAR'
+        if biopar not in biopars:
+            biopars.append(biopar)
+    return biopars
+
+
+def has_output_bands(context: Dict) -> bool:
+    """Whether the biopar(s) are returned along the "bands" dimension (instead of reducing the bands)."""
+    return bool(context.get('output_bands')) or not isinstance(context.get('biopar_type', 'FAPAR'), str)
+
+
+def apply_metadata(metadata: CollectionMetadata, context: Dict) -> CollectionMetadata:
+    if not has_output_bands(context):
+        return metadata
+    return metadata.rename_labels(dimension="bands", target=get_biopar_types(context))
+
+
 def apply_datacube(cube: XarrayDataCube, context: Dict) -> XarrayDataCube:
-    valid_biopars= ['FAPAR','LAI','FCOVER','CWC','CCC']
-    biopar = context.get('biopar_type', 'FAPAR') 
-    if biopar not in valid_biopars:
-        biopar = 'FAPAR'
-        inspect(biopar, "is not in valid Biopar list, defaulting to FAPAR") 
-    
+    biopars = get_biopar_types(context)
     inarr = cube.get_array()
-    ds_date = inarr
-    
-    from numpy import cos, radians
-    scaling_bands = 0.0001
-
-    saa = ds_date.sel(bands='sunAzimuthAngles')
-    sza = ds_date.sel(bands='sunZenithAngles')
-    vaa = ds_date.sel(bands='viewAzimuthMean')
-    vza = ds_date.sel(bands='viewZenithMean')
-    
-    B03 = ds_date.sel(bands='B03') * scaling_bands
-    B04 = ds_date.sel(bands='B04') * scaling_bands
-    B8 = ds_date.sel(bands='B08') * scaling_bands
-    g1 = cos(radians(vza))
-    g2 = cos(radians(sza))
-    g3 = cos(radians(saa - vaa))
-    #### FLATTEN THE ARRAY ####
-    flat = list(map(lambda arr: arr.flatten(), [B03.values, B04.values,B8.values, g1.values, g2.values, g3.values]))
-    bands = np.array(flat)
+
+    #### SCALED BANDS AND GEOMETRY COSINES, IN ONE (6, N) FLOAT32 ARRAY ####
+    bands, nodata = get_biopar_inputs(inarr)
 
     # inspect the parameter passed
-    inspect(biopar, "biopar parameter passed to the UDF") 
+    inspect(biopars, "biopar parameter(s) passed to the UDF")
+
+    #### CALCULATE THE BIOPARS BASED ON THE SAME BANDS #####
+    images = np.empty((len(biopars), bands.shape[1]), dtype=np.float32)
+    for image, biopar in zip(images, biopars):
+        image[:] = get_bioparrun(biopar).run(bands, output_scale=1, output_dtype=np.float32, minmax_flagging=False)  # netcdf algorithm
 
-    #### CALCULATE THE BIOPAR BASED ON THE BANDS #####
-    image = get_bioparrun(biopar).run(bands, output_scale=1,output_dtype=np.float32,minmax_flagging=False)  # netcdf algorithm
-    as_image = image.reshape((g1.shape))
     ## set nodata to nan
-    as_image[np.where(np.isnan(B03))] = np.nan
-    xr_biopar = vza.copy()
-    xr_biopar.values = as_image
-    
-    return XarrayDataCube(xr_biopar)  # xarray.DataArray(as_image,vza.dims,vza.coords)'''
\ No newline at end of file
+    if not has_output_bands(context):
+        return XarrayDataCube(to_biopar_array(images[0], nodata, inarr))
+    return XarrayDataCube(to_biopar_array(images, nodata, inarr, labels=biopars))
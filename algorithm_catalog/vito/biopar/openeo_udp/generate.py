@@ -5,8 +5,10 @@ import openeo
 from openeo.api.process import Parameter
 from openeo.rest.udp import build_process_dict
 
+from esa_apex_toolbox.offline import OfflineConnection
+
 def generate():
-    connection = openeo.connect("openeofed.dataspace.copernicus.eu").authenticate_oidc()
+    connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
     spatial_extent = Parameter.spatial_extent(
         name="spatial_extent", 
@@ -17,11 +19,15 @@ def generate():
         name="temporal_extent", 
         description="Temporal extent specified as two-element array with start and end date/date-time."
         )
-    biopar_type = Parameter.string(
+    biopar_types = ["FAPAR", "LAI", "FCOVER", "CCC", "CWC"]
+    biopar_type = Parameter(
         name="biopar_type",
-        description="BIOPAR type [FAPAR,LAI,FCOVER,CCC,CWC]",
+        description="BIOPAR type [FAPAR,LAI,FCOVER,CCC,CWC], or a list of BIOPAR types to calculate in one go (one band per type)",
+        schema=[
+            {"type": "string", "enum": biopar_types},
+            {"type": "array", "minItems": 1, "items": {"type": "string", "enum": biopar_types}},
+        ],
         default="FAPAR",
-        values=["FAPAR", "LAI", "FCOVER", "CCC", "CWC"],
     )
 
     cube = connection.load_collection(
@@ -48,18 +54,20 @@ def generate():
     mask = scl.process("to_scl_dilation_mask", data=scl)
     cube = cube.mask(mask)
 
-    udf = openeo.UDF.from_file(
-        Path(__file__).parent / "biopar_udf.py",
+    # (with the shared BioPAR input helpers prepended to the UDF code)
+    biopar_helpers = Path(__file__).parents[4] / "utils" / "udf_helpers" / "biopar_inputs.py"
+    udf = openeo.UDF(
+        code=biopar_helpers.read_text() + "\n" + (Path(__file__).parent / "biopar_udf.py").read_text(),
         runtime="Python",
-        context={"biopar_type": {"from_parameter": "biopar_type"}},
+        # One output band per BIOPAR type, labeled with the type (see `apply_metadata` of the UDF)
+        context={"biopar_type": {"from_parameter": "biopar_type"}, "output_bands": True},
     )
     # print(udf)
-    biopar = cube.reduce_dimension(
+    biopar = cube.apply_dimension(
         dimension="bands",
-        reducer=udf,
+        process=udf,
     )
-    biopar = biopar.add_dimension("bands", label=biopar_type, type="bands")
-    
+
 
     return build_process_dict(
         process_graph=biopar,
@@ -0,0 +1,82 @@
+"""
+Local benchmark of the MOGPR UDF (`fusets.openeo.mogpr_udf`) for different `chunk_size` values.
+
+Runs the UDF on synthetic S2 + S1 (NDVI, RVI) time series cubes of `size` x `size` pixels,
+i.e. one `apply_neighborhood` chunk, and reports the wall time per pixel and the number of
+UDF invocations needed for a 100 km x 100 km (10 m) tile, to pick the chunk size by measurement.
+
+Requires the `fusets` package (and its dependencies) to be installed locally.
+
+Usage (from this folder):
+
+    python benchmark_mogpr.py [--sizes 8 16 32] [--days 365] [--revisit 5] [--cloud-fraction 0.5]
+        [--repeat 1] [--skip-warmup]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import xarray
+from openeo.udf import XarrayDataCube
+
+from fusets.openeo.mogpr_udf import apply_datacube
+
+# Number of 10 m pixels along the side of a Sentinel-2 MGRS tile (the maximum extent of the service)
+TILE_PIXELS = 10980
+
+
+def synthetic_cube(size: int, days: int, revisit: int, cloud_fraction: float, seed: int = 42) -> xarray.DataArray:
+    """
+    Synthetic (t, bands, y, x) cube with a seasonal NDVI profile (with cloud gaps)
+    and a correlated, noisy (but gap-free) RVI profile per pixel.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=days // revisit, freq=f"{revisit}D")
+    phase = 2 * np.pi * np.arange(len(dates)) / len(dates)
+    amplitude = rng.uniform(0.2, 0.4, size=(size, size))
+    season = np.sin(phase - np.pi / 2)[:, None, None]
+
+    ndvi = 0.5 + amplitude * season + rng.normal(0, 0.02, size=(len(dates), size, size))
+    rvi = 0.4 + 0.8 * amplitude * season + rng.normal(0, 0.05, size=(len(dates), size, size))
+    ndvi[rng.uniform(size=ndvi.shape) < cloud_fraction] = np.nan
+
+    return xarray.DataArray(
+        np.stack([ndvi, rvi], axis=1).astype(np.float32),
+        dims=["t", "bands", "y", "x"],
+        coords={"t": dates, "bands": ["NDVI", "RVI"], "y": np.arange(size), "x": np.arange(size)},
+    )
+
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32], help="Chunk sizes (pixels) to benchmark.")
+    cli.add_argument("--days", type=int, default=365, help="Length of the time series.")
+    cli.add_argument("--revisit", type=int, default=5, help="Days between the observations.")
+    cli.add_argument("--cloud-fraction", type=float, default=0.5, help="Fraction of missing NDVI observations.")
+    cli.add_argument("--repeat", type=int, default=1, help="Number of runs per chunk size (best time is reported).")
+    cli.add_argument("--skip-warmup", action="store_true", help="Include the one-off import/setup cost.")
+    args = cli.parse_args()
+
+    if not args.skip_warmup:
+        # The first invocation imports fusets and writes the GPy config: a one-off cost per worker
+        apply_datacube(XarrayDataCube(synthetic_cube(1, args.days, args.revisit, args.cloud_fraction)), {})
+
+    for size in args.sizes:
+        cube = XarrayDataCube(synthetic_cube(size, args.days, args.revisit, args.cloud_fraction))
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            apply_datacube(cube, {})
+            timings.append(time.perf_counter() - start)
+        chunk_time = min(timings)
+        invocations = int(np.ceil(TILE_PIXELS / size)) ** 2
+        print(
+            f"chunk {size}x{size} px, {cube.get_array().sizes['t']} dates: {chunk_time:.3f}s per chunk, "
+            f"{chunk_time / size ** 2 * 1000:.2f}ms per pixel, {invocations} UDF invocations per tile"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,25 @@ import json
 from pathlib import Path
 from typing import Union, Sequence
 
-import openeo
 from openeo.api.process import Parameter
 from openeo.processes import ProcessBuilder, apply_neighborhood
 from openeo.rest.udp import build_process_dict
 
+from esa_apex_toolbox.offline import OfflineConnection
+
 from fusets.openeo import load_mogpr_udf
 
 from helpers import load_s1_collection, load_s2_collection
 
 
-connection = openeo.connect("openeofed.dataspace.copernicus.eu")
+connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
 def get_mogpr_s1_s2(
         polygon: Union[Parameter, dict] = None,
         date: Union[Sequence[str], Parameter] = None,
         s1_collection: Union[str, Parameter] = None,
         s2_collection: Union[str, Parameter] = None,
+        chunk_size: Union[int, Parameter] = 32,
 ) -> ProcessBuilder:
     s1_input_cube = load_s1_collection(connection, s1_collection, polygon, date)
     s2_input_cube = load_s2_collection(connection, s2_collection, polygon, date)
@@ -29,8 +31,8 @@ def get_mogpr_s1_s2(
     return apply_neighborhood(merged_cube,
                               lambda data: data.run_udf(udf=Path("set_path.py").read_text()+"\n"+load_mogpr_udf(), runtime='Python', version="3.8", context=dict()),
                               size=[
-                                  {'dimension': 'x', 'value': 32, 'unit': 'px'},
-                                  {'dimension': 'y', 'value': 32, 'unit': 'px'}
+                                  {'dimension': 'x', 'value': chunk_size, 'unit': 'px'},
+                                  {'dimension': 'y', 'value': chunk_size, 'unit': 'px'}
                               ], overlap=[])
 
 
@@ -57,13 +59,19 @@ def generate() -> dict:
         default='NDVI', 
         values=['NDVI', 'FAPAR', 'LAI', 'FCOVER', 'EVI', 'CCC', 'CWC']
     )
+    chunk_size = Parameter.integer(
+        name="chunk_size",
+        description="Size (in pixels) of the square chunks on which the MOGPR UDF is applied. Larger chunks mean fewer UDF invocations, see `benchmark_mogpr.py` to measure the processing time per pixel for different chunk sizes.",
+        default=32
+    )
 
 
     mogpr = get_mogpr_s1_s2(
         polygon=polygon,
         date=date,
         s1_collection=s1_collection,
-        s2_collection=s2_collection
+        s2_collection=s2_collection,
+        chunk_size=chunk_size
     )
 
     return build_process_dict(
@@ -75,7 +83,8 @@ def generate() -> dict:
             polygon,
             date,
             s1_collection,
-            s2_collection
+            s2_collection,
+            chunk_size
         ],
     )
 
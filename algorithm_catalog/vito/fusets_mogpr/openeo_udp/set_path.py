@@ -1,50 +1,75 @@
 #%%
 
+import fcntl
+import hashlib
 import os
+import shutil
 import sys
+import tempfile
+import time
 import zipfile
 import requests
-import tempfile
-import shutil
-import functools
 
 from openeo.udf import inspect
 
-def download_file(url, path):
+# Root directory of the extracted dependencies, shared by all UDF invocations on the same executor
+DEPENDENCIES_CACHE_DIR = os.path.join(tempfile.gettempdir(), "udf_dependencies")
+# How long (in seconds) the checksum announced by the server for an archive is reused before asking again
+REMOTE_CHECKSUM_MAX_AGE = 60 * 60
+
+FUSETS_DEPENDENCIES_URL = "https://artifactory.vgt.vito.be:443/artifactory/auxdata-public/ai4food/fusets_venv.zip"
+
+
+def get_cache_dir(dependencies_url, sha256=None):
     """
-    Downloads a file from the given URL to the specified path.
+    Content-addressed cache directory for the dependencies: keyed on the archive checksum,
+    or on the URL if no checksum is given.
     """
-    response = requests.get(url, stream=True)
-    with open(path, "wb") as file:
-        file.write(response.content)
+    key = sha256.lower() if sha256 else hashlib.sha256(dependencies_url.encode("utf8")).hexdigest()
+    return os.path.join(DEPENDENCIES_CACHE_DIR, key[:32])
+
 
-def extract_zip_to_temp(zip_path, temp_dir):
+def get_remote_sha256(url):
     """
-    Extracts a zip file into the given temporary directory.
+    SHA-256 checksum of the remote file as announced by the server (Artifactory sends it in the
+    "X-Checksum-Sha256" header), remembered on disk for REMOTE_CHECKSUM_MAX_AGE seconds,
+    so later UDF invocations do not have to ask again. None if the server does not announce one.
     """
-    with zipfile.ZipFile(zip_path, "r") as zip_ref:
-        zip_ref.extractall(temp_dir)  # Use the existing temp_dir
-    return temp_dir
-
-def move_top_level_folder_to_destination(temp_dir, destination_dir):
+    path = get_cache_dir(url) + ".sha256"
+    try:
+        if time.time() - os.path.getmtime(path) < REMOTE_CHECKSUM_MAX_AGE:
+            with open(path) as file:
+                return file.read().strip() or None
+    except OSError:
+        pass
+    try:
+        with requests.head(url, allow_redirects=True, timeout=60) as response:
+            response.raise_for_status()
+            sha256 = response.headers.get("X-Checksum-Sha256")
+    except requests.RequestException as e:
+        inspect(message=f"Failed to get the checksum of {url}: {e!r}")
+        return None
+    os.makedirs(DEPENDENCIES_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(sha256 or "")
+    os.replace(temp_path, path)
+    return sha256
+
+
+def download_file(url, path, sha256=None):
     """
-    Moves each top-level folder from the temporary directory to the destination directory.
-    Throws an error if the folder already exists at the destination.
+    Streams a file from the given URL to the specified path, and verifies its SHA-256 checksum (if given).
     """
-    # Find the top-level folders inside the extracted zip
-    for item in os.listdir(temp_dir):
-        item_path = os.path.join(temp_dir, item)
-        
-        if os.path.isdir(item_path):
-            # Check if the folder already exists at destination
-            dest_path = os.path.join(destination_dir, item)
-
-            if os.path.exists(dest_path):
-                # Throw an error if the folder already exists
-                raise FileExistsError(f"Error: The folder '{item}' already exists in the destination directory: {dest_path}")
-
-            # Move the folder out of temp and into the destination directory
-            shutil.move(item_path, dest_path)
+    digest = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                file.write(chunk)
+                digest.update(chunk)
+    if sha256 and digest.hexdigest() != sha256.lower():
+        raise ValueError(f"Checksum mismatch for {url}: expected {sha256}, got {digest.hexdigest()}")
 
 
 def add_to_sys_path(folder_path):
@@ -55,28 +80,39 @@ def add_to_sys_path(folder_path):
         sys.path.append(folder_path)
 
 
-@functools.lru_cache(maxsize=5)
-def setup_dependencies(dependencies_url):
-    """
-    Main function to download, unzip, move the top-level folder, and add it to sys.path.
+def setup_dependencies(dependencies_url, sha256=None):
     """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Step 1: Download the zip file
-        zip_path = os.path.join(temp_dir, "temp.zip")
-        download_file(dependencies_url, zip_path)
+    Make the (top-level folders of the) dependencies archive importable.
 
-        inspect(message="Extract dependencies to temp")
-        # Step 2: Extract the zip file to the temporary directory
-        extracted_dir = extract_zip_to_temp(zip_path, temp_dir) 
+    The archive is only downloaded and extracted once per executor: a file lock makes concurrent
+    workers wait for the first one, and later UDF invocations just add the cached folder to sys.path.
 
-        # Step 3: Move the first top-level folder (dynamically) to the destination
-        destination_dir = os.getcwd()  # Current working directory
-        inspect(message="Move top-level folder to destination")
-        moved_folder = move_top_level_folder_to_destination(extracted_dir, destination_dir)
-
-        # Step 4: Add the folder to sys.path
-        add_to_sys_path(moved_folder)
-        inspect(message="Added to the sys path") 
-
-
-setup_dependencies("https://artifactory.vgt.vito.be:443/artifactory/auxdata-public/ai4food/fusets_venv.zip")
\ No newline at end of file
+    The archive is verified against the given SHA-256 checksum or, if not given, against the checksum
+    announced by the server. The cache is keyed on that checksum, so a changed archive at the same URL
+    is downloaded again.
+    """
+    sha256 = sha256 or get_remote_sha256(dependencies_url)
+    cache_dir = get_cache_dir(dependencies_url, sha256)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(DEPENDENCIES_CACHE_DIR, exist_ok=True)
+        with open(cache_dir + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have finished the extraction while waiting for the lock
+            if not os.path.isdir(cache_dir):
+                inspect(message="Download and extract dependencies")
+                temp_dir = tempfile.mkdtemp(dir=DEPENDENCIES_CACHE_DIR)
+                try:
+                    zip_path = os.path.join(temp_dir, "dependencies.zip")
+                    download_file(dependencies_url, zip_path, sha256)
+                    extracted_dir = os.path.join(temp_dir, "extracted")
+                    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                        zip_ref.extractall(extracted_dir)
+                    # Atomic rename: the cache directory only exists once it is complete
+                    os.rename(extracted_dir, cache_dir)
+                finally:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    add_to_sys_path(cache_dir)
+
+
+setup_dependencies(FUSETS_DEPENDENCIES_URL)
@@ -2,16 +2,17 @@ import json
 import sys
 from pathlib import Path
 
-import openeo
 from openeo.api.process import Parameter
 from openeo.rest.udp import build_process_dict
 
-# TODO #15 where to put reusable helpers? e.g. load description from README.md, dummy openeo connection, properly write to JSON file, ...
+from esa_apex_toolbox.offline import OfflineConnection
+
+# TODO #15 where to put reusable helpers? e.g. load description from README.md, properly write to JSON file, ...
 
 
 def generate() -> dict:
-    # TODO: use/inject dummy connection instead of concrete one? (See cdse_marketplace_services)
-    connection = openeo.connect("openeofed.dataspace.copernicus.eu")
+    # Offline connection (cached collection metadata): no network access or authentication needed
+    connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
     spatial_extent = Parameter.bounding_box(name="bbox")
     temporal_extent = Parameter.temporal_interval(name="temporal_extent")
@@ -7,12 +7,14 @@ from openeo.api.process import Parameter
 from openeo.processes import array_create
 from openeo.rest.udp import build_process_dict
 
-# TODO #15 where to put reusable helpers? e.g. load description from README.md, dummy openeo connection, properly write to JSON file, ...
+from esa_apex_toolbox.offline import OfflineConnection
+
+# TODO #15 where to put reusable helpers? e.g. load description from README.md, properly write to JSON file, ...
 
 
 def generate() -> dict:
-    # TODO: use/inject dummy connection instead of concrete one? (See cdse_marketplace_services)
-    c = openeo.connect("openeofed.dataspace.copernicus.eu")
+    # Offline connection (cached collection metadata): no network access or authentication needed
+    c = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
     spatial_extent = Parameter.spatial_extent()
     temporal_extent = Parameter.temporal_interval(name="temporal_extent")
@@ -4,6 +4,8 @@ import openeo
 from openeo.api.process import Parameter
 from openeo.rest.udp import build_process_dict
 
+from esa_apex_toolbox.offline import OfflineConnection
+
 
 def generate() -> dict:
     # DEFINE PARAMETERS
@@ -16,7 +18,7 @@ def generate() -> dict:
 
     # backend to connect and load
     backend_url = "openeo.dataspace.copernicus.eu/"
-    conn = openeo.connect(backend_url).authenticate_oidc()
+    conn = OfflineConnection(backend_url)
 
     # Compute cloud mask, and filter input data based on cloud mask.
     # compute cloud mask using the SCL band
@@ -53,7 +55,13 @@ def generate() -> dict:
 
     # Apply ML algorithm
     # apply a neural network, requires 128x128 pixel 'chunks' as input.
-    segment_udf = openeo.UDF.from_file("udf_segmentation.py", version="3.8")
+    # (with the shared ONNX session helpers prepended to the UDF code)
+    onnx_session_helpers = Path(__file__).parents[4] / "utils" / "udf_helpers" / "onnx_session.py"
+    segment_udf = openeo.UDF(
+        code=onnx_session_helpers.read_text() + "\n" + (Path(__file__).parent / "udf_segmentation.py").read_text(),
+        runtime="Python",
+        version="3.8",
+    )
     segmentationband = ndviband.apply_neighborhood(
         process=segment_udf,
         size=[{"dimension": "x", "value": 64, "unit": "px"}, {"dimension": "y", "value": 64, "unit": "px"}],
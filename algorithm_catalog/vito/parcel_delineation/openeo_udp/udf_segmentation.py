@@ -2,13 +2,25 @@ from functools import lru_cache
 import gc
 import sys
 from typing import Dict, Tuple
-from random import seed, sample
-from xarray import DataArray, zeros_like
+from random import Random
+import numpy as np
+import pandas as pd
+from xarray import DataArray, full_like
 from openeo.udf import inspect
 
 # Add the onnx dependencies to the path
 sys.path.insert(1, "onnx_deps")
-import onnxruntime as ort
+
+try:
+    # Shared ONNX session helpers: prepended to this UDF by generate.py, importable for local development
+    from onnx_session import (
+        OnnxSessionSettings,
+        create_onnx_session,
+        init_global_thread_pool,
+        register_shared_allocator,
+    )
+except ImportError:
+    pass
 
 
 model_names = frozenset(
@@ -20,20 +32,97 @@ model_names = frozenset(
 )
 
 
+class SessionManager:
+    """
+    Runs all parcel delineation networks through one ONNX runtime setup.
+
+    Instead of each session having its own thread pool and memory arena, all networks
+    share one global thread pool, sized to the thread budget of the session settings,
+    and one CPU arena allocator. The networks run one after the other on that budget.
+    """
+
+    def __init__(self, names, settings: OnnxSessionSettings):
+        use_global_thread_pool = init_global_thread_pool(settings)
+        config_entries = {}
+        if settings.enable_cpu_mem_arena and register_shared_allocator():
+            config_entries["session.use_env_allocators"] = "1"
+        self.sessions = [
+            create_onnx_session(
+                f"onnx_models/{model_name}",
+                settings,
+                use_global_thread_pool=use_global_thread_pool,
+                config_entries=config_entries,
+            )
+            for model_name in sorted(names)
+        ]
+
+    def predict(self, input_data: np.ndarray, patch_size: int) -> np.ndarray:
+        """
+        Run all networks on a batch of inputs.
+
+        @param input_data: Batch of ML inputs with shape (batch, patch_size * patch_size, images)
+        @param patch_size: Size of the sample
+        @return: Predictions with shape (networks * batch, patch_size, patch_size)
+        """
+        batch_size = input_data.shape[0]
+        predictions = np.empty((len(self.sessions) * batch_size, patch_size, patch_size), dtype=np.float32)
+        for m, ort_session in enumerate(self.sessions):
+            model_input = ort_session.get_inputs()[0]
+            batch = predictions[m * batch_size : (m + 1) * batch_size]
+            if isinstance(model_input.shape[0], int) and model_input.shape[0] == 1:
+                # Model with a fixed batch size of 1: run the batch items one by one
+                for i in range(batch_size):
+                    ort_outputs = ort_session.run(None, {model_input.name: input_data[i : i + 1]})
+                    batch[i] = ort_outputs[0].reshape((patch_size, patch_size))
+            else:
+                # Run ML to predict the whole batch in one go
+                ort_outputs = ort_session.run(None, {model_input.name: input_data})
+                batch[:] = ort_outputs[0].reshape((batch_size, patch_size, patch_size))
+        return predictions
+
+
+@lru_cache(maxsize=16)
+def get_triplet_plan(no_images: int, predictions_per_model: int = 4, no_rand_images: int = 3) -> np.ndarray:
+    """
+    Reproducible random selection of the image triplets for the predictions of each model.
+    The selection only depends on the number of images, so it is only computed once per time axis length.
+
+    @param no_images: Number of images (time steps)
+    @param predictions_per_model: Number of predictions (triplets)
+    @param no_rand_images: Number of images per triplet
+    @return: Read-only array of image indices with shape (predictions_per_model, no_rand_images)
+    """
+    # Seed to lead to a reproducible results (one random generator per prediction).
+    plan = np.array([Random(i).sample(range(no_images), k=no_rand_images) for i in range(predictions_per_model)])
+    plan.setflags(write=False)
+    return plan
+
+
+@lru_cache(maxsize=64)
+def has_triplets_within_week(dates: tuple, no_images: int) -> bool:
+    """
+    Check if any triplet of the plan (see `get_triplet_plan`) has images in the same week,
+    which is not good for parcel delineation. Cached on the dates of the images.
+    """
+    weeks = pd.DatetimeIndex(dates).isocalendar().week.to_numpy()[get_triplet_plan(no_images)]
+    return bool((np.diff(np.sort(weeks, axis=1), axis=1) == 0).any())
+
+
 @lru_cache(maxsize=1)
-def load_ort_sessions(names):
+def load_session_manager(names, settings: OnnxSessionSettings) -> SessionManager:
     """
     Load the models and make the prediction functions.
     The lru_cache avoids loading the model multiple times on the same worker.
 
-    @param modeldir: Model directory
-    @return: Loaded model sessions
+    @param names: Model file names (in the onnx_models directory)
+    @param settings: ONNX runtime session settings
+    @return: Session manager for the loaded models
     """
     # inspect(message="Loading convolutional neural networks as ONNX runtime sessions ...")
-    return [ort.InferenceSession(f"onnx_models/{model_name}") for model_name in names]
+    return SessionManager(names, settings=settings)
 
 
-def process_window_onnx(ndvi_stack: DataArray, patch_size=128) -> DataArray:
+def process_window_onnx(ndvi_stack: DataArray, settings: OnnxSessionSettings, patch_size=128) -> DataArray:
     """Compute prediction.
 
     Compute predictions using ML models. ML models takes three inputs images and predicts
@@ -44,6 +133,8 @@ def process_window_onnx(ndvi_stack: DataArray, patch_size=128) -> DataArray:
     ----------
     ndvi_stack : DataArray
         ndvi data
+    settings : OnnxSessionSettings
+        ONNX runtime session settings
     patch_size : Int
         Size of the sample
 
@@ -53,65 +144,53 @@ def process_window_onnx(ndvi_stack: DataArray, patch_size=128) -> DataArray:
         Machine learning prediction.
     """
     # Do 12 predictions: use 3 networks, and for each take 3 random NDVI images and repeat 4 times
-    ort_sessions = load_ort_sessions(model_names)  # get models
+    session_manager = load_session_manager(model_names, settings)  # get models
 
-    predictions_per_model = 4
-    no_rand_images = 3  # Number of random images that are needed for input
     no_images = ndvi_stack.t.shape[0]
 
-    # Range of index of images for random index selection
-    images_range = range(no_images)
-    # List of all predictions
-    prediction = []
-    for ort_session in ort_sessions:
-        # make 4 predictions per model
-        for i in range(predictions_per_model):
-            # initialize a predicter array
-            # Seed to lead to a reproducible results.
-            seed(i)
-            # Random selection of 3 images for input
-            idx = sample(images_range, k=no_rand_images)
-            # log a message that the selected indices are not at least a week away
-            if len(set((ndvi_stack.isel(t=idx)).t.dt.isocalendar().week.data)) != no_rand_images:
-                inspect(message="Time difference is not larger than a week for good parcel delineation")
-
-            # re-shape the input data for ML input
-            input_data = ndvi_stack.isel(t=idx).data.reshape(1, patch_size * patch_size, no_rand_images)
-            ort_inputs = {ort_session.get_inputs()[0].name: input_data}
-
-            # Run ML to predict
-            ort_outputs = ort_session.run(None, ort_inputs)
-            # reshape ort_outputs and append it to prediction list
-            prediction.append(ort_outputs[0].reshape((patch_size, patch_size)))
+    # Random selection of 3 images for input, for each of the 4 predictions per model
+    triplets = get_triplet_plan(no_images)
+    # log a message that the selected indices are not at least a week away
+    if has_triplets_within_week(tuple(ndvi_stack.t.values), no_images):
+        inspect(message="Time difference is not larger than a week for good parcel delineation")
+
+    # Gather the input data of all triplets with a single fancy index, as one contiguous batch
+    # for ML input: (triplet, pixel, image)
+    pixels = ndvi_stack.data.reshape(patch_size * patch_size, no_images)
+    input_data = pixels[np.arange(patch_size * patch_size)[None, :, None], triplets[:, None, :]]
+
+    # All predictions in one preallocated buffer: (model x triplet, x, y)
+    predictions = session_manager.predict(input_data, patch_size=patch_size)
 
     # free up some memory to avoid memory errors
     gc.collect()
 
-    # Create a DataArray of all predictions
-    all_predictions = DataArray(
-        prediction,
-        dims=["predict", "x", "y"],
-        coords={
-            "predict": range(len(prediction)),
-            "x": ndvi_stack.coords["x"],
-            "y": ndvi_stack.coords["y"],
-        },
-    )
     # final prediction is the median of all predictions per pixel
-    return all_predictions.median(dim="predict")
+    return DataArray(
+        np.median(predictions, axis=0, overwrite_input=True),
+        dims=["x", "y"],
+        coords={"x": ndvi_stack.coords["x"], "y": ndvi_stack.coords["y"]},
+    )
 
 
-def get_valid_ml_inputs(nvdi_stack_data: DataArray, sum_invalid, min_images: int) -> DataArray:
+def select_ml_images(invalid_counts: np.ndarray, min_images: int) -> np.ndarray:
     """Machine learning inputs
 
-    Extract ML inputs based on how good the data is
+    Select the images (time samples) for ML based on how good the data is: all images without
+    invalid pixels if there are enough of them, else the best images with the least amount of
+    invalid pixels (ordered by their number of invalid pixels, ties in time order).
 
     """
-    if (sum_invalid.data == 0).sum() >= min_images:
-        good_data = nvdi_stack_data.sel(t=sum_invalid[sum_invalid.data == 0].t)
-    else:  # select the 4 best time samples with least amount of invalid pixels.
-        good_data = nvdi_stack_data.sel(t=sum_invalid.sortby(sum_invalid).t[:min_images])
-    return good_data
+    complete = np.flatnonzero(invalid_counts == 0)
+    if len(complete) >= min_images:
+        return complete
+    # select the 4 best time samples with least amount of invalid pixels:
+    # partition on the count of the 4th best one, and take the tied images in time order
+    threshold = invalid_counts[np.argpartition(invalid_counts, min_images - 1)[min_images - 1]]
+    below = np.flatnonzero(invalid_counts < threshold)
+    tied = np.flatnonzero(invalid_counts == threshold)[: min_images - len(below)]
+    best = np.concatenate([below, tied])
+    return best[np.argsort(invalid_counts[best], kind="stable")]
 
 
 def preprocess_datacube(cubearray: DataArray, min_images: int) -> Tuple[bool, DataArray]:
@@ -142,30 +221,39 @@ def preprocess_datacube(cubearray: DataArray, min_images: int) -> Tuple[bool, Da
         nvdi_stack = cubearray.isel(bands=0)
     else:
         nvdi_stack = cubearray
-    # Clamp out of range NDVI values
-    nvdi_stack = nvdi_stack.where(lambda nvdi_stack: nvdi_stack < 0.92, 0.92)
-    nvdi_stack = nvdi_stack.where(lambda nvdi_stack: nvdi_stack > -0.08)
-    nvdi_stack += 0.08
-    # Count the amount of invalid pixels in each time sample.
-    sum_invalid = nvdi_stack.isnull().sum(dim=["x", "y"])
-    # Check % of invalid pixels in each time sample by using mean
-    sum_invalid_mean = nvdi_stack.isnull().mean(dim=["x", "y"])
-    # Fill the invalid pixels with value 0
-    nvdi_stack_data = nvdi_stack.fillna(0)
+    # NDVI images as a (t, x, y) view on the cube data (no copy)
+    images = nvdi_stack.transpose("t", "x", "y").data
+    # Count the amount of invalid pixels in each time sample: NDVI values <= -0.08
+    # (nan values are clamped to the upper NDVI value below, so they are valid)
+    invalid_counts = np.array([np.count_nonzero(image <= -0.08) for image in images])
 
     # Check if data is valid for machine learning. If invalid, return True and
     # an DataArray of nan values (similar to the machine learning output)
     # The number of invalid time sample less then min images
-    if (sum_invalid_mean.data < 1).sum() <= min_images:
+    if (invalid_counts < images[0].size).sum() <= min_images:
         inspect(message="Input data is invalid for this window -> skipping!")
         # create a nan dataset and return
-        nan_data = zeros_like(nvdi_stack.sel(t=sum_invalid_mean.t[0], drop=True))
-        nan_data = nan_data.where(lambda nan_data: nan_data > 1)
+        nan_data = full_like(nvdi_stack.isel(t=0, drop=True), np.nan)
         return True, nan_data
     # Data selection: valid data for machine learning
     # select time samples where there are no invalid pixels
-    good_data = get_valid_ml_inputs(nvdi_stack_data, sum_invalid, min_images)
-    return False, good_data.transpose("x", "y", "t")
+    selected = select_ml_images(invalid_counts, min_images)
+
+    # Write the selected images straight into one contiguous float32 (x, y, t) array
+    good_data = np.empty(images.shape[1:] + (len(selected),), dtype=np.float32)
+    for i, index in enumerate(selected):
+        image = images[index]
+        plane = good_data[:, :, i]
+        # Clamp out of range NDVI values (fmin also clamps nan)
+        np.fmin(image, 0.92, out=plane, casting="same_kind")
+        plane += 0.08
+        # Fill the invalid pixels with value 0
+        plane[image <= -0.08] = 0
+    return False, DataArray(
+        good_data,
+        dims=["x", "y", "t"],
+        coords={"x": nvdi_stack.coords["x"], "y": nvdi_stack.coords["y"], "t": nvdi_stack.coords["t"][selected]},
+    )
 
 
 def apply_datacube(cube: DataArray, context: Dict) -> DataArray:
@@ -178,7 +266,7 @@ def apply_datacube(cube: DataArray, context: Dict) -> DataArray:
     if invalid_data:
         return ndvi_stack.expand_dims(dim={"t": [(cube.t.dt.year.values[0])], "bands": ["prediction"]})
     # Machine learning prediction: process the window
-    result = process_window_onnx(ndvi_stack)
+    result = process_window_onnx(ndvi_stack, settings=OnnxSessionSettings.from_context(context))
     # Reintroduce time and bands dimensions
     result_xarray = result.expand_dims(dim={"t": [(cube.t.dt.year.values[0])], "bands": ["prediction"]})
     # Return the resulting xarray
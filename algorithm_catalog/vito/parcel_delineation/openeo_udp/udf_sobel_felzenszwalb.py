@@ -1,10 +1,84 @@
+import numpy as np
+from scipy import ndimage as ndi
 from xarray import DataArray
-from skimage import segmentation, graph
+from skimage import segmentation
 from skimage.filters import sobel
 from typing import Dict
 from openeo.udf import inspect
 
 
+def boundary_edges(labels: np.ndarray, edge_map: np.ndarray) -> tuple:
+    """
+    Region adjacency graph of the segments as arrays, like `skimage.graph.rag_boundary` (without networkx):
+    the pairs of adjacent segments, sorted, with the mean edge map value along their boundary as weight.
+
+    :return: (smallest label, largest label, weight) arrays of the edges
+    """
+    footprint = ndi.generate_binary_structure(labels.ndim, 2)
+    eroded = ndi.grey_erosion(labels, footprint=footprint)
+    dilated = ndi.grey_dilation(labels, footprint=footprint)
+    boundaries0 = eroded != labels
+    boundaries1 = dilated != labels
+    small = np.concatenate((eroded[boundaries0], labels[boundaries1]))
+    large = np.concatenate((labels[boundaries0], dilated[boundaries1]))
+    values = np.concatenate((edge_map[boundaries0], edge_map[boundaries1]))
+
+    # Accumulate the boundary pixels per edge, with each edge encoded as a single (sortable) key
+    n_labels = int(labels.max()) + 1
+    edges, inverse = np.unique(small.astype(np.int64) * n_labels + large, return_inverse=True)
+    weights = np.bincount(inverse, weights=values) / np.bincount(inverse)
+    return edges // n_labels, edges % n_labels, weights
+
+
+def find_roots(parent: np.ndarray) -> np.ndarray:
+    """Point all nodes of a union-find forest directly to their root (pointer jumping)."""
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def merge_segments(
+    labels: np.ndarray, small: np.ndarray, large: np.ndarray, weights: np.ndarray, threshold: float
+) -> np.ndarray:
+    """
+    Merge the adjacent segments with a boundary weight below the threshold, with a union-find on the edges.
+    The merged segments are numbered like `skimage.graph.cut_threshold` does.
+
+    :return: Merged segment ids
+    """
+    n_labels = int(labels.max()) + 1
+    # (edges with nan weight are kept, as in `cut_threshold`)
+    keep = ~(weights >= threshold)
+    small_kept, large_kept = small[keep], large[keep]
+
+    parent = np.arange(n_labels)
+    while True:
+        # Hook the largest root of the edges that are not merged yet under the smallest one
+        small_roots, large_roots = parent[small_kept], parent[large_kept]
+        unmerged = small_roots != large_roots
+        if not unmerged.any():
+            break
+        low_roots = np.minimum(small_roots[unmerged], large_roots[unmerged])
+        high_roots = np.maximum(small_roots[unmerged], large_roots[unmerged])
+        np.minimum.at(parent, high_roots, low_roots)
+        parent = find_roots(parent)
+
+    # Graph nodes in order of first appearance in the sorted edges, and merged segments in order of their first node
+    nodes, first_seen = np.unique(np.column_stack((small, large)).ravel(), return_index=True)
+    nodes = nodes[np.argsort(first_seen)]
+    roots = parent[nodes]
+    component_roots, first_root = np.unique(roots, return_index=True)
+    component_ids = np.empty(n_labels, dtype=labels.dtype)
+    component_ids[component_roots[np.argsort(first_root)]] = np.arange(len(component_roots))
+
+    # Segments without neighbours keep their own label
+    mapping = np.arange(n_labels, dtype=labels.dtype)
+    mapping[nodes] = component_ids[roots]
+    return mapping[labels]
+
+
 def apply_datacube(cube: DataArray, context: Dict) -> DataArray:
     inspect(message=f"Dimensions of the final datacube {cube.dims}")
     # get the underlying array without the bands and t dimension
@@ -14,11 +88,9 @@ def apply_datacube(cube: DataArray, context: Dict) -> DataArray:
     # Perform felzenszwalb segmentation
     segment = segmentation.felzenszwalb(image_data, scale=120, sigma=0.0, min_size=30, channel_axis=None)
     # Perform the rag boundary analysis and merge the segments
-    bgraph = graph.rag_boundary(segment, edges)
-    # merging segments
-    mergedsegment = graph.cut_threshold(segment, bgraph, 0.15, in_place=False)
-    # create a data cube and perform masking operations
-    output_arr = DataArray(mergedsegment.reshape(cube.shape), dims=cube.dims, coords=cube.coords)
-    output_arr = output_arr.where(cube >= 0.3)   # Mask the output pixels based on the cube values <0.3
-    output_arr = output_arr.where(output_arr >= 0)  # Mask all values less than or equal to zero
-    return output_arr
+    small, large, weights = boundary_edges(segment, edges)
+    mergedsegment = merge_segments(segment, small, large, weights, 0.15)
+    # Float output, with the pixels masked (nan) based on the cube values <0.3 (or nan)
+    output = mergedsegment.astype(np.float64)
+    output[~(image_data >= 0.3)] = np.nan
+    return DataArray(output.reshape(cube.shape), dims=cube.dims, coords=cube.coords)
@@ -0,0 +1,95 @@
+"""
+Local benchmark of the GLCM texture UDF (`rf_feature_extraction_ndfi_glcm.py`).
+
+Compares the one-pass texture engine of the UDF against the original
+per-pixel `skimage.feature.graycomatrix` implementation on synthetic
+Sentinel-2 tiles, both for speed and for equality of the results.
+
+Usage (from this folder):
+
+    python benchmark_glcm.py [--sizes 64 128 256] [--window 33] [--skip-reference]
+        [--levels 256] [--distances 5] [--angles 0]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import xarray
+from skimage.feature import graycomatrix, graycoprops
+
+from rf_feature_extraction_ndfi_glcm import apply_datacube
+
+
+def reference_textures(b12: np.ndarray, window_size: int, levels: int, distances: list, angles: list) -> tuple:
+    """Original per-pixel GLCM contrast and window variance (one graycomatrix call per pixel)."""
+    pad = window_size // 2
+    padded = np.pad(b12, pad_width=pad, mode="reflect")
+    img_norm = (padded - padded.min()) / (padded.max() - padded.min())
+    padded = (img_norm * (levels - 1)).astype(np.uint8)
+
+    shape = b12.shape
+    contrast = np.zeros((len(distances), len(angles)) + shape)
+    variance = np.zeros(shape)
+    for i in range(pad, pad + shape[0]):
+        for j in range(pad, pad + shape[1]):
+            window = padded[i - pad : i + pad + 1, j - pad : j + pad + 1]
+            glcm = graycomatrix(
+                window, distances=distances, angles=np.deg2rad(angles), levels=levels, symmetric=True, normed=True
+            )
+            contrast[:, :, i - pad, j - pad] = graycoprops(glcm, "contrast")
+            variance[i - pad, j - pad] = np.var(window)
+    return contrast.reshape((-1,) + shape), variance
+
+
+def synthetic_cube(size: int, seed: int = 42) -> xarray.DataArray:
+    """Synthetic (bands, y, x) cube with B08 and B12 reflectance-like values."""
+    rng = np.random.default_rng(seed)
+    data = rng.uniform(100, 5000, size=(2, size, size)).astype(np.float32)
+    return xarray.DataArray(
+        data,
+        dims=["bands", "y", "x"],
+        coords={"bands": ["B08", "B12"], "y": np.arange(size), "x": np.arange(size)},
+    )
+
+
+def main():
+    cli = argparse.ArgumentParser()
+    # Default tile sizes: 128x128 chunk plus 2x32px overlap, and a smaller/larger variant
+    cli.add_argument("--sizes", type=int, nargs="+", default=[64, 192, 320])
+    cli.add_argument("--window", type=int, default=33)
+    cli.add_argument("--levels", type=int, default=256)
+    cli.add_argument("--distances", type=int, nargs="+", default=[5])
+    cli.add_argument("--angles", type=float, nargs="+", default=[0], help="Angles in degrees.")
+    cli.add_argument("--skip-reference", action="store_true", help="Only time the one-pass engine.")
+    args = cli.parse_args()
+
+    context = {
+        "padding_window_size": args.window,
+        "glcm_levels": args.levels,
+        "glcm_distances": args.distances,
+        "glcm_angles": args.angles,
+    }
+    for size in args.sizes:
+        cube = synthetic_cube(size)
+
+        start = time.perf_counter()
+        result = apply_datacube(cube, context)
+        engine_time = time.perf_counter() - start
+        line = f"{size}x{size} px, window {args.window}, {len(result.bands)} bands: engine {engine_time:.4f}s"
+
+        if not args.skip_reference:
+            start = time.perf_counter()
+            contrast, variance = reference_textures(
+                cube.sel(bands="B12").values, args.window, args.levels, args.distances, args.angles
+            )
+            reference_time = time.perf_counter() - start
+            np.testing.assert_allclose(result.values[: len(contrast)], contrast, rtol=1e-9, atol=1e-9)
+            np.testing.assert_allclose(result.sel(bands="variance").values, variance, rtol=1e-9, atol=1e-9)
+            line += f", per-pixel graycomatrix {reference_time:.2f}s ({reference_time / engine_time:.0f}x), results match"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -50,7 +50,7 @@ def s1_features(connection: Connection, date, aoi, reducer):
 
     return s1_cube.reduce_dimension(reducer=reducer, dimension="t")
 
-def s2_features(connection: Connection, date, aoi, reducer, padding_window_size):
+def s2_features(connection: Connection, date, aoi, reducer, padding_window_size, glcm_settings=None):
     """
    Preprocess Sentinel-2 data by loading relevant bands, applying scaling,
    and reducing over time using a specified reducer.
@@ -60,6 +60,9 @@ def s2_features(connection: Connection, date, aoi, reducer, padding_window_size)
         date: Temporal extent as (start_date, end_date)
         aoi: Spatial extent 
         reducer (Any): Reducer (first, last, mean, median)
+        padding_window_size: GLCM window size
+        glcm_settings (dict): Optional GLCM settings for the texture UDF
+            ("glcm_levels", "glcm_distances", "glcm_angles"), defaults to 256 levels, distance 5 and angle 0.
 
     Returns:
         DataCube: The processed and temporally reduced Sentinel-2 datacube.
@@ -113,7 +116,8 @@ def s2_features(connection: Connection, date, aoi, reducer, padding_window_size)
         ],
         # add context
         context = {
-            "padding_window_size": padding_window_size
+            "padding_window_size": padding_window_size,
+            **(glcm_settings or {}),
         }
     )
     
@@ -1,15 +1,16 @@
 import json
 from pathlib import Path
-import openeo
 from openeo.api.process import Parameter
 from openeo.rest.udp import build_process_dict
 
+from esa_apex_toolbox.offline import OfflineConnection
+
 from eo_extractor import s1_features , s2_features
 
 
 def generate() -> dict:
 
-    connection  = openeo.connect("openeo.vito.be").authenticate_oidc()
+    connection = OfflineConnection("openeo.vito.be")
 
     # define input parameter
     spatial_extent = Parameter.spatial_extent(
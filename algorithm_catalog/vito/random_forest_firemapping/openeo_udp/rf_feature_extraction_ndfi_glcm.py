@@ -1,16 +1,180 @@
 import xarray
 import numpy as np
-from skimage.feature import graycomatrix, graycoprops
 from openeo.metadata import CollectionMetadata
 
 
+def get_glcm_settings(context: dict) -> tuple:
+    """
+    Extracts the GLCM settings from the UDF context.
+
+    Args:
+        context (dict): UDF context, optionally with:
+                        - 'glcm_levels': number of grey levels to quantize to (2-256, default 256)
+                        - 'glcm_distances': list of pixel pair distances (default [5])
+                        - 'glcm_angles': list of pixel pair angles in degrees (default [0])
+
+    Returns:
+        tuple: (levels, distances, angles)
+    """
+    levels = int(context.get("glcm_levels", 256))
+    distances = [int(d) for d in context.get("glcm_distances", [5])]
+    angles = [float(a) for a in context.get("glcm_angles", [0])]
+    if not 2 <= levels <= 256:
+        raise ValueError(f"glcm_levels should be between 2 and 256, but got {levels}")
+    if not distances or not angles:
+        raise ValueError("glcm_distances and glcm_angles should not be empty")
+    return levels, distances, angles
+
+
+def get_band_names(context: dict) -> list:
+    """
+    Output band names: one contrast band per (distance, angle) combination, followed by variance and NDFI.
+    A single combination keeps the plain 'contrast' band name.
+    """
+    _, distances, angles = get_glcm_settings(context)
+    if len(distances) == 1 and len(angles) == 1:
+        contrast_bands = ["contrast"]
+    else:
+        contrast_bands = [f"contrast_d{d}_a{a:g}" for d in distances for a in angles]
+    return contrast_bands + ["variance", "NDFI"]
+
+
 def apply_metadata(metadata: CollectionMetadata, context: dict) -> CollectionMetadata:
     return metadata.rename_labels(
         dimension = "bands",
-        target = ["contrast","variance","NDFI"]
+        target = get_band_names(context)
     )
 
 
+def integral_image(image: np.ndarray) -> np.ndarray:
+    """
+    Computes the summed-area table of a 2D image, with an extra leading row and column of zeros.
+
+    Args:
+        image (np.ndarray): 2D integer image.
+
+    Returns:
+        np.ndarray: int64 array of shape (rows + 1, cols + 1) where entry (i, j) is the sum of image[:i, :j].
+    """
+    table = np.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=np.int64)
+    np.cumsum(image, axis=0, dtype=np.int64, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_sum(table: np.ndarray, box_shape: tuple, out_shape: tuple) -> np.ndarray:
+    """
+    Sums a sliding box over an image, using its summed-area table.
+
+    Args:
+        table (np.ndarray): Summed-area table as returned by `integral_image`.
+        box_shape (tuple): (rows, cols) size of the sliding box.
+        out_shape (tuple): (rows, cols) number of box positions to evaluate, starting at the top-left corner.
+
+    Returns:
+        np.ndarray: int64 array of shape `out_shape` with the box sum for each top-left box position.
+    """
+    (bh, bw), (oh, ow) = box_shape, out_shape
+    return table[bh:bh + oh, bw:bw + ow] - table[:oh, bw:bw + ow] - table[bh:bh + oh, :ow] + table[:oh, :ow]
+
+
+def glcm_contrast(padded: np.ndarray, window: int, offset: tuple, out_shape: tuple) -> np.ndarray:
+    """
+    Computes the GLCM contrast of a sliding window for every output pixel in one pass.
+
+    The contrast of a normalised (symmetric) GLCM equals the mean squared grey level difference
+    over all pixel pairs at the given offset inside the window. That mean is evaluated for all
+    windows at once with a summed-area table of the squared pair differences, which gives the
+    same result as `skimage.feature.graycomatrix` + `graycoprops(..., 'contrast')` per window.
+
+    Args:
+        padded (np.ndarray): Quantized, padded 2D image (unsigned integers).
+        window (int): Size of the square sliding window.
+        offset (tuple): (row, col) pixel pair offset.
+        out_shape (tuple): (rows, cols) of the unpadded output.
+
+    Returns:
+        np.ndarray: float64 contrast map of shape `out_shape`.
+    """
+    dr, dc = offset
+    rows, cols = window - abs(dr), window - abs(dc)
+    if rows <= 0 or cols <= 0:
+        # No pixel pairs fit in the window: empty GLCM, like skimage
+        return np.zeros(out_shape)
+    height, width = padded.shape
+    image = padded.astype(np.int32, copy=False)
+    r0, c0 = max(0, -dr), max(0, -dc)
+    r1, c1 = height - max(0, dr), width - max(0, dc)
+    diff = image[r0:r1, c0:c1] - image[r0 + dr:r1 + dr, c0 + dc:c1 + dc]
+    sums = box_sum(integral_image(diff * diff), box_shape=(rows, cols), out_shape=out_shape)
+    return sums / (rows * cols)
+
+
+def glcm_offset(distance: int, angle: float) -> tuple:
+    """
+    Converts a GLCM distance and angle (in degrees) to a (row, col) pixel pair offset,
+    following the `skimage.feature.graycomatrix` convention.
+
+    Like skimage, halves are rounded away from zero by adding 0.5 and truncating
+    (not Python's round-half-to-even, which gives other offsets for e.g. 30 degrees).
+    """
+
+    def skimage_round(value: float) -> int:
+        return int(value + 0.5) if value > 0 else int(value - 0.5)
+
+    angle = np.deg2rad(angle)
+    return skimage_round(np.sin(angle) * distance), skimage_round(np.cos(angle) * distance)
+
+
+def glcm_contrasts(padded: np.ndarray, window: int, distances: list, angles: list, out_shape: tuple) -> np.ndarray:
+    """
+    Computes the GLCM contrast maps for all (distance, angle) combinations from one shared pass:
+    the image is converted once and combinations that map to the same pixel offset are computed once.
+
+    Args:
+        padded (np.ndarray): Quantized, padded 2D image (unsigned integers).
+        window (int): Size of the square sliding window.
+        distances (list): Pixel pair distances.
+        angles (list): Pixel pair angles in degrees.
+        out_shape (tuple): (rows, cols) of the unpadded output.
+
+    Returns:
+        np.ndarray: float64 array of shape (len(distances) * len(angles), rows, cols), distance-major.
+    """
+    image = padded.astype(np.int32)
+    offsets = [glcm_offset(d, a) for d in distances for a in angles]
+    contrasts = np.empty((len(offsets),) + tuple(out_shape))
+    computed = {}
+    for i, offset in enumerate(offsets):
+        if offset in computed:
+            contrasts[i] = contrasts[computed[offset]]
+        else:
+            contrasts[i] = glcm_contrast(image, window=window, offset=offset, out_shape=out_shape)
+            computed[offset] = i
+    return contrasts
+
+
+def window_variance(padded: np.ndarray, window: int, out_shape: tuple) -> np.ndarray:
+    """
+    Computes the (population) variance of a sliding window for every output pixel in one pass,
+    using summed-area tables of the values and the squared values.
+
+    Args:
+        padded (np.ndarray): Quantized, padded 2D image (unsigned integers).
+        window (int): Size of the square sliding window.
+        out_shape (tuple): (rows, cols) of the unpadded output.
+
+    Returns:
+        np.ndarray: float64 variance map of shape `out_shape`.
+    """
+    image = padded.astype(np.int64)
+    n = window * window
+    s1 = box_sum(integral_image(image), box_shape=(window, window), out_shape=out_shape)
+    s2 = box_sum(integral_image(image * image), box_shape=(window, window), out_shape=out_shape)
+    # Integer sums are exact, so only the final division rounds
+    return (n * s2 - s1 * s1) / (n * n)
+
+
 def apply_datacube(cube: xarray.DataArray, context: dict) -> xarray.DataArray:
     """
     Applies spatial texture analysis and spectral index computation to a Sentinel-2 data cube.
@@ -21,11 +185,12 @@ def apply_datacube(cube: xarray.DataArray, context: dict) -> xarray.DataArray:
 
     Args:
         cube (xarray.DataArray): A 3D data cube with dimensions (bands, y, x) containing at least bands B08 and B12.
-        context (dict): A context dictionary (currently unused, included for API compatibility).
+        context (dict): A context dictionary with the 'padding_window_size' and the GLCM settings
+                        ('glcm_levels', 'glcm_distances', 'glcm_angles', see `get_glcm_settings`).
 
     Returns:
         xarray.DataArray: A new data cube with dimensions (bands, y, x) containing:
-                          - 'contrast': GLCM contrast
+                          - 'contrast': GLCM contrast (or 'contrast_d{distance}_a{angle}' per combination)
                           - 'variance': GLCM variance
                           - 'NDFI': Normalised Difference Fire Index
     """
@@ -33,7 +198,7 @@ def apply_datacube(cube: xarray.DataArray, context: dict) -> xarray.DataArray:
     # Parameters
     window_size = context.get("padding_window_size", 33)  # Default to 33 if not provided
     pad = window_size // 2
-    levels = 256  # For 8-bit images
+    levels, distances, angles = get_glcm_settings(context)
     
     # Load Data
     # data = cube.values # shape: (t, bands, y, x)
@@ -52,32 +217,22 @@ def apply_datacube(cube: xarray.DataArray, context: dict) -> xarray.DataArray:
     # Padding the image to handle border pixels for GLCM
     padded = np.pad(b12, pad_width=pad, mode='reflect')
 
-    # Normalize to 0–255 range
+    # Normalize to 0–(levels - 1) range
     img_norm = (padded - padded.min()) / (padded.max() - padded.min())
-    padded = (img_norm * 255).astype(np.uint8)
+    padded = (img_norm * (levels - 1)).astype(np.uint8)
     
-    # Initialize feature maps
+    # Texture features for all windows at once
     shape = b12.shape
-    contrast = np.zeros(shape)
-    variance = np.zeros(shape)
-    
-    for i in range(pad, pad + shape[0]):
-        for j in range(pad, pad + shape[1]):
-            window = padded[i - pad:i + pad + 1, j - pad:j + pad + 1]
-            
-            # Compute GLCM
-            glcm = graycomatrix(window, distances=[5], angles=[0], levels=levels, symmetric=True, normed=True)
-            
-            # Texture features
-            contrast[i - pad, j - pad] = graycoprops(glcm, 'contrast')[0, 0]
-            variance[i - pad, j - pad] = np.var(window)
-
-    all_texture = np.stack([contrast,variance,ndfi])
+    window = 2 * pad + 1
+    contrasts = glcm_contrasts(padded, window=window, distances=distances, angles=angles, out_shape=shape)
+    variance = window_variance(padded, window=window, out_shape=shape)
+
+    all_texture = np.concatenate([contrasts, np.stack([variance, ndfi])])
     # create a data cube with all the calculated properties
     textures = xarray.DataArray(
         data=all_texture,
         dims=["bands", "y", "x"],
-        coords={"bands": ["contrast","variance","NDFI"], "y": cube.coords["y"], "x": cube.coords["x"]},
+        coords={"bands": get_band_names(context), "y": cube.coords["y"], "x": cube.coords["x"]},
     )
 
     return textures
\ No newline at end of file
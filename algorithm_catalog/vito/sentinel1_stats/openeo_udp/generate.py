@@ -1,15 +1,16 @@
 import json
 from pathlib import Path
 
-import openeo
 from openeo.api.process import Parameter
 from openeo.processes import array_concat, array_create
 from openeo.rest.udp import build_process_dict
 
+from esa_apex_toolbox.offline import OfflineConnection
+
 
 def generate() -> dict:
-    # TODO: use/inject dummy connection instead of concrete one? (See cdse_marketplace_services)
-    connection = openeo.connect("openeofed.dataspace.copernicus.eu")
+    # Offline connection (cached collection metadata): no network access or authentication needed
+    connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
     # define parameters
     spatial_extent = Parameter.bounding_box(
@@ -7,20 +7,35 @@ A map will be generated for each of the available S2 observation between the spe
 import json
 import sys
 from pathlib import Path
-from typing import List, Union
+from typing import List, Optional, Union
 
 import openeo
 from openeo.api.process import Parameter
 from openeo.rest.udp import build_process_dict
 from openeo.internal.graph_building import PGNode
 
+from esa_apex_toolbox.offline import OfflineConnection
+
+# Band name and tile size (in pixels) of the multi-field mode of the variability map UDF
+FIELD_BAND = "field_id"
+FIELD_TILE_SIZE = 512
+
 
 def get_variabilitymap(
     connection: openeo.Connection,
     temporal_extent: Union[List[str], Parameter, None] = None,
     spatial_extent: Union[Parameter, dict, None] = None,
     raw: Union[bool, Parameter] = False,
+    field_ids: Optional[openeo.DataCube] = None,
 ) -> openeo.DataCube:
+    """
+    Build the variability map process graph.
+
+    By default, the variability map UDF runs once per polygon of `spatial_extent`. With `field_ids`,
+    a single band cube with the (positive) field id of each pixel (e.g. rasterized parcels),
+    the UDF processes all fields of a tile at once instead, comparing each pixel with the median of its field.
+    Note that fields crossing a tile border are then split in parts with their own median.
+    """
     
     ################ get input data #################
     s2_cube = connection.load_collection(
@@ -41,8 +56,14 @@ def get_variabilitymap(
     mask = scl.process("to_scl_dilation_mask", data=scl)
     S2_bands_mask = s2_cube.mask(mask)
 
-    # fetch udf to reduce bands
-    reduce_bands_udf = openeo.UDF.from_file("shub_fapar_udf.py")
+    # fetch the BioPAR udf to reduce bands (with the shared BioPAR input helpers prepended to the UDF code)
+    biopar_helpers = Path(__file__).parents[4] / "utils" / "udf_helpers" / "biopar_inputs.py"
+    biopar_udf = Path(__file__).parents[2] / "biopar" / "openeo_udp" / "biopar_udf.py"
+    reduce_bands_udf = openeo.UDF(
+        code=biopar_helpers.read_text() + "\n" + biopar_udf.read_text(),
+        runtime="Python",
+        context={"biopar_type": biopar_type},
+    )
     S2_bands_mask_reduced = S2_bands_mask.reduce_bands(reduce_bands_udf)
 
     input_data = S2_bands_mask_reduced.add_dimension(label=biopar_type, name='bands', type='bands')
@@ -50,20 +71,32 @@ def get_variabilitymap(
     ################ get and apply variability map udf #################
 
     mask_value = 999.0
-    udf_process = openeo.UDF.from_file(
-        "variabilitymap_udf.py",
-        runtime='Python', 
-        context={
-            'mask_value': mask_value, 'raw': raw, 'band': biopar_type
-        })
-    variabilitymap = (input_data.apply_polygon(geometries=spatial_extent, process=udf_process, mask_value=mask_value)
-                      .linear_scale_range(0,100,0,100).rename_labels(dimension= 'bands', target=['variability']))
+    context = {'mask_value': mask_value, 'raw': raw, 'band': biopar_type}
+    if field_ids is None:
+        udf_process = openeo.UDF.from_file(
+            "variabilitymap_udf.py",
+            runtime='Python', 
+            context=context)
+        variabilitymap = input_data.apply_polygon(geometries=spatial_extent, process=udf_process, mask_value=mask_value)
+    else:
+        context['field_band'] = FIELD_BAND
+        udf_process = openeo.UDF.from_file("variabilitymap_udf.py", runtime='Python', context=context)
+        fields_data = input_data.merge_cubes(field_ids.rename_labels(dimension='bands', target=[FIELD_BAND]))
+        variabilitymap = fields_data.apply_neighborhood(
+            process=udf_process,
+            size=[
+                {"dimension": "x", "value": FIELD_TILE_SIZE, "unit": "px"},
+                {"dimension": "y", "value": FIELD_TILE_SIZE, "unit": "px"},
+            ],
+            overlap=[],
+        ).filter_bands([biopar_type])
+    variabilitymap = variabilitymap.linear_scale_range(0,100,0,100).rename_labels(dimension= 'bands', target=['variability'])
 
     return variabilitymap
 
 
 def generate() -> dict:
-    connection = openeo.connect("openeofed.dataspace.copernicus.eu")
+    connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
 
     temporal_extent = Parameter.temporal_interval(
         name="temporal_extent", 
@@ -80,6 +113,8 @@ def generate() -> dict:
         default=False,
     )
 
+    # The published UDP runs the UDF per polygon: the multi-field mode (`field_ids`) needs
+    # a raster of field ids, which is not an input of this UDP.
     variabilitymap = get_variabilitymap(
         connection=connection,
         temporal_extent=temporal_extent,
@@ -1,58 +1,109 @@
+import warnings
+from typing import Optional
+
 from numpy import float32
 import xarray as xr
 import numpy as np
 from openeo.udf.xarraydatacube import XarrayDataCube
 
 
-def mask_values(data: xr.DataArray, values: list, drop: bool) -> xr.DataArray:
+# Bounds (relative to the field median) of the zones of the variability map
+ZONE_MIN = 0.85
+ZONE_MAX = 1.15
+ZONE_STEP = 0.1
+
+
+def get_zone_bins() -> np.ndarray:
     """
-    Mask a list of values in a given xarray DataArray
-    :param data: xarray DataArray to mask
-    :param values: Values that should be masked
-    :param drop: Flag indicating if the values should be removed from the array
-    :return:
+    Bin edges (in percent of the field median) of the zones: values above the last edge (or nan)
+    fall in the extra zone `len(bins)`, which is masked.
+    """
+    bins = np.arange(ZONE_MIN, ZONE_MAX + ZONE_STEP, ZONE_STEP)
+    bins = np.concatenate([[0], bins, [255]])
+    return bins * 100
+
+
+def grouped_nanmedian(values: np.ndarray, fields: np.ndarray) -> np.ndarray:
     """
-    result = data.copy()
-    for value in values:
-        result = result.where(data != value, drop=drop)
+    Median of the (non-nan) values of each field, with one sort of all field pixels at once
+    (grouped by field id) instead of one median computation per field.
+    :param values: Pixel values
+    :param fields: Field id of the pixels, with the same shape as the values (ids <= 0 or nan: no field)
+    :return: Median of the field of each pixel (nan for pixels outside the fields)
+    """
+    valid = ~np.isnan(values) & (fields > 0)
+    field_values = values[valid]
+    field_ids, groups = np.unique(fields[valid], return_inverse=True)
+    sorted_values = field_values[np.lexsort((field_values, groups))]
+    counts = np.bincount(groups, minlength=len(field_ids))
+    starts = np.cumsum(counts) - counts
+    # Mean of the two middle values (the same value for odd counts), like `np.median`
+    medians = (sorted_values[starts + (counts - 1) // 2] + sorted_values[starts + counts // 2]) / 2
+    result = np.full(values.shape, np.nan, dtype=values.dtype)
+    result[valid] = medians[groups]
     return result
 
-def generate_map(array: xr.DataArray, band: str, mask: float, raw: bool) -> XarrayDataCube:
+
+def generate_map(
+    array: xr.DataArray, band: str, mask: float, raw: bool, field_band: Optional[str] = None
+) -> XarrayDataCube:
     """
     Generate the variability map by taking the relative difference between all pixel values and the median value of
     the field. These differences are then categorized in bins to represent the different zones in the field.
+
+    All steps are done in place on a single float32 copy of the input, one (x, y) plane (i.e. timestep) at a time,
+    so the only other allocations are bounded by the size of one plane.
     :param array: Data array containing the pixel values
     :param band: Name of the band on which to base the variability map
     :param mask: Value that should be masked in the data array
     :param raw:  Flag indicating if the raw values should be returned
+    :param field_band: Name of the band with the field ids of the pixels, to generate the maps of multiple fields
+        at once: the pixel values are then compared with the median of their own field. The field ids are taken
+        from the input as is (not masked, original dtype), the field band of the output is only cast to float32.
     :return: DataCube containing the same set of pixels but the value is set to one of the different zones
     """
-    # Get the x array containing the time series
-    values = array.where(array != mask).astype(float32)
-    pixels = mask_values(data=values, values=[mask], drop=True)
-    medians = pixels.median(dim=["x", "y"], skipna=True)
-    min = 0.85
-    max = 1.15
-    step = 0.1
-    relative_diff = (1 + (values - medians) / medians) * 100
-
-    if raw:
-        data = relative_diff
-    else:
-        bins = np.arange(min, max + step, step)
-        bins = np.concatenate([[0], bins, [255]])
-        bins = bins * 100
-        data = np.digitize(relative_diff,
-                              bins=bins).astype(float32)
-        data = np.ma.masked_array(data=data, mask=(data == 6), fill_value=np.nan).filled()
-
-    result = array.copy()
-    result.values = data
-    return XarrayDataCube(result)
+    data = array.values.astype(float32)
+
+    # Views with the spatial axes last, to iterate over the planes of the other dimensions (time, bands)
+    spatial_axes = array.get_axis_num(["y", "x"])
+    planes = np.moveaxis(data, spatial_axes, (-2, -1))
+    input_planes = np.moveaxis(array.values, spatial_axes, (-2, -1))
+    if field_band is not None:
+        band_axis = [dim for dim in array.dims if dim not in ("y", "x")].index("bands")
+        field_index = list(array.coords["bands"].values).index(field_band)
+    bins = get_zone_bins()
+    with warnings.catch_warnings():
+        # Fully masked planes: median (and map) is nan
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for index in np.ndindex(planes.shape[:-2]):
+            if field_band is not None and index[band_axis] == field_index:
+                continue
+            plane = planes[index]
+            plane[input_planes[index] == mask] = np.nan
+            if field_band is None:
+                median = np.nanmedian(plane)
+            else:
+                fields = input_planes[index[:band_axis] + (field_index,) + index[band_axis + 1 :]]
+                median = grouped_nanmedian(plane, fields)
+            # Relative difference, in percent: (1 + (values - median) / median) * 100
+            plane -= median
+            plane /= median
+            plane += 1
+            plane *= 100
+            if not raw:
+                plane[...] = np.digitize(plane, bins=bins)
+                plane[plane == len(bins)] = np.nan
+
+    return XarrayDataCube(array.copy(deep=False, data=data))
 
 
 def apply_datacube(cube: XarrayDataCube, context) -> XarrayDataCube:
     mask_value = context.get('mask_value', 999.0)
     raw = context.get('raw', False)
     band = context.get('band', 'FAPAR')
-    return generate_map(array=cube.get_array(), band=band, mask=mask_value, raw=raw)
\ No newline at end of file
+    array = cube.get_array()
+    # Multi-field mode: the field ids are provided as an additional band
+    field_band = context.get('field_band')
+    if 'bands' not in array.coords or field_band not in array.coords['bands'].values:
+        field_band = None
+    return generate_map(array=array, band=band, mask=mask_value, raw=raw, field_band=field_band)
@@ -2,12 +2,16 @@ import logging
 import os
 import random
 import re
+import threading
 import urllib.parse
-from typing import Callable
+import warnings
+from typing import Callable, Dict, Iterator, Tuple
 
 import openeo
 import pytest
 import requests
+from apex_algorithm_qa_tools.benchmarks import ConcurrentBenchmarkRunner
+from apex_algorithm_qa_tools.scenarios import BenchmarkScenario
 
 # TODO: how to make sure the logging/printing from this plugin is actually visible by default?
 _log = logging.getLogger(__name__)
@@ -44,6 +48,19 @@ def pytest_addoption(parser):
         type=str,
         help="A regex patter to filter the available scenarios by backend.",
     )
+    parser.addoption(
+        "--concurrent-jobs",
+        action="store_true",
+        help="Submit the batch jobs of all selected benchmarks at the start and run them concurrently.",
+    )
+    parser.addoption(
+        "--max-jobs-per-backend",
+        metavar="N",
+        action="store",
+        default=2,
+        type=int,
+        help="Maximum number of concurrently running batch jobs per backend (with --concurrent-jobs).",
+    )
 
 
 def pytest_ignore_collect(collection_path, config):
@@ -110,6 +127,56 @@ def _get_client_credentials_env_var(url: str) -> str:
         raise ValueError(f"Unsupported backend: {url=} ({hostname=})")
 
 
+def _connect(
+    url: str, *, origin: str, capture_disabled: Callable
+) -> openeo.Connection:
+    """
+    Set up an authenticated connection to an openEO backend.
+
+    :param origin: identifier of the test/benchmark, to be injected
+        into requests to the backend for tracking/cross-referencing purposes
+    :param capture_disabled: context manager to temporarily disable output capturing
+    """
+    session = requests.Session()
+    session.params["_origin"] = origin
+
+    _log.info(f"Connecting to {url!r}")
+    connection = openeo.connect(url, auto_validate=False, session=session)
+    connection.default_headers["X-OpenEO-Client-Context"] = "APEx Algorithm Benchmarks"
+
+    # Authentication:
+    # In production CI context, we want to extract client credentials
+    # from environment variables (based on backend url).
+    # In absence of such environment variables, to allow local development,
+    # we fall back on a traditional `authenticate_oidc()`
+    # which automatically supports various authentication flows (device code, refresh token, client credentials, etc.)
+    auth_env_var = _get_client_credentials_env_var(url)
+    _log.info(f"Checking for {auth_env_var=} to drive auth against {url=}.")
+    if auth_env_var in os.environ:
+        client_credentials = os.environ[auth_env_var]
+        provider_id, client_id, client_secret = client_credentials.split("/", 2)
+        _log.info(f"Extracted {provider_id=} {client_id=} from {auth_env_var=}")
+        connection.authenticate_oidc_client_credentials(
+            provider_id=provider_id,
+            client_id=client_id,
+            client_secret=client_secret,
+        )
+    else:
+        # Temporarily disable output capturing,
+        # to make sure that the OIDC device code instructions are shown
+        # to the user running interactively.
+        with capture_disabled():
+            # Use a shorter max poll time by default
+            # to alleviate the default impression that the test seem to hang
+            # because of the OIDC device code poll loop.
+            max_poll_time = int(
+                os.environ.get("OPENEO_OIDC_DEVICE_CODE_MAX_POLL_TIME") or 30
+            )
+            connection.authenticate_oidc(max_poll_time=max_poll_time)
+
+    return connection
+
+
 @pytest.fixture
 def connection_factory(request, capfd) -> Callable[[], openeo.Connection]:
     """
@@ -125,45 +192,62 @@ def connection_factory(request, capfd) -> Callable[[], openeo.Connection]:
     origin = f"apex-algorithms/benchmarks/{request.session.name}/{request.node.name}"
 
     def get_connection(url: str) -> openeo.Connection:
-        session = requests.Session()
-        session.params["_origin"] = origin
+        return _connect(url, origin=origin, capture_disabled=capfd.disabled)
 
-        _log.info(f"Connecting to {url!r}")
-        connection = openeo.connect(url, auto_validate=False, session=session)
-        connection.default_headers["X-OpenEO-Client-Context"] = (
-            "APEx Algorithm Benchmarks"
-        )
+    return get_connection
 
-        # Authentication:
-        # In production CI context, we want to extract client credentials
-        # from environment variables (based on backend url).
-        # In absence of such environment variables, to allow local development,
-        # we fall back on a traditional `authenticate_oidc()`
-        # which automatically supports various authentication flows (device code, refresh token, client credentials, etc.)
-        auth_env_var = _get_client_credentials_env_var(url)
-        _log.info(f"Checking for {auth_env_var=} to drive auth against {url=}.")
-        if auth_env_var in os.environ:
-            client_credentials = os.environ[auth_env_var]
-            provider_id, client_id, client_secret = client_credentials.split("/", 2)
-            _log.info(f"Extracted {provider_id=} {client_id=} from {auth_env_var=}")
-            connection.authenticate_oidc_client_credentials(
-                provider_id=provider_id,
-                client_id=client_id,
-                client_secret=client_secret,
+
+@pytest.fixture(scope="session")
+def benchmark_runner(
+    request, tmp_path_factory
+) -> Iterator[ConcurrentBenchmarkRunner | None]:
+    """
+    Fixture for the runner of the `--concurrent-jobs` mode
+    (None when not enabled): the benchmark scenarios of all selected test items
+    are submitted at the start of the session,
+    so that their batch jobs run concurrently.
+    """
+    config = request.config
+    if not config.getoption("--concurrent-jobs"):
+        yield None
+        return
+    if hasattr(config, "workerinput"):
+        # Each xdist worker collects all items, but only runs some of them
+        warnings.warn("`--concurrent-jobs` is not supported on xdist worker nodes.")
+        yield None
+        return
+
+    override_backend = config.getoption("--override-backend")
+    backend_filter = config.getoption("--backend-filter")
+    capture_manager = config.pluginmanager.getplugin("capturemanager")
+    # Serialize connection setup (e.g. to avoid concurrent interactive OIDC flows)
+    connect_lock = threading.Lock()
+
+    # Scenarios (and test item names) of the selected benchmarks
+    selected: Dict[str, Tuple[BenchmarkScenario, str]] = {}
+    for item in request.session.items:
+        scenario = getattr(item, "callspec", None) and item.callspec.params.get(
+            "scenario"
+        )
+        if isinstance(scenario, BenchmarkScenario) and (
+            not backend_filter or re.match(backend_filter, scenario.backend)
+        ):
+            selected[scenario.id] = (scenario, item.name)
+
+    def connect(scenario: BenchmarkScenario) -> openeo.Connection:
+        with connect_lock:
+            return _connect(
+                override_backend or scenario.backend,
+                origin=f"apex-algorithms/benchmarks/{request.session.name}/{selected[scenario.id][1]}",
+                capture_disabled=capture_manager.global_and_fixture_disabled,
             )
-        else:
-            # Temporarily disable output capturing,
-            # to make sure that the OIDC device code instructions are shown
-            # to the user running interactively.
-            with capfd.disabled():
-                # Use a shorter max poll time by default
-                # to alleviate the default impression that the test seem to hang
-                # because of the OIDC device code poll loop.
-                max_poll_time = int(
-                    os.environ.get("OPENEO_OIDC_DEVICE_CODE_MAX_POLL_TIME") or 30
-                )
-                connection.authenticate_oidc(max_poll_time=max_poll_time)
-
-        return connection
 
-    return get_connection
+    runner = ConcurrentBenchmarkRunner(
+        connect=connect,
+        work_dir=tmp_path_factory.mktemp("concurrent_jobs"),
+        max_jobs_per_backend=config.getoption("--max-jobs-per-backend"),
+    )
+    for scenario, _ in selected.values():
+        runner.submit(scenario)
+    yield runner
+    runner.shutdown()
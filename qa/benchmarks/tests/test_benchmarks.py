@@ -5,16 +5,10 @@ from pathlib import Path
 import openeo
 import pytest
 from apex_algorithm_qa_tools.benchmarks import (
-    analyse_results_comparison_exception,
-    collect_metrics_from_job_metadata,
-    collect_metrics_from_results_metadata,
+    ConcurrentBenchmarkRunner,
+    run_benchmark_scenario,
 )
-from apex_algorithm_qa_tools.scenarios import (
-    BenchmarkScenario,
-    download_reference_data,
-    get_benchmark_scenarios,
-)
-from openeo.testing.results import assert_job_results_allclose
+from apex_algorithm_qa_tools.scenarios import BenchmarkScenario, get_scenario_registry
 
 _log = logging.getLogger(__name__)
 
@@ -24,12 +18,13 @@ _log = logging.getLogger(__name__)
     [
         # Use scenario id as parameterization id to give nicer test names.
         pytest.param(uc, id=uc.id)
-        for uc in get_benchmark_scenarios()
+        for uc in get_scenario_registry()
     ],
 )
 def test_run_benchmark(
     scenario: BenchmarkScenario,
     connection_factory,
+    benchmark_runner: ConcurrentBenchmarkRunner | None,
     tmp_path: Path,
     track_metric,
     track_phase,
@@ -38,65 +33,37 @@ def test_run_benchmark(
 ):
     track_metric("scenario_id", scenario.id)
 
-    with track_phase(phase="connect"):
+    backend_filter = request.config.getoption("--backend-filter")
+    if backend_filter and not re.match(backend_filter, scenario.backend):
+        # TODO apply filter during scenario retrieval, but seems to be hard to retrieve cli param
+        pytest.skip(
+            f"skipping scenario {scenario.id} because backend {scenario.backend} does not match filter {backend_filter!r}"
+        )
+
+    if benchmark_runner and scenario.id in benchmark_runner:
+        # Concurrent mode: scenario already running in the background
+        run = benchmark_runner.result(scenario.id)
+        run.report(
+            tmp_path=tmp_path,
+            track_metric=track_metric,
+            collect_assets=upload_assets_on_fail,
+        )
+        return
+
+    def connect() -> openeo.Connection:
         # Check if a backend override has been provided via cli options.
         override_backend = request.config.getoption("--override-backend")
-        backend_filter = request.config.getoption("--backend-filter")
-        if backend_filter and not re.match(backend_filter, scenario.backend):
-            # TODO apply filter during scenario retrieval, but seems to be hard to retrieve cli param
-            pytest.skip(
-                f"skipping scenario {scenario.id} because backend {scenario.backend} does not match filter {backend_filter!r}"
-            )
         backend = scenario.backend
         if override_backend:
             _log.info(f"Overriding backend URL with {override_backend!r}")
             backend = override_backend
+        return connection_factory(url=backend)
 
-        connection: openeo.Connection = connection_factory(url=backend)
-
-    with track_phase(phase="create-job"):
-        # TODO #14 scenario option to use synchronous instead of batch job mode?
-        job = connection.create_job(
-            process_graph=scenario.process_graph,
-            title=f"APEx benchmark {scenario.id}",
-            additional=scenario.job_options,
-        )
-        track_metric("job_id", job.job_id)
-
-    with track_phase(phase="run-job"):
-        # TODO: monitor timing and progress
-        # TODO: abort excessively long batch jobs? https://github.com/Open-EO/openeo-python-client/issues/589
-        job.start_and_wait()
-        # TODO: separate "job started" and run phases?
-
-    with track_phase(phase="collect-metadata"):
-        collect_metrics_from_job_metadata(job, track_metric=track_metric)
-
-        results = job.get_results()
-        collect_metrics_from_results_metadata(results, track_metric=track_metric)
-
-    with track_phase(phase="download-actual"):
-        # Download actual results
-        actual_dir = tmp_path / "actual"
-        paths = results.download_files(target=actual_dir, include_stac_metadata=True)
-
-        # Upload assets on failure
-        upload_assets_on_fail(*paths)
-
-    with track_phase(phase="download-reference"):
-        reference_dir = download_reference_data(
-            scenario=scenario, reference_dir=tmp_path / "reference"
-        )
-
-    with track_phase(
-        phase="compare", describe_exception=analyse_results_comparison_exception
-    ):
-        # Compare actual results with reference data
-        assert_job_results_allclose(
-            actual=actual_dir,
-            expected=reference_dir,
-            tmp_path=tmp_path,
-            rtol=scenario.reference_options.get("rtol", 1e-6),
-            atol=scenario.reference_options.get("atol", 1e-6),
-            pixel_tolerance=scenario.reference_options.get("pixel_tolerance", 0.0),
-        )
+    run_benchmark_scenario(
+        scenario,
+        connect=connect,
+        work_dir=tmp_path,
+        track_metric=track_metric,
+        track_phase=track_phase,
+        collect_assets=upload_assets_on_fail,
+    )
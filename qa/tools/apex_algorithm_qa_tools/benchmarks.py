@@ -2,10 +2,34 @@
 Reusable utilities to use in benchmarking
 """
 
-from typing import Union
+import collections
+import concurrent.futures
+import contextlib
+import dataclasses
+import logging
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Tuple, Union
 
-from apex_algorithm_qa_tools.pytest.pytest_track_metrics import MetricsTracker
-from openeo.rest.job import BatchJob, JobResults
+import openeo
+import requests
+from apex_algorithm_qa_tools.downloads import DownloadCache
+from apex_algorithm_qa_tools.pytest.pytest_track_metrics import (
+    MetricsTracker,
+    phase_tracker,
+)
+from apex_algorithm_qa_tools.scenarios import BenchmarkScenario, download_reference_data
+from openeo.rest import JobFailedException, OpenEoApiPlainError
+from openeo.rest.job import (
+    DEFAULT_JOB_STATUS_POLL_SOFT_ERROR_MAX,
+    BatchJob,
+    JobResults,
+)
+from openeo.testing.results import assert_job_results_allclose
+
+_log = logging.getLogger(__name__)
 
 
 def collect_metrics_from_job_metadata(
@@ -56,3 +80,297 @@ def analyse_results_comparison_exception(exc: Exception) -> Union[str, None]:
     if isinstance(exc, AssertionError):
         if "Differing 'derived_from' links" in str(exc):
             return "derived_from-change"
+
+
+def run_benchmark_scenario(
+    scenario: BenchmarkScenario,
+    *,
+    connect: Callable[[], openeo.Connection],
+    work_dir: Path,
+    track_metric: MetricsTracker,
+    track_phase: Callable,
+    collect_assets: Callable[..., None] = lambda *paths: None,
+    run_job: Callable[[BatchJob], None] = lambda job: job.start_and_wait(),
+    job_slot: Union[Callable[[BatchJob], ContextManager], None] = None,
+    download_cache: Union[DownloadCache, None] = None,
+):
+    """
+    Run a benchmark scenario: create and run its batch job,
+    download the actual results and reference data (to `work_dir`)
+    and compare them.
+
+    :param connect: function to get a connection to the backend
+    :param collect_assets: function to register (actual result) files,
+        e.g. for upload on failure
+    :param run_job: function to start a created job and wait for its completion
+    :param job_slot: function to get a context manager to hold while running the job,
+        e.g. to wait for a free slot on the backend.
+        The wait is tracked as separate "wait-for-backend" phase (and metric),
+        so that the "run-job" phase only covers the job itself.
+    """
+    with track_phase(phase="connect"):
+        connection = connect()
+
+    with track_phase(phase="create-job"):
+        # TODO #14 scenario option to use synchronous instead of batch job mode?
+        job = connection.create_job(
+            process_graph=scenario.process_graph,
+            title=f"APEx benchmark {scenario.id}",
+            additional=scenario.job_options,
+        )
+        track_metric("job_id", job.job_id)
+
+    with contextlib.ExitStack() as slot:
+        if job_slot:
+            with track_phase(phase="wait-for-backend"):
+                wait_start = time.monotonic()
+                slot.enter_context(job_slot(job))
+                track_metric("job:backend-wait:seconds", time.monotonic() - wait_start)
+
+        with track_phase(phase="run-job"):
+            # TODO: monitor timing and progress
+            # TODO: abort excessively long batch jobs? https://github.com/Open-EO/openeo-python-client/issues/589
+            run_job(job)
+            # TODO: separate "job started" and run phases?
+
+    with track_phase(phase="collect-metadata"):
+        collect_metrics_from_job_metadata(job, track_metric=track_metric)
+
+        results = job.get_results()
+        collect_metrics_from_results_metadata(results, track_metric=track_metric)
+
+    with track_phase(phase="download-actual"):
+        # Download actual results
+        actual_dir = work_dir / "actual"
+        paths = results.download_files(target=actual_dir, include_stac_metadata=True)
+
+        # Upload assets on failure
+        collect_assets(*paths)
+
+    with track_phase(phase="download-reference"):
+        reference_dir = download_reference_data(
+            scenario=scenario,
+            reference_dir=work_dir / "reference",
+            download_cache=download_cache,
+        )
+
+    with track_phase(
+        phase="compare", describe_exception=analyse_results_comparison_exception
+    ):
+        # Compare actual results with reference data
+        assert_job_results_allclose(
+            actual=actual_dir,
+            expected=reference_dir,
+            tmp_path=work_dir,
+            rtol=scenario.reference_options.get("rtol", 1e-6),
+            atol=scenario.reference_options.get("atol", 1e-6),
+            pixel_tolerance=scenario.reference_options.get("pixel_tolerance", 0.0),
+        )
+
+
+class RecordingTracker:
+    """
+    Record `track_metric`/`track_phase` calls (e.g. of a benchmark running
+    in a background thread) to replay them later with a real metrics tracker.
+    """
+
+    def __init__(self):
+        self.metrics: List[Tuple[str, Any, bool]] = []
+        self.track_phase = phase_tracker(self.track_metric)
+
+    def track_metric(self, name: str, value: Any, *, update: bool = False):
+        self.metrics.append((name, value, update))
+
+    def replay(self, track_metric: MetricsTracker):
+        for name, value, update in self.metrics:
+            track_metric(name, value, update=update)
+
+
+@dataclasses.dataclass
+class BenchmarkRun:
+    """Outcome of a benchmark scenario run by `ConcurrentBenchmarkRunner`."""
+
+    scenario: BenchmarkScenario
+    work_dir: Path
+    tracker: RecordingTracker
+    assets: List[Path] = dataclasses.field(default_factory=list)
+    error: Union[Exception, None] = None
+
+    def report(
+        self,
+        *,
+        tmp_path: Path,
+        track_metric: MetricsTracker,
+        collect_assets: Callable[..., None] = lambda *paths: None,
+    ):
+        """
+        Report the run from within the benchmark test:
+        move the downloaded/generated files to the test's `tmp_path`,
+        register the assets, replay the tracked metrics
+        and re-raise the exception of the run (if any).
+        """
+        for path in list(self.work_dir.iterdir()):
+            shutil.move(path, tmp_path / path.name)
+        collect_assets(*(tmp_path / p.relative_to(self.work_dir) for p in self.assets))
+        self.tracker.replay(track_metric)
+        if self.error:
+            raise self.error
+
+
+class BenchmarkRunnerStopped(RuntimeError):
+    pass
+
+
+class ConcurrentBenchmarkRunner:
+    """
+    Run benchmark scenarios concurrently in background threads:
+    the batch jobs of all submitted scenarios are created immediately,
+    started with bounded parallelism per backend and polled concurrently.
+    The download and comparison phases of a scenario run as soon as its job is done.
+
+    Use `result()` to wait for the `BenchmarkRun` of a scenario
+    (e.g. from its benchmark test).
+
+    :param connect: function to get a connection for a scenario
+    :param work_dir: directory to create the work directories of the scenarios in
+    :param max_jobs_per_backend: maximum number of running batch jobs per backend
+    :param poll_interval: seconds between job status polls
+    :param soft_error_max: maximum number of soft errors (temporary connection
+        or service availability issues) to tolerate while polling a job,
+        like `BatchJob.start_and_wait()`
+    """
+
+    def __init__(
+        self,
+        *,
+        connect: Callable[[BenchmarkScenario], openeo.Connection],
+        work_dir: Path,
+        max_jobs_per_backend: int = 2,
+        poll_interval: float = 30,
+        soft_error_max: int = DEFAULT_JOB_STATUS_POLL_SOFT_ERROR_MAX,
+        download_cache: Union[DownloadCache, None] = None,
+    ):
+        self._connect = connect
+        self._work_dir = Path(work_dir)
+        self._max_jobs_per_backend = max_jobs_per_backend
+        self._poll_interval = poll_interval
+        self._soft_error_max = soft_error_max
+        self._download_cache = download_cache
+        self._runs: Dict[str, concurrent.futures.Future] = {}
+        self._threads: List[threading.Thread] = []
+        self._backend_slots: Dict[str, threading.Semaphore] = collections.defaultdict(
+            lambda: threading.Semaphore(self._max_jobs_per_backend)
+        )
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def __contains__(self, scenario_id: str) -> bool:
+        return scenario_id in self._runs
+
+    def submit(self, scenario: BenchmarkScenario):
+        """Start running the scenario in the background."""
+        if scenario.id in self._runs:
+            raise ValueError(f"Scenario {scenario.id!r} already submitted")
+        future = concurrent.futures.Future()
+        self._runs[scenario.id] = future
+        thread = threading.Thread(
+            target=self._run,
+            args=(scenario, future),
+            name=f"benchmark-{scenario.id}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def result(
+        self, scenario_id: str, timeout: Union[float, None] = None
+    ) -> BenchmarkRun:
+        """Wait for the run of the given scenario to complete."""
+        return self._runs[scenario_id].result(timeout=timeout)
+
+    def shutdown(self):
+        """Stop polling (and stop the running jobs) and wait for all threads."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, scenario: BenchmarkScenario, future: concurrent.futures.Future):
+        work_dir = self._work_dir / scenario.id
+        work_dir.mkdir(parents=True, exist_ok=True)
+        tracker = RecordingTracker()
+        run = BenchmarkRun(scenario=scenario, work_dir=work_dir, tracker=tracker)
+        try:
+            run_benchmark_scenario(
+                scenario,
+                connect=lambda: self._connect(scenario),
+                work_dir=work_dir,
+                track_metric=tracker.track_metric,
+                track_phase=tracker.track_phase,
+                collect_assets=lambda *paths: run.assets.extend(paths),
+                run_job=self._run_job,
+                job_slot=self._job_slot,
+                download_cache=self._download_cache,
+            )
+        except Exception as e:
+            _log.warning(f"Benchmark run of {scenario.id!r} failed: {e!r}")
+            run.error = e
+        future.set_result(run)
+
+    @contextlib.contextmanager
+    def _job_slot(self, job: BatchJob):
+        """Wait for (and hold) a free slot on the backend of the job."""
+        with self._lock:
+            slots = self._backend_slots[job.connection.root_url]
+        while not slots.acquire(timeout=1):
+            if self._stopped.is_set():
+                raise BenchmarkRunnerStopped(f"Job {job.job_id!r} was not started")
+        try:
+            yield
+        finally:
+            slots.release()
+
+    @staticmethod
+    def _is_soft_error(error: Exception) -> bool:
+        """Temporary polling error (same as tolerated by `BatchJob.start_and_wait()`)."""
+        if isinstance(error, OpenEoApiPlainError):
+            return error.http_status_code in {502, 503}
+        return isinstance(error, requests.ConnectionError)
+
+    def _run_job(self, job: BatchJob):
+        job.start()
+        soft_errors = 0
+        while not self._stopped.wait(self._poll_interval):
+            try:
+                status = job.status()
+            except Exception as e:
+                if not self._is_soft_error(e) or soft_errors >= self._soft_error_max:
+                    raise
+                soft_errors += 1
+                _log.warning(
+                    f"Soft error {soft_errors} while polling job {job.job_id!r}: {e!r}"
+                )
+                continue
+            _log.info(f"Job {job.job_id!r}: {status}")
+            if status == "finished":
+                return
+            if status in {"error", "canceled"}:
+                self._log_error_logs(job)
+                raise JobFailedException(
+                    f"Batch job {job.job_id!r} didn't finish successfully. Status: {status}",
+                    job=job,
+                )
+        try:
+            job.stop()
+        except Exception as e:
+            _log.warning(f"Failed to stop job {job.job_id!r}: {e!r}")
+        raise BenchmarkRunnerStopped(f"Stopped polling job {job.job_id!r}")
+
+    @staticmethod
+    def _log_error_logs(job: BatchJob):
+        try:
+            logs = job.logs(level="error")
+        except Exception as e:
+            _log.warning(f"Failed to get error logs of job {job.job_id!r}: {e!r}")
+            return
+        messages = "\n".join(str(entry.get("message")) for entry in logs)
+        _log.error(f"Batch job {job.job_id!r} failed. Error logs:\n{messages}")
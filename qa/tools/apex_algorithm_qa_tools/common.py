@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import functools
+import json
 import logging
+import os
 import re
 from pathlib import Path
 from typing import Iterator
 
+import jsonschema
+
 # TODO #15 Flatten apex_algorithm_qa_tools to a single module and push as much functionality to https://github.com/ESA-APEx/esa-apex-toolbox-python
 
 
@@ -35,6 +40,46 @@ def get_project_root() -> Path:
     raise RuntimeError("Could not determine project root directory.")
 
 
+def get_cache_dir(name: str) -> Path:
+    """
+    Persistent cache directory (e.g. to keep between CI runs) for the given kind of data:
+    a subfolder of `APEX_ALGORITHMS_QA_CACHE_DIR` (env var) or `~/.cache/apex_algorithm_qa_tools`.
+    """
+    root = (
+        os.environ.get("APEX_ALGORITHMS_QA_CACHE_DIR")
+        or Path.home() / ".cache" / "apex_algorithm_qa_tools"
+    )
+    path = Path(root) / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def create_s3_client():
+    """
+    S3 client configured from the environment:
+    credentials from `APEX_ALGORITHMS_S3_ACCESS_KEY_ID` and `APEX_ALGORITHMS_S3_SECRET_ACCESS_KEY`,
+    endpoint from `APEX_ALGORITHMS_S3_ENDPOINT_URL`
+    (with the classic `AWS_*` env vars as fallback).
+    """
+    import boto3
+    import botocore.config
+
+    return boto3.client(
+        service_name="s3",
+        aws_access_key_id=os.environ.get("APEX_ALGORITHMS_S3_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.environ.get(
+            "APEX_ALGORITHMS_S3_SECRET_ACCESS_KEY"
+        ),
+        endpoint_url=os.environ.get("APEX_ALGORITHMS_S3_ENDPOINT_URL"),
+        config=botocore.config.Config(
+            # Disable new checksum validation feature
+            # (not supported yet by third-party S3 implementations)
+            request_checksum_calculation="when_required",
+            response_checksum_validation="when_required",
+        ),
+    )
+
+
 def assert_no_github_feature_branch_refs(href: str) -> None:
     """
     Check that GitHub links do not point to (ephemeral) feature branches.
@@ -64,3 +109,21 @@ def assert_no_github_feature_branch_refs(href: str) -> None:
             raise ValueError(
                 f"Links should not point to ephemeral feature branches: found {match.group(1)!r} in {href!r}"
             )
+
+
+@functools.lru_cache(maxsize=16)
+def _load_json_schema_validator(path: str, mtime_ns: int) -> jsonschema.protocols.Validator:
+    with open(path, encoding="utf8") as f:
+        schema = json.load(f)
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def get_json_schema_validator(path: str | Path) -> jsonschema.protocols.Validator:
+    """
+    Process-wide compiled JSON Schema validator of the given schema file
+    (only reloaded when the file is modified).
+    """
+    path = Path(path).absolute()
+    return _load_json_schema_validator(str(path), path.stat().st_mtime_ns)
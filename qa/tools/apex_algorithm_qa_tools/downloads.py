@@ -0,0 +1,359 @@
+"""
+Downloading of (benchmark reference) data files through a persistent local cache.
+
+Supported sources:
+
+- `http://` and `https://` URLs
+- `s3://bucket/key` URLs, with the same S3 configuration (env vars) as
+  the `pytest_upload_assets` plugin (see `create_s3_client`)
+- `file://` URLs and local paths (copied directly, without cache)
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator
+from urllib.parse import unquote, urlparse
+
+import requests
+from apex_algorithm_qa_tools.common import create_s3_client, get_cache_dir
+
+_log = logging.getLogger(__name__)
+
+
+class DownloadError(IOError):
+    pass
+
+
+class DownloadCache:
+    """
+    Local cache of downloaded files, keyed by (hash of the) URL:
+
+    - cached files are revalidated with conditional requests (ETag/Last-Modified)
+      and their size is checked, so unchanged files are not downloaded again
+    - an interrupted download is resumed (Range request) on the next attempt
+    - files are placed at their target as hardlink to the cached file (or copy if not possible)
+
+    Remote sources are handled by a fetcher per URL scheme (see `fetchers`),
+    which can be extended with additional schemes.
+
+    Cache entry of a URL: the data file `<key>`, its metadata `<key>.json`,
+    the lock file `<key>.lock` and, while downloading, the partial data `<key>.part`
+    (with metadata `<key>.part.json`).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | None = None,
+        *,
+        session: requests.Session | None = None,
+        timeout: float = 60,
+        max_workers: int = 4,
+        chunk_size: int = 1024 * 1024,
+        s3_client=None,
+    ):
+        self.cache_dir = Path(cache_dir or get_cache_dir("downloads"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._s3_client = s3_client
+        # Fetcher per URL scheme: download the URL into the cache entry with given key
+        self.fetchers: Dict[str, Callable[[str, str], Path]] = {
+            "http": self._fetch_http,
+            "https": self._fetch_http,
+            "s3": self._fetch_s3,
+        }
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf8")).hexdigest()
+
+    @staticmethod
+    def _read_meta(path: Path) -> dict | None:
+        try:
+            return json.loads(path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(path: Path, meta: dict):
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(meta), encoding="utf8")
+        os.replace(tmp_path, path)
+
+    @contextlib.contextmanager
+    def _exclusive(self, url: str) -> Iterator[None]:
+        """
+        Exclusive access to the cache entry of the URL, across threads and processes.
+
+        Processes lock the (persistent) lock file of the entry with `flock`,
+        which the OS releases when the holder dies: no stale locks to break.
+        """
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            lock_path = self.cache_dir / (self._key(url) + ".lock")
+            with open(lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            self._s3_client = create_s3_client()
+        return self._s3_client
+
+    def fetch(self, url: str) -> Path:
+        """Get the (validated) cached file of the URL, downloading it if necessary."""
+        scheme = urlparse(url).scheme
+        if scheme not in self.fetchers:
+            raise ValueError(f"Unsupported download source {url!r}")
+        with self._exclusive(url):
+            return self.fetchers[scheme](url, self._key(url))
+
+    def _cached_meta(self, key: str) -> dict | None:
+        """Metadata of the (complete) cache entry, if it is consistent with the data file."""
+        data_path = self.cache_dir / key
+        meta = self._read_meta(self.cache_dir / (key + ".json"))
+        if meta and data_path.exists() and data_path.stat().st_size == meta.get("size"):
+            return meta
+        return None
+
+    def _resumable_part(self, key: str, etag: str | None) -> int:
+        """Size of the partial download to resume from (0: start from scratch)."""
+        part_path = self.cache_dir / (key + ".part")
+        part_meta = self._read_meta(self.cache_dir / (key + ".part.json"))
+        if part_path.exists() and part_meta and part_meta.get("etag"):
+            if etag is None or part_meta["etag"] == etag:
+                return part_path.stat().st_size
+        return 0
+
+    def _fetch_http(self, url: str, key: str) -> Path:
+        meta = self._cached_meta(key)
+        validators = {}
+        if meta and meta.get("etag"):
+            validators["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            validators["If-Modified-Since"] = meta["last_modified"]
+        if meta and not validators:
+            # No validators to revalidate with: trust the cached file
+            return self.cache_dir / key
+
+        # Ask for the file as is (no compression), so its size can be checked
+        # and an interrupted download can be resumed
+        headers = {"Accept-Encoding": "identity", **validators}
+        resume_from = self._resumable_part(key, etag=None)
+        if resume_from:
+            # Only resume if the remote file did not change in the meantime
+            part_meta = self._read_meta(self.cache_dir / (key + ".part.json"))
+            headers["Range"] = f"bytes={resume_from}-"
+            headers["If-Range"] = part_meta["etag"]
+
+        with self.session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as resp:
+            if resp.status_code == 304 and meta:
+                _log.info(f"Cached download of {url} is still valid")
+                return self.cache_dir / key
+            if resp.status_code == 416:
+                # Range not satisfiable (e.g. remote file shrunk): start over
+                self._discard_part(key)
+                return self._fetch_http(url, key)
+            resp.raise_for_status()
+
+            # The server might still compress the response: the content is then decoded
+            # while reading, so its size is not the Content-Length and it can not be resumed
+            encoded = (
+                resp.headers.get("Content-Encoding", "identity").lower() != "identity"
+            )
+            if encoded and resp.status_code == 206:
+                self._discard_part(key)
+                return self._fetch_http(url, key)
+
+            meta = {
+                "url": url,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+            }
+            if encoded:
+                size = None
+                resume_from = 0
+            elif resp.status_code == 206:
+                match = re.match(
+                    r"bytes (\d+)-\d+/(\d+|\*)", resp.headers.get("Content-Range", "")
+                )
+                if not match or int(match.group(1)) != resume_from:
+                    raise DownloadError(
+                        f"Unexpected Content-Range {resp.headers.get('Content-Range')!r}"
+                        f" for {url} (resuming from {resume_from})"
+                    )
+                size = int(match.group(2)) if match.group(2) != "*" else None
+            else:
+                size = resp.headers.get("Content-Length")
+                size = int(size) if size is not None else None
+                resume_from = 0
+            return self._store(
+                url,
+                key,
+                meta=meta,
+                chunks=resp.iter_content(chunk_size=self.chunk_size),
+                resume_from=resume_from,
+                size=size,
+                resumable=not encoded,
+            )
+
+    def _fetch_s3(self, url: str, key: str) -> Path:
+        parsed = urlparse(url)
+        bucket, object_key = parsed.netloc, unquote(parsed.path.lstrip("/"))
+        head = self.s3_client.head_object(Bucket=bucket, Key=object_key)
+        etag, size = head["ETag"], head["ContentLength"]
+        meta = self._cached_meta(key)
+        if meta and meta.get("etag") == etag and meta.get("size") == size:
+            _log.info(f"Cached download of {url} is still valid")
+            return self.cache_dir / key
+
+        resume_from = self._resumable_part(key, etag=etag)
+        if resume_from >= size:
+            self._discard_part(key)
+            resume_from = 0
+        kwargs = (
+            {"Range": f"bytes={resume_from}-", "IfMatch": etag} if resume_from else {}
+        )
+        if resume_from:
+            _log.info(f"Resuming download of {url} from byte {resume_from}")
+        resp = self.s3_client.get_object(Bucket=bucket, Key=object_key, **kwargs)
+        return self._store(
+            url,
+            key,
+            meta={"url": url, "etag": etag, "last_modified": None},
+            chunks=resp["Body"].iter_chunks(chunk_size=self.chunk_size),
+            resume_from=resume_from,
+            size=size,
+        )
+
+    def _discard_part(self, key: str):
+        (self.cache_dir / (key + ".part")).unlink(missing_ok=True)
+        (self.cache_dir / (key + ".part.json")).unlink(missing_ok=True)
+
+    def _store(
+        self,
+        url: str,
+        key: str,
+        *,
+        meta: dict,
+        chunks: Iterable[bytes],
+        resume_from: int,
+        size: int | None,
+        resumable: bool = True,
+    ) -> Path:
+        """
+        Write the downloaded chunks to the partial file, and complete the cache entry.
+
+        :param resumable: whether the partial file can be resumed (Range request) after an interruption
+        """
+        part_path = self.cache_dir / (key + ".part")
+        # Without ETag, the partial file is not resumed (see `_resumable_part`)
+        part_meta = meta if resumable else {**meta, "etag": None}
+        self._write_meta(self.cache_dir / (key + ".part.json"), part_meta)
+        with part_path.open("ab" if resume_from else "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        received = part_path.stat().st_size
+        if size is not None and received != size:
+            # Keep the partial file to resume from on the next attempt
+            raise DownloadError(
+                f"Incomplete download of {url}: got {received} bytes, expected {size}"
+            )
+
+        data_path = self.cache_dir / key
+        os.replace(part_path, data_path)
+        self._write_meta(self.cache_dir / (key + ".json"), {**meta, "size": received})
+        (self.cache_dir / (key + ".part.json")).unlink(missing_ok=True)
+        return data_path
+
+    def download(self, url: str, path: Path) -> Path:
+        """
+        Download the URL (through the cache) to the given path.
+        Local sources (`file://` URL or path) are copied directly.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        local = get_local_path(url)
+        if local is not None:
+            if not local.is_file():
+                raise FileNotFoundError(f"Local download source {url!r} not found")
+            if local.resolve() != path.resolve():
+                path.unlink(missing_ok=True)
+                shutil.copyfile(local, path)
+            return path
+
+        cached = self.fetch(url)
+        path.unlink(missing_ok=True)
+        try:
+            os.link(cached, path)
+        except OSError:
+            # E.g. cache on another file system
+            shutil.copyfile(cached, path)
+        return path
+
+    def download_many(self, downloads: Dict[Path, str]) -> Dict[Path, Path | Exception]:
+        """
+        Concurrently download the given URLs (per target path).
+
+        :return: per target path: the path or the download error
+        """
+        results: Dict[Path, Path | Exception] = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            futures = {
+                executor.submit(self.download, url, path): path
+                for path, url in downloads.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+        return {path: results[path] for path in downloads}
+
+
+def get_local_path(source: str) -> Path | None:
+    """Local path of a `file://` URL or plain path (None for other URLs)."""
+    parsed = urlparse(source)
+    if parsed.scheme == "file":
+        return Path(unquote(parsed.path))
+    if not parsed.scheme:
+        return Path(source)
+    return None
+
+
+_download_cache: DownloadCache | None = None
+
+
+def get_download_cache() -> DownloadCache:
+    """Process-wide download cache (in the persistent cache directory)."""
+    global _download_cache
+    if _download_cache is None:
+        _download_cache = DownloadCache()
+    return _download_cache
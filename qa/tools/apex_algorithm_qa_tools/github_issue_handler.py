@@ -14,8 +14,8 @@ from typing import Any, Dict, List, Optional, Union
 import requests
 from apex_algorithm_qa_tools.scenarios import (
     BenchmarkScenario,
-    get_benchmark_scenarios,
     get_project_root,
+    get_scenario_registry,
 )
 
 logger = logging.getLogger(__name__)
@@ -417,18 +417,10 @@ class GithubIssueHandler:
             token=github_token or self.github_context.token,
         )
         self.issue_label = issue_label
-        self._benchmark_scenarios = get_benchmark_scenarios()
+        self._benchmark_scenarios = get_scenario_registry()
 
     def get_benchmark_scenarios(self, scenario_id: str) -> BenchmarkScenario | None:
-        matches = [s for s in self._benchmark_scenarios if s.id == scenario_id]
-        if len(matches) == 1:
-            return matches[0]
-        elif len(matches) == 0:
-            return None
-        else:
-            raise ValueError(
-                f"Found {len(matches)} benchmark scenarios with {scenario_id=}"
-            )
+        return self._benchmark_scenarios.get(scenario_id)
 
     def main(self) -> None:
         """
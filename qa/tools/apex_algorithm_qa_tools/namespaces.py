@@ -0,0 +1,205 @@
+"""
+Verification of the remote process definitions (UDPs) that benchmark scenarios
+refer to through the `namespace` URL of their process graph nodes.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple
+
+import requests
+from apex_algorithm_qa_tools.common import get_cache_dir
+
+if TYPE_CHECKING:
+    from apex_algorithm_qa_tools.scenarios import BenchmarkScenario
+
+_log = logging.getLogger(__name__)
+
+
+class JsonDocumentCache:
+    """
+    Fetch JSON documents over a pooled HTTP session:
+
+    - each URL is only fetched once per process (in-memory cache)
+    - documents are also cached on disk, and revalidated with conditional requests
+      (ETag/Last-Modified), so unchanged documents are not downloaded again
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | None = None,
+        *,
+        session: requests.Session | None = None,
+        timeout: float = 30,
+        max_workers: int = 8,
+    ):
+        self.cache_dir = Path(cache_dir or get_cache_dir("json_documents"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._documents: Dict[str, dict] = {}
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _cache_path(self, url: str) -> Path:
+        return self.cache_dir / (
+            hashlib.sha256(url.encode("utf8")).hexdigest() + ".json"
+        )
+
+    def _fetch(self, url: str) -> dict:
+        cache_path = self._cache_path(url)
+        cached = None
+        if cache_path.exists():
+            try:
+                cached = json.loads(cache_path.read_text(encoding="utf8"))
+            except ValueError:
+                _log.warning(f"Ignoring invalid cache entry {cache_path} for {url}")
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        if resp.status_code == 304 and cached:
+            _log.debug(f"Cached document of {url} is still valid")
+            return cached["document"]
+        resp.raise_for_status()
+        document = resp.json()
+
+        if resp.headers.get("ETag") or resp.headers.get("Last-Modified"):
+            entry = {
+                "url": url,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "document": document,
+            }
+            # Atomic write: concurrent processes (e.g. pytest-xdist workers) never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, cache_path)
+        return document
+
+    def get(self, url: str) -> dict:
+        """Get the JSON document at the given URL (fetched at most once per process)."""
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            if url not in self._documents:
+                self._documents[url] = self._fetch(url)
+            return self._documents[url]
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, dict | Exception]:
+        """Get the documents of all (distinct) URLs concurrently: the document or the fetch error per URL."""
+        urls = list(dict.fromkeys(urls))
+        results: Dict[str, dict | Exception] = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            futures = {executor.submit(self.get, url): url for url in urls}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+        return {url: results[url] for url in urls}
+
+
+_namespace_cache: JsonDocumentCache | None = None
+
+
+def get_namespace_cache() -> JsonDocumentCache:
+    """Process-wide cache of namespace (process definition) documents."""
+    global _namespace_cache
+    if _namespace_cache is None:
+        _namespace_cache = JsonDocumentCache(cache_dir=get_cache_dir("namespaces"))
+    return _namespace_cache
+
+
+def iter_namespace_nodes(scenario: BenchmarkScenario) -> Iterator[Tuple[str, dict]]:
+    """Process graph nodes (id and node) of the scenario with a (remote) https namespace URL."""
+    for node_id, node in scenario.process_graph.items():
+        if isinstance(node, dict) and re.match(
+            "^https://", node.get("namespace") or ""
+        ):
+            yield node_id, node
+
+
+def check_process_definition(node: dict, definition: dict) -> List[str]:
+    """
+    Check a process graph node against the process definition of its namespace:
+    process id, and arguments against the declared parameters.
+
+    :return: list of problems (empty if OK)
+    """
+    # TODO: also support process listings?
+    problems = []
+    if definition.get("id") != node["process_id"]:
+        problems.append(
+            f"process id {node['process_id']!r} does not match process definition id {definition.get('id')!r}"
+        )
+    parameters = {p["name"]: p for p in definition.get("parameters", [])}
+    for name in node["arguments"]:
+        if name not in parameters:
+            problems.append(
+                f"argument {name!r} is not a parameter of {definition.get('id')!r}"
+            )
+    for name, parameter in parameters.items():
+        if (
+            name not in node["arguments"]
+            and not parameter.get("optional")
+            and "default" not in parameter
+        ):
+            problems.append(
+                f"missing required parameter {name!r} of {definition.get('id')!r}"
+            )
+    return problems
+
+
+def verify_namespaces(
+    scenarios: Iterable[BenchmarkScenario],
+    cache: JsonDocumentCache | None = None,
+) -> Dict[str, List[str]]:
+    """
+    Verify the namespace nodes of all given scenarios in bulk:
+    all distinct namespace URLs are fetched once, concurrently.
+
+    :return: list of problems per scenario id (only for scenarios with problems)
+    """
+    cache = cache or get_namespace_cache()
+    nodes = [
+        (scenario, node_id, node)
+        for scenario in scenarios
+        for node_id, node in iter_namespace_nodes(scenario)
+    ]
+    definitions = cache.get_many(node["namespace"] for _, _, node in nodes)
+
+    problems: Dict[str, List[str]] = {}
+    for scenario, node_id, node in nodes:
+        definition = definitions[node["namespace"]]
+        if isinstance(definition, Exception):
+            node_problems = [
+                f"failed to get process definition {node['namespace']!r}: {definition!r}"
+            ]
+        else:
+            node_problems = check_process_definition(node, definition)
+        problems.setdefault(scenario.id, []).extend(
+            f"node {node_id!r}: {p}" for p in node_problems
+        )
+    return {scenario_id: p for scenario_id, p in problems.items() if p}
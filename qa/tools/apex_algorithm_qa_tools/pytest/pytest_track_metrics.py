@@ -47,6 +47,10 @@ Usage:
         (Note that the classic `AWS_ENDPOINT_URL` is also supported as fallback).
     - CLI option `--track-metrics-parquet-partitioning=PARTITIONING`
       to define how to partition the Parquet files.
+
+-   Parallel test runs with pytest-xdist (e.g. `pytest -n auto`) are supported:
+    metrics are collected on the worker nodes, passed along with the test reports
+    and reported by the controller node.
 """
 
 import contextlib
@@ -108,10 +112,6 @@ def pytest_addoption(parser: pytest.Parser):
 
 
 def pytest_configure(config):
-    if hasattr(config, "workerinput"):
-        warnings.warn("`track_metrics` plugin is not supported on xdist worker nodes.")
-        return
-
     track_metrics_json = config.getoption("--track-metrics-json")
 
     track_metrics_parquet = config.getoption("--track-metrics-parquet")
@@ -125,7 +125,18 @@ def pytest_configure(config):
         "--track-metrics-parquet-partitioning", None
     )
 
-    if track_metrics_json or track_metrics_parquet or track_metrics_parquet_s3_bucket:
+    if not (
+        track_metrics_json or track_metrics_parquet or track_metrics_parquet_s3_bucket
+    ):
+        return
+
+    if hasattr(config, "workerinput"):
+        # On xdist worker nodes: only collect metrics in the "user_properties"
+        # of the test reports, which are passed to the controller node for reporting.
+        config.pluginmanager.register(
+            TrackMetricsCollector(), name=_TRACK_METRICS_PLUGIN_NAME
+        )
+    else:
         config.pluginmanager.register(
             TrackMetricsReporter(
                 json_path=track_metrics_json,
@@ -150,7 +161,37 @@ class _ParquetS3StorageSettings:
     key: str = _S3_KEY_DEFAULT
 
 
-class TrackMetricsReporter:
+class TrackMetricsCollector:
+    """
+    Collects the metrics of a test in its "user_properties",
+    which are also passed from xdist worker nodes to the controller node.
+    """
+
+    def __init__(self, user_properties_key: str = "track_metrics"):
+        self._user_properties_key = user_properties_key
+
+    def get_metrics(
+        self, user_properties: List[Tuple[str, Any]]
+    ) -> List[Tuple[str, Any]]:
+        """
+        Extract existing test metrics items from user properties
+        or create new one.
+        """
+        for name, value in user_properties:
+            if name == self._user_properties_key:
+                return value
+        # Not found: create it
+        metrics = []
+        user_properties.append((self._user_properties_key, metrics))
+        return metrics
+
+
+class TrackMetricsReporter(TrackMetricsCollector):
+    """
+    Collects and reports the metrics of all tests
+    (including the ones that ran on xdist worker nodes).
+    """
+
     def __init__(
         self,
         json_path: Union[None, str, Path] = None,
@@ -159,12 +200,12 @@ class TrackMetricsReporter:
         user_properties_key: str = "track_metrics",
         parquet_partitioning: str | None = None,
     ):
+        super().__init__(user_properties_key=user_properties_key)
         self._json_path = Path(json_path) if json_path else None
         self._parquet_local = Path(parquet_local) if parquet_local else None
         self._parquet_s3 = parquet_s3
         self._parquet_partitioning = parquet_partitioning
         self._suite_metrics: List[dict] = []
-        self._user_properties_key = user_properties_key
         self._run_id = get_run_id()
 
     def pytest_runtest_logreport(self, report: pytest.TestReport):
@@ -304,21 +345,6 @@ class TrackMetricsReporter:
             "- Data: " + repr_truncate(self._suite_metrics, width=512)
         )
 
-    def get_metrics(
-        self, user_properties: List[Tuple[str, Any]]
-    ) -> List[Tuple[str, Any]]:
-        """
-        Extract existing test metrics items from user properties
-        or create new one.
-        """
-        for name, value in user_properties:
-            if name == self._user_properties_key:
-                return value
-        # Not found: create it
-        metrics = []
-        user_properties.append((self._user_properties_key, metrics))
-        return metrics
-
 
 # Type annotation aliases, to make things self-documenting and reusable.
 MetricName = str
@@ -341,7 +367,7 @@ def track_metric(
       instead of appending (the default).
     """
 
-    reporter: TrackMetricsReporter | None = pytestconfig.pluginmanager.get_plugin(
+    reporter: TrackMetricsCollector | None = pytestconfig.pluginmanager.get_plugin(
         _TRACK_METRICS_PLUGIN_NAME
     )
 
@@ -423,6 +449,15 @@ def track_phase(track_metric: MetricsTracker):
     - `("test:phase:exception", "math:division-by-zero")`
     """
 
+    return phase_tracker(track_metric)
+
+
+def phase_tracker(track_metric: MetricsTracker):
+    """
+    Build a `track_phase` context manager (see fixture `track_phase`)
+    on top of the given `track_metric` callable.
+    """
+
     @contextlib.contextmanager
     def track(
         phase: str,
@@ -33,15 +33,13 @@ Usage:
 
 import collections
 import logging
-import os
 import re
 import warnings
 from pathlib import Path
 from typing import Callable, Dict
 
-import boto3
-import botocore.config
 import pytest
+from apex_algorithm_qa_tools.common import create_s3_client
 from apex_algorithm_qa_tools.pytest import get_run_id
 
 _log = logging.getLogger(__name__)
@@ -62,20 +60,7 @@ def pytest_addoption(parser: pytest.Parser):
 def pytest_configure(config: pytest.Config):
     bucket = config.getoption("--upload-assets-s3-bucket")
     if bucket:
-        s3_client = boto3.client(
-            service_name="s3",
-            aws_access_key_id=os.environ.get("APEX_ALGORITHMS_S3_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.environ.get(
-                "APEX_ALGORITHMS_S3_SECRET_ACCESS_KEY"
-            ),
-            endpoint_url=os.environ.get("APEX_ALGORITHMS_S3_ENDPOINT_URL"),
-            config=botocore.config.Config(
-                # Disable new checksum validation feature
-                # (not supported yet by third-party S3 implementations)
-                request_checksum_calculation="when_required",
-                response_checksum_validation="when_required",
-            ),
-        )
+        s3_client = create_s3_client()
         config.pluginmanager.register(
             S3UploadPlugin(s3_client=s3_client, bucket=bucket),
             name=_UPLOAD_ASSETS_PLUGIN_NAME,
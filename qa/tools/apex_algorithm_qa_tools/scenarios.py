@@ -1,19 +1,32 @@
 from __future__ import annotations
 
 import dataclasses
+import functools
 import glob
 import json
 import logging
 import re
+from collections import defaultdict
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List
 
 import jsonschema
-import requests
 from apex_algorithm_qa_tools.common import (
     assert_no_github_feature_branch_refs,
+    get_json_schema_validator,
     get_project_root,
 )
+from apex_algorithm_qa_tools.downloads import (
+    DownloadCache,
+    DownloadError,
+    get_download_cache,
+    get_local_path,
+)
+from apex_algorithm_qa_tools.namespaces import (
+    JsonDocumentCache,
+    check_process_definition,
+    get_namespace_cache,
+)
 from openeo.util import TimingLogger
 
 _log = logging.getLogger(__name__)
@@ -22,9 +35,38 @@ _log = logging.getLogger(__name__)
 # TODO #15 Flatten apex_algorithm_qa_tools to a single module and push as much functionality to https://github.com/ESA-APEx/esa-apex-toolbox-python
 
 
-def _get_benchmark_scenario_schema() -> dict:
-    with open(get_project_root() / "schemas/benchmark_scenario.json") as f:
-        return json.load(f)
+def get_benchmark_scenario_validator() -> jsonschema.protocols.Validator:
+    """Compiled (and cached) validator for the benchmark scenario JSON Schema."""
+    return get_json_schema_validator(get_project_root() / "schemas/benchmark_scenario.json")
+
+
+class ScenarioValidationError(jsonschema.ValidationError):
+    """All JSON Schema validation errors of a list of benchmark scenarios."""
+
+    def __init__(self, errors: List[jsonschema.ValidationError], source: str | Path | None = None):
+        self.errors = errors
+        super().__init__(
+            f"{len(errors)} benchmark scenario validation error(s)"
+            + (f" in {source}" if source else "")
+            + ":\n"
+            + "\n".join(f"- {e.json_path}: {e.message}" for e in errors)
+        )
+
+
+def validate_benchmark_scenarios(data: list, source: str | Path | None = None):
+    """
+    Validate a list of benchmark scenarios (e.g. a scenario file) against the JSON Schema,
+    reporting all errors (of all scenarios) at once.
+    """
+    validator = get_benchmark_scenario_validator()
+    errors = []
+    for index, item in enumerate(data):
+        for error in validator.iter_errors(item):
+            # Make the error path start at the scenario index
+            error.path.appendleft(index)
+            errors.append(error)
+    if errors:
+        raise ScenarioValidationError(errors, source=source)
 
 
 @dataclasses.dataclass(kw_only=True)
@@ -41,9 +83,10 @@ class BenchmarkScenario:
 
     @classmethod
     def from_dict(
-        cls, data: dict, *, source: str | Path | None = None
+        cls, data: dict, *, source: str | Path | None = None, validate: bool = True
     ) -> BenchmarkScenario:
-        jsonschema.validate(instance=data, schema=_get_benchmark_scenario_schema())
+        if validate:
+            get_benchmark_scenario_validator().validate(data)
         # TODO: also include the `lint_benchmark_scenario` stuff here (maybe with option to toggle deep URL inspection)?
 
         # TODO #14 standardization of these types? What about other types and how to support them?
@@ -59,6 +102,20 @@ class BenchmarkScenario:
             source=source,
         )
 
+    @property
+    def algorithm(self) -> str | None:
+        """Algorithm name, from the scenario file location (`<org>/<algorithm>/benchmark_scenarios/`)."""
+        if isinstance(self.source, Path):
+            return self.source.parent.parent.name
+        return None
+
+    @property
+    def organization(self) -> str | None:
+        """Organization name, from the scenario file location (`<org>/<algorithm>/benchmark_scenarios/`)."""
+        if isinstance(self.source, Path):
+            return self.source.parent.parent.parent.name
+        return None
+
     @classmethod
     def read_scenarios_file(cls, path: str | Path) -> List[BenchmarkScenario]:
         """
@@ -69,27 +126,133 @@ class BenchmarkScenario:
             data = json.load(f)
         # TODO: support single scenario files in addition to listings?
         assert isinstance(data, list)
-        return [cls.from_dict(item, source=path) for item in data]
+        validate_benchmark_scenarios(data, source=path)
+        return [cls.from_dict(item, source=path, validate=False) for item in data]
+
+
+class DuplicateScenarioError(ValueError):
+    pass
+
+
+class ScenarioRegistry:
+    """
+    Collection of benchmark scenarios, indexed by id, backend, organization and algorithm.
+    Scenario ids must be unique.
+    """
+
+    def __init__(self, scenarios: Iterable[BenchmarkScenario]):
+        self._scenarios: Dict[str, BenchmarkScenario] = {}
+        self._by_backend: Dict[str, List[BenchmarkScenario]] = defaultdict(list)
+        self._by_organization: Dict[str, List[BenchmarkScenario]] = defaultdict(list)
+        self._by_algorithm: Dict[str, List[BenchmarkScenario]] = defaultdict(list)
+        for scenario in scenarios:
+            if scenario.id in self._scenarios:
+                raise DuplicateScenarioError(
+                    f"Duplicate benchmark scenario id {scenario.id!r}"
+                    f" (in {self._scenarios[scenario.id].source} and {scenario.source})"
+                )
+            self._scenarios[scenario.id] = scenario
+            self._by_backend[scenario.backend].append(scenario)
+            self._by_organization[scenario.organization].append(scenario)
+            self._by_algorithm[scenario.algorithm].append(scenario)
+
+    @classmethod
+    def from_root(cls, root: Path | None = None) -> ScenarioRegistry:
+        """Load all benchmark scenarios of the algorithm catalog."""
+        scenarios = []
+        # old style glob is used to support symlinks
+        for path in sorted(
+            glob.glob(
+                str((root or get_project_root()) / "algorithm_catalog")
+                + "/**/*benchmark_scenarios*/*.json",
+                recursive=True,
+            )
+        ):
+            scenarios.extend(BenchmarkScenario.read_scenarios_file(path))
+        return cls(scenarios)
+
+    def __len__(self) -> int:
+        return len(self._scenarios)
+
+    def __iter__(self) -> Iterator[BenchmarkScenario]:
+        return iter(self._scenarios.values())
+
+    def __contains__(self, scenario_id: str) -> bool:
+        return scenario_id in self._scenarios
+
+    def __getitem__(self, scenario_id: str) -> BenchmarkScenario:
+        return self._scenarios[scenario_id]
+
+    def get(self, scenario_id: str) -> BenchmarkScenario | None:
+        return self._scenarios.get(scenario_id)
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._scenarios)
+
+    @property
+    def backends(self) -> List[str]:
+        return list(self._by_backend)
+
+    @property
+    def organizations(self) -> List[str]:
+        return [o for o in self._by_organization if o is not None]
+
+    @property
+    def algorithms(self) -> List[str]:
+        return [a for a in self._by_algorithm if a is not None]
+
+    def filter(
+        self,
+        *,
+        backend: str | None = None,
+        organization: str | None = None,
+        algorithm: str | None = None,
+    ) -> List[BenchmarkScenario]:
+        """Scenarios matching all given criteria (in load order)."""
+        # Start from the smallest index selection, and check the other criteria on that one
+        selections = [
+            index.get(key, [])
+            for index, key in [
+                (self._by_backend, backend),
+                (self._by_organization, organization),
+                (self._by_algorithm, algorithm),
+            ]
+            if key is not None
+        ]
+        candidates = min(selections, key=len) if selections else self
+        return [
+            s
+            for s in candidates
+            if (backend is None or s.backend == backend)
+            and (organization is None or s.organization == organization)
+            and (algorithm is None or s.algorithm == algorithm)
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_scenario_registry(root: Path) -> ScenarioRegistry:
+    return ScenarioRegistry.from_root(root)
+
+
+def get_scenario_registry(root: Path | None = None) -> ScenarioRegistry:
+    """Shared (cached) registry of the benchmark scenarios of the algorithm catalog."""
+    return _get_scenario_registry(Path(root or get_project_root()).absolute())
 
 
 def get_benchmark_scenarios(root=None) -> List[BenchmarkScenario]:
-    # TODO: instead of flat list, keep original grouping/structure of benchmark scenario files?
-    # TODO: check for uniqueness of scenario IDs? Also make this a pre-commit lint tool?
-    scenarios = []
-    # old style glob is used to support symlinks
-    for path in glob.glob(
-        str((root or get_project_root()) / "algorithm_catalog")
-        + "/**/*benchmark_scenarios*/*.json",
-        recursive=True,
-    ):
-        scenarios.extend(BenchmarkScenario.read_scenarios_file(path))
-    return scenarios
+    return list(get_scenario_registry(root))
 
 
-def lint_benchmark_scenario(scenario: BenchmarkScenario):
+def lint_benchmark_scenario(
+    scenario: BenchmarkScenario, *, namespace_cache: JsonDocumentCache | None = None
+):
     """
     Various sanity checks for scenario data.
     To be used in unit tests and pre-commit hooks.
+
+    :param namespace_cache: cache to get the process definitions of namespace URLs
+        (default: the process-wide namespace cache)
     """
     # TODO #17 use JSON Schema based validation instead of ad-hoc checks?
     # TODO integrate this as a pre-commit hook
@@ -121,34 +284,60 @@ def lint_benchmark_scenario(scenario: BenchmarkScenario):
                     )
                 assert_no_github_feature_branch_refs(namespace)
                 # Inspect openEO process definition URL
-                resp = requests.get(namespace)
-                resp.raise_for_status()
-                # TODO: also support process listings?
-                assert resp.json()["id"] == node["process_id"]
+                definition = (namespace_cache or get_namespace_cache()).get(namespace)
+                problems = check_process_definition(node, definition)
+                if problems:
+                    raise ValueError(
+                        f"Invalid node {node_id!r} (namespace {namespace!r}): "
+                        + "; ".join(problems)
+                    )
                 # TODO: check that github URL is a "pinned" reference
-            # TODO: check that provided parameters match expected process parameters
 
 
-def download_reference_data(scenario: BenchmarkScenario, reference_dir: Path) -> Path:
+def download_reference_data(
+    scenario: BenchmarkScenario,
+    reference_dir: Path,
+    *,
+    download_cache: DownloadCache | None = None,
+) -> Path:
+    """
+    Download the reference data files of the scenario (concurrently)
+    to the given directory, through a persistent download cache.
+    Reference data sources can be HTTP(S) or S3 URLs, `file://` URLs or local paths
+    (relative to the scenario file).
+    """
+    download_cache = download_cache or get_download_cache()
+    downloads = {}
+    for path, source in scenario.reference_data.items():
+        path = (reference_dir / path).resolve()
+        if not path.is_relative_to(reference_dir.resolve()):
+            raise ValueError(
+                f"Resolved {path=} is not relative to {reference_dir=} ({scenario.id=})"
+            )
+        local = get_local_path(source)
+        if local is not None and not local.is_absolute():
+            # Relative local paths are relative to the scenario file
+            if not isinstance(scenario.source, Path):
+                raise ValueError(
+                    f"Relative reference data path {source!r} without scenario source file ({scenario.id=})"
+                )
+            source = str(scenario.source.parent / local)
+        downloads[path] = source
+
     with TimingLogger(
         title=f"Downloading reference data for {scenario.id=} to {reference_dir=}",
         logger=_log.info,
     ):
-        for path, source in scenario.reference_data.items():
-            path = reference_dir / path
-            if not path.is_relative_to(reference_dir):
-                raise ValueError(
-                    f"Resolved {path=} is not relative to {reference_dir=} ({scenario.id=})"
-                )
-            path.parent.mkdir(parents=True, exist_ok=True)
-
-            with TimingLogger(
-                title=f"Downloading {source=} to {path=}", logger=_log.info
-            ):
-                # TODO: support other sources than HTTP?
-                resp = requests.get(source, stream=True)
-                with path.open("wb") as f:
-                    for chunk in resp.iter_content(chunk_size=128):
-                        f.write(chunk)
+        results = download_cache.download_many(downloads)
+    errors = [
+        f"{downloads[path]} to {path}: {result!r}"
+        for path, result in results.items()
+        if isinstance(result, Exception)
+    ]
+    if errors:
+        raise DownloadError(
+            f"Failed to download reference data for {scenario.id=}:\n- "
+            + "\n- ".join(errors)
+        )
 
     return reference_dir
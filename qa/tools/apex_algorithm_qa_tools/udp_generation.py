@@ -0,0 +1,263 @@
+"""
+Regeneration of the UDP JSON files from their `openeo_udp/generate.py` scripts.
+
+Usage (from the project root):
+
+    python -m apex_algorithm_qa_tools.udp_generation [--workers 4] [--force] [max_ndvi ...]
+
+Each generator is only rerun when one of its inputs changed since its last successful run.
+The inputs of a generator are recorded while it runs: all files inside the project root
+it opens (the script itself, the modules it imports, its UDF files, README, ...).
+Generators run in a process pool, and a UDP JSON file is only (re)written when
+its content actually changed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from apex_algorithm_qa_tools.common import get_project_root
+
+_log = logging.getLogger(__name__)
+
+# State of the last successful run of each generator (input hashes), relative to the project root
+STATE_FILENAME = ".udp_generation_state.json"
+
+# Files opened by the generator currently running in this process (None: not recording)
+_opened_files: Optional[set] = None
+
+
+def _audit_hook(event: str, args: tuple):
+    if event == "open" and _opened_files is not None and isinstance(args[0], (str, os.PathLike)):
+        _opened_files.add(os.path.abspath(args[0]))
+
+
+_audit_hook_installed = False
+
+
+def _record_opened_files():
+    global _audit_hook_installed
+    if not _audit_hook_installed:
+        # Audit hooks can not be removed: install only once per process
+        sys.addaudithook(_audit_hook)
+        _audit_hook_installed = True
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class UdpGenerator:
+    """A `generate.py` script that builds the UDP of an algorithm with its `generate()` function."""
+
+    script: Path
+
+    @property
+    def name(self) -> str:
+        """Algorithm name (e.g. "max_ndvi" for `algorithm_catalog/vito/max_ndvi/openeo_udp/generate.py`)."""
+        return self.script.parent.parent.name
+
+    def get_output_path(self, process_id: str) -> Path:
+        """The UDP JSON file of the process: the existing one with the same process id, or `<process_id>.json`."""
+        for path in sorted(self.script.parent.glob("*.json")):
+            try:
+                if json.loads(path.read_text(encoding="utf8")).get("id") == process_id:
+                    return path
+            except (ValueError, AttributeError):
+                continue
+        return self.script.parent / f"{process_id}.json"
+
+
+def discover_generators(project_root: Path) -> List[UdpGenerator]:
+    """Find all UDP generator scripts in the algorithm catalog."""
+    return [
+        UdpGenerator(script=p)
+        for p in sorted((project_root / "algorithm_catalog").glob("**/openeo_udp/generate.py"))
+    ]
+
+
+@dataclasses.dataclass(frozen=True)
+class GenerationResult:
+    script: Path
+    process: Optional[dict] = None
+    # Hashes of the input files (relative to the project root)
+    inputs: Dict[str, str] = dataclasses.field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def run_generator(script: Path, project_root: Path) -> GenerationResult:
+    """
+    Import the generator script (from its own folder, like when running it directly)
+    and call its `generate()` function, while recording the project files it opens.
+    """
+    global _opened_files
+    _record_opened_files()
+    script = script.absolute()
+    folder = str(script.parent)
+    cwd = os.getcwd()
+    modules = set(sys.modules)
+    _opened_files = {str(script)}
+    try:
+        os.chdir(folder)
+        sys.path.insert(0, folder)
+        spec = importlib.util.spec_from_file_location(f"_udp_generator_{script.parent.parent.name}", script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        process = module.generate()
+    except Exception as e:
+        return GenerationResult(script=script, error=f"{type(e).__name__}: {e}")
+    finally:
+        opened, _opened_files = _opened_files, None
+        os.chdir(cwd)
+        sys.path.remove(folder)
+        # Forget the generator's own helper modules (other generators may use the same module names)
+        for name in set(sys.modules) - modules:
+            if (getattr(sys.modules[name], "__file__", None) or "").startswith(folder + os.sep):
+                del sys.modules[name]
+
+    # Project modules imported before (e.g. by an earlier generator in the same process) are not opened again
+    tools_folder = str(Path(__file__).parent) + os.sep
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and not module_file.startswith(tools_folder):
+            opened.add(os.path.abspath(module_file))
+
+    project_root = project_root.absolute()
+    inputs = {}
+    for path in sorted(Path(p) for p in opened):
+        if path.is_relative_to(project_root) and path.is_file() and path.suffix != ".pyc":
+            inputs[path.relative_to(project_root).as_posix()] = _sha256(path)
+    return GenerationResult(script=script, process=process, inputs=inputs)
+
+
+def write_process(process: dict, path: Path) -> bool:
+    """
+    Write the UDP JSON file if its content changed, keeping the indentation
+    and trailing newline (or not) of the existing file.
+
+    :return: whether the file was written
+    """
+    indent, newline = 2, ""
+    if path.exists():
+        text = path.read_text(encoding="utf8")
+        try:
+            if json.loads(text) == process:
+                return False
+        except ValueError:
+            pass
+        lines = text.splitlines()
+        if len(lines) > 1 and lines[1].startswith(" "):
+            indent = len(lines[1]) - len(lines[1].lstrip(" "))
+        newline = "\n" if text.endswith("\n") else ""
+    with open(path, "w", encoding="utf8") as f:
+        f.write(json.dumps(process, indent=indent) + newline)
+    return True
+
+
+class GenerationState:
+    """Input hashes of the last successful run of each generator, persisted in a JSON file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._data = {}
+        if path.exists():
+            try:
+                self._data = json.loads(path.read_text(encoding="utf8"))
+            except ValueError:
+                _log.warning(f"Ignoring invalid UDP generation state file {path}")
+
+    def is_up_to_date(self, generator: UdpGenerator, project_root: Path) -> bool:
+        entry = self._data.get(generator.script.relative_to(project_root).as_posix())
+        if not entry or not (project_root / entry["output"]).exists():
+            return False
+        for relative_path, sha256 in entry["inputs"].items():
+            path = project_root / relative_path
+            if not path.is_file() or _sha256(path) != sha256:
+                return False
+        return True
+
+    def update(self, result: GenerationResult, output: Path, project_root: Path):
+        self._data[result.script.relative_to(project_root).as_posix()] = {
+            "output": output.relative_to(project_root).as_posix(),
+            "inputs": result.inputs,
+        }
+
+    def save(self):
+        with open(self.path, "w", encoding="utf8") as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+
+
+def regenerate(
+    project_root: Optional[Path] = None,
+    *,
+    names: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, str]:
+    """
+    Regenerate the (changed) UDPs of the algorithm catalog.
+
+    :param names: only regenerate the UDPs of these algorithms
+    :param workers: size of the process pool (1: run in this process)
+    :param force: rerun all generators, even if their inputs did not change
+    :return: status per algorithm: "up-to-date", "unchanged" (rerun, same JSON), "written" or "failed: ..."
+    """
+    project_root = (project_root or get_project_root()).absolute()
+    state = GenerationState(project_root / STATE_FILENAME)
+    generators = [g for g in discover_generators(project_root) if not names or g.name in names]
+
+    statuses = {}
+    todo = []
+    for generator in generators:
+        if not force and state.is_up_to_date(generator, project_root):
+            statuses[generator.name] = "up-to-date"
+        else:
+            todo.append(generator)
+
+    if workers == 1 or len(todo) <= 1:
+        results = [run_generator(g.script, project_root) for g in todo]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_generator, [g.script for g in todo], [project_root] * len(todo)))
+
+    for generator, result in zip(todo, results):
+        if result.error:
+            _log.error(f"Failed to generate UDP of {generator.name}: {result.error}")
+            statuses[generator.name] = f"failed: {result.error}"
+            continue
+        output = generator.get_output_path(result.process["id"])
+        statuses[generator.name] = "written" if write_process(result.process, output) else "unchanged"
+        state.update(result, output, project_root)
+
+    state.save()
+    return {name: statuses[name] for name in sorted(statuses)}
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    logging.basicConfig(level=logging.INFO)
+    cli = argparse.ArgumentParser(description="Regenerate the UDP JSON files of the algorithm catalog.")
+    cli.add_argument("names", nargs="*", help="Only regenerate the UDPs of these algorithms.")
+    cli.add_argument("--workers", type=int, default=None, help="Size of the process pool.")
+    cli.add_argument("--force", action="store_true", help="Rerun all generators, even if their inputs did not change.")
+    args = cli.parse_args(argv)
+
+    statuses = regenerate(names=args.names, workers=args.workers, force=args.force)
+    for name, status in statuses.items():
+        print(f"{name}: {status}")
+    if any(status.startswith("failed") for status in statuses.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
+import gzip
+import hashlib
+import http.server
+import re
+import threading
+import uuid
 from pathlib import Path
+from typing import Dict, List, Set, Tuple
 
+import boto3
+import moto.server
 import pytest
 
 pytest_plugins = [
@@ -13,3 +22,118 @@ pytest.register_assert_rewrite("apex_algorithm_qa_tools.scenarios")
 def test_data_root() -> Path:
     """Fixture to provide the root path for test data."""
     return Path(__file__).parent / "data"
+
+
+class StaticHttpServer:
+    """
+    Local HTTP server (in a thread) serving static files, with support for
+    conditional requests (ETag), (If-)Range requests and gzip content encoding.
+    """
+
+    def __init__(self):
+        # Content per path
+        self.files: Dict[str, bytes] = {}
+        # Only send the first N bytes of a path, then drop the connection
+        self.truncate: Dict[str, int] = {}
+        # Serve these paths gzip-encoded (when accepted by the client)
+        self.gzip: Set[str] = set()
+        # Also serve them gzip-encoded when the client does not accept it
+        self.force_gzip = False
+        # Log of (method, path, status, request headers)
+        self.log: List[Tuple[str, str, int, dict]] = []
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers, body = server._respond(self.path, self.headers)
+                server.log.append(("GET", self.path, status, dict(self.headers)))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.path in server.truncate:
+                    body = body[: server.truncate.pop(self.path)]
+                    self.close_connection = True
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def etag(content: bytes) -> str:
+        return '"' + hashlib.sha256(content).hexdigest()[:16] + '"'
+
+    def _respond(self, path: str, request_headers) -> Tuple[int, dict, bytes]:
+        if path not in self.files:
+            return 404, {"Content-Length": "0"}, b""
+        content = self.files[path]
+        etag = self.etag(content)
+        if request_headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        accept_encoding = request_headers.get("Accept-Encoding", "")
+        if path in self.gzip and ("gzip" in accept_encoding or self.force_gzip):
+            body = gzip.compress(content)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(body))
+            return 200, headers, body
+        range_match = re.match(r"bytes=(\d+)-$", request_headers.get("Range", ""))
+        if range_match and request_headers.get("If-Range", etag) == etag:
+            start = int(range_match.group(1))
+            if start >= len(content):
+                return 416, {"Content-Range": f"bytes */{len(content)}"}, b""
+            body = content[start:]
+            headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+            headers["Content-Length"] = str(len(body))
+            return 206, headers, body
+        headers["Content-Length"] = str(len(content))
+        return 200, headers, content
+
+    def statuses(self, path: str) -> List[int]:
+        return [status for _, p, status, _ in self.log if p == path]
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def http_server() -> StaticHttpServer:
+    server = StaticHttpServer()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def moto_server() -> str:
+    """Fixture to run a mocked AWS server for testing."""
+    # Note: pass `port=0` to get a random free port.
+    server = moto.server.ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def aws_credentials(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test123")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test456")
+
+
+@pytest.fixture
+def s3_client(moto_server):
+    return boto3.client("s3", endpoint_url=moto_server)
+
+
+@pytest.fixture
+def s3_bucket(s3_client) -> str:
+    # Unique bucket name for test isolation
+    bucket = f"test-bucket-{uuid.uuid4().hex}"
+    s3_client.create_bucket(Bucket=bucket)
+    return bucket
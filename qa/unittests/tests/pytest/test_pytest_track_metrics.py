@@ -114,6 +114,62 @@ def test_track_metric_basic_json(pytester: pytest.Pytester, tmp_path):
     ]
 
 
+def test_track_metric_xdist_json(pytester: pytest.Pytester, tmp_path):
+    pytester.makeconftest(CONTENT_CONFTEST)
+    pytester.makepyfile(
+        test_addition=CONTENT_TEST_ADDITION_PY,
+        test_phases="""
+            def test_phases(track_metric, track_phase):
+                track_metric("milestone", "start", update=True)
+                with track_phase("setup"):
+                    track_metric("milestone", "setup", update=True)
+                with track_phase("math"):
+                    x = 1 / 0
+        """,
+    )
+
+    metrics_path = tmp_path / "metrics.json"
+    run_result = pytester.runpytest_subprocess(
+        f"--track-metrics-json={metrics_path}",
+        "--numprocesses=2",
+    )
+    run_result.stdout.re_match_lines(
+        [
+            r"Plugin `track_metrics` is active, reporting to",
+            r"2 workers \[3 items\]",
+        ]
+    )
+    run_result.assert_outcomes(passed=1, failed=2)
+    assert "not supported on xdist" not in run_result.stdout.str()
+
+    with metrics_path.open("r", encoding="utf8") as f:
+        metrics = json.load(f)
+    assert sorted(
+        ((m["nodeid"], m["report"]["outcome"], m["metrics"]) for m in metrics)
+    ) == [
+        (
+            "test_addition.py::test_3plus[5]",
+            "passed",
+            [["x squared", 25]],
+        ),
+        (
+            "test_addition.py::test_3plus[6]",
+            "failed",
+            [["x squared", 36]],
+        ),
+        (
+            "test_phases.py::test_phases",
+            "failed",
+            [
+                ["milestone", "setup"],
+                ["test:phase:start", "math"],
+                ["test:phase:end", "setup"],
+                ["test:phase:exception", "math"],
+            ],
+        ),
+    ]
+
+
 @pytest.mark.parametrize(
     ["src", "expected", "expected_warnings"],
     [
@@ -434,6 +490,20 @@ class TestTrackMetricsParquet:
         table = pyarrow.parquet.read_table(metrics_path)
         self._check_metrics_pandas(df=table.to_pandas())
 
+    def test_local_xdist(self, pytester: pytest.Pytester, tmp_path):
+        pytester.makeconftest(CONTENT_CONFTEST)
+        pytester.makepyfile(test_addition=CONTENT_TEST_ADDITION_PY)
+
+        metrics_path = tmp_path / "metrics.parquet"
+        run_result = pytester.runpytest_subprocess(
+            f"--track-metrics-parquet={metrics_path}",
+            "--numprocesses=2",
+        )
+        run_result.assert_outcomes(passed=1, failed=1)
+
+        table = pyarrow.parquet.read_table(metrics_path)
+        self._check_metrics_pandas(df=table.to_pandas())
+
     def test_local_partitioning_simple(
         self, pytester: pytest.Pytester, tmp_path, new_run_id
     ):
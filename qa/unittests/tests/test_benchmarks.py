@@ -1,15 +1,26 @@
+import collections
 import json
+import re
+import threading
 from pathlib import Path
 from typing import List
 
 import openeo.rest.job
 import openeo.testing.results
 import pytest
+import requests
 from apex_algorithm_qa_tools.benchmarks import (
+    BenchmarkRunnerStopped,
+    ConcurrentBenchmarkRunner,
+    RecordingTracker,
     analyse_results_comparison_exception,
     collect_metrics_from_job_metadata,
     collect_metrics_from_results_metadata,
+    run_benchmark_scenario,
 )
+from apex_algorithm_qa_tools.scenarios import BenchmarkScenario
+from openeo.rest import JobFailedException
+from openeo.rest._testing import DummyBackend
 
 
 class DummyTracker:
@@ -108,3 +119,237 @@ def test_analyse_results_comparison_exception_derived_from(tmp_path):
         )
 
     assert analyse_results_comparison_exception(exc_info.value) == "derived_from-change"
+
+
+def _phases(metrics: list) -> dict:
+    """Last phase start/end/exception from (recorded) metrics."""
+    return {name: value for name, value, _ in metrics if name.startswith("test:phase:")}
+
+
+class TestRunBenchmarkScenario:
+    @pytest.fixture
+    def dummy_backend(self, requests_mock) -> DummyBackend:
+        dummy_backend = DummyBackend.at_url("https://openeo.test", requests_mock=requests_mock)
+
+        def get_job_results(request, context):
+            # Job results metadata with links (which the comparison expects)
+            job_id = request.path.split("/")[2]
+            return {
+                "id": job_id,
+                "links": [],
+                "assets": {"result.data": {"href": f"https://openeo.test/jobs/{job_id}/results/result.data"}},
+            }
+
+        requests_mock.get(re.compile(r"https://openeo.test/jobs/job-\d+/results$"), json=get_job_results)
+        return dummy_backend
+
+    @pytest.fixture
+    def reference_dir(self, dummy_backend, tmp_path) -> Path:
+        """Reference data: actual results of a previous run."""
+        reference_dir = tmp_path / "previous"
+        job = dummy_backend.connection.create_job({"add": {"process_id": "add", "arguments": {}, "result": True}})
+        job.start_and_wait()
+        job.get_results().download_files(target=reference_dir, include_stac_metadata=True)
+        return reference_dir
+
+    def _scenario(self, id: str, reference_dir: Path) -> BenchmarkScenario:
+        return BenchmarkScenario(
+            id=id,
+            backend="https://openeo.test",
+            process_graph={"add": {"process_id": "add", "arguments": {"x": 3, "y": 5}, "result": True}},
+            reference_data={
+                "job-results.json": str(reference_dir / "job-results.json"),
+                "result.data": str(reference_dir / "result.data"),
+            },
+        )
+
+    def test_run_benchmark_scenario(self, dummy_backend, reference_dir, tmp_path):
+        tracker = RecordingTracker()
+        assets = []
+        run_benchmark_scenario(
+            self._scenario("foo", reference_dir),
+            connect=lambda: dummy_backend.connection,
+            work_dir=tmp_path / "work",
+            track_metric=tracker.track_metric,
+            track_phase=tracker.track_phase,
+            collect_assets=lambda *paths: assets.extend(paths),
+        )
+        assert ("job_id", "job-001", False) in tracker.metrics
+        assert ("usage:cpu:cpu-seconds", 1234.5, False) in tracker.metrics
+        assert _phases(tracker.metrics) == {"test:phase:start": "compare", "test:phase:end": "compare"}
+        assert sorted(p.name for p in assets) == ["job-results.json", "result.data"]
+        assert (tmp_path / "work/reference/result.data").exists()
+
+    def test_concurrent_runner(self, dummy_backend, reference_dir, tmp_path):
+        # Jobs take a couple of status polls to finish
+        polls = collections.Counter()
+        running = set()
+        max_running = 0
+        lock = threading.Lock()
+
+        def job_status_updater(job_id, current_status):
+            nonlocal max_running
+            with lock:
+                polls[job_id] += 1
+                if polls[job_id] < 4:
+                    running.add(job_id)
+                    max_running = max(max_running, len(running))
+                    return "running"
+                running.discard(job_id)
+                return "finished"
+
+        dummy_backend.job_status_updater = job_status_updater
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection,
+            work_dir=tmp_path / "concurrent",
+            max_jobs_per_backend=2,
+            poll_interval=0.01,
+        )
+        for id in ["s1", "s2", "s3", "s4", "s5"]:
+            runner.submit(self._scenario(id, reference_dir))
+        assert "s3" in runner
+        assert "s6" not in runner
+
+        runs = {id: runner.result(id, timeout=10) for id in ["s1", "s2", "s3", "s4", "s5"]}
+        runner.shutdown()
+        assert all(run.error is None for run in runs.values())
+        assert {dict((n, v) for n, v, _ in run.tracker.metrics)["job_id"] for run in runs.values()} == {
+            "job-001",
+            "job-002",
+            "job-003",
+            "job-004",
+            "job-005",
+        }
+        assert max_running == 2
+
+    def test_report(self, dummy_backend, reference_dir, tmp_path):
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection, work_dir=tmp_path / "concurrent", poll_interval=0.01
+        )
+        runner.submit(self._scenario("foo", reference_dir))
+        run = runner.result("foo", timeout=10)
+
+        test_tmp_path = tmp_path / "test"
+        test_tmp_path.mkdir()
+        metrics = []
+        assets = []
+        run.report(
+            tmp_path=test_tmp_path,
+            track_metric=lambda name, value, update=False: metrics.append((name, value)),
+            collect_assets=lambda *paths: assets.extend(paths),
+        )
+        assert ("job_id", "job-001") in metrics
+        assert sorted(assets) == [test_tmp_path / "actual/job-results.json", test_tmp_path / "actual/result.data"]
+        assert all(p.exists() for p in assets)
+        assert (test_tmp_path / "reference/result.data").exists()
+
+    def test_backend_wait_phase(self, dummy_backend, reference_dir, tmp_path):
+        """Waiting for a backend slot is tracked separately from running the job."""
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection, work_dir=tmp_path / "concurrent", poll_interval=0.01
+        )
+        runner.submit(self._scenario("foo", reference_dir))
+        run = runner.result("foo", timeout=10)
+        assert run.error is None
+        phases = [(n, v) for n, v, _ in run.tracker.metrics if n.startswith("test:phase:")]
+        assert phases[phases.index(("test:phase:start", "wait-for-backend")) :][:4] == [
+            ("test:phase:start", "wait-for-backend"),
+            ("test:phase:end", "wait-for-backend"),
+            ("test:phase:start", "run-job"),
+            ("test:phase:end", "run-job"),
+        ]
+        (wait,) = [v for n, v, _ in run.tracker.metrics if n == "job:backend-wait:seconds"]
+        assert 0 <= wait < 10
+
+    def test_soft_errors(self, dummy_backend, reference_dir, tmp_path):
+        polls = collections.Counter()
+
+        def job_status_updater(job_id, current_status):
+            if current_status == "created":
+                # Starting the job
+                return "queued"
+            polls[job_id] += 1
+            if polls[job_id] <= 3:
+                raise requests.ConnectionError("Connection reset by peer")
+            return "finished"
+
+        dummy_backend.job_status_updater = job_status_updater
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection,
+            work_dir=tmp_path / "concurrent",
+            poll_interval=0.01,
+            soft_error_max=3,
+        )
+        runner.submit(self._scenario("foo", reference_dir))
+        run = runner.result("foo", timeout=10)
+        assert run.error is None
+
+    def test_soft_errors_exceeded(self, dummy_backend, reference_dir, tmp_path):
+        def job_status_updater(job_id, current_status):
+            if current_status == "created":
+                return "queued"
+            raise requests.ConnectionError("Connection reset by peer")
+
+        dummy_backend.job_status_updater = job_status_updater
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection,
+            work_dir=tmp_path / "concurrent",
+            poll_interval=0.01,
+            soft_error_max=3,
+        )
+        runner.submit(self._scenario("foo", reference_dir))
+        run = runner.result("foo", timeout=10)
+        assert isinstance(run.error, requests.ConnectionError)
+        assert _phases(run.tracker.metrics)["test:phase:exception"] == "run-job"
+
+    def test_job_failure(self, dummy_backend, reference_dir, tmp_path, requests_mock, caplog):
+        dummy_backend.job_status_updater = lambda job_id, current_status: "error"
+        requests_mock.get(
+            re.compile(r"https://openeo.test/jobs/job-\d+/logs"),
+            json={"logs": [{"id": "1", "level": "error", "message": "Out of memory"}], "links": []},
+        )
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection, work_dir=tmp_path / "concurrent", poll_interval=0.01
+        )
+        runner.submit(self._scenario("foo", reference_dir))
+        run = runner.result("foo", timeout=10)
+        assert isinstance(run.error, JobFailedException)
+        assert _phases(run.tracker.metrics) == {
+            "test:phase:start": "run-job",
+            "test:phase:end": "wait-for-backend",
+            "test:phase:exception": "run-job",
+        }
+        assert "Out of memory" in caplog.text
+
+        test_tmp_path = tmp_path / "test"
+        test_tmp_path.mkdir()
+        metrics = []
+        with pytest.raises(JobFailedException, match="didn't finish successfully. Status: error"):
+            run.report(tmp_path=test_tmp_path, track_metric=lambda name, value, update=False: metrics.append(name))
+        assert "test:phase:exception" in metrics
+
+    def test_compare_failure(self, dummy_backend, reference_dir, tmp_path):
+        metadata = json.loads((reference_dir / "job-results.json").read_text())
+        metadata["links"].append({"rel": "derived_from", "href": "https://data.test/S2_T31UFS"})
+        (reference_dir / "job-results.json").write_text(json.dumps(metadata))
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection, work_dir=tmp_path / "concurrent", poll_interval=0.01
+        )
+        runner.submit(self._scenario("foo", reference_dir))
+        run = runner.result("foo", timeout=10)
+        assert isinstance(run.error, AssertionError)
+        assert _phases(run.tracker.metrics)["test:phase:exception"] == "compare:derived_from-change"
+
+    def test_shutdown(self, dummy_backend, reference_dir, tmp_path):
+        dummy_backend.job_status_updater = lambda job_id, current_status: "running"
+        runner = ConcurrentBenchmarkRunner(
+            connect=lambda scenario: dummy_backend.connection,
+            work_dir=tmp_path / "concurrent",
+            max_jobs_per_backend=1,
+            poll_interval=0.01,
+        )
+        runner.submit(self._scenario("s1", reference_dir))
+        runner.submit(self._scenario("s2", reference_dir))
+        runner.shutdown()
+        errors = [runner.result(id, timeout=10).error for id in ["s1", "s2"]]
+        assert all(isinstance(e, BenchmarkRunnerStopped) for e in errors)
@@ -0,0 +1,130 @@
+import importlib.util
+import json
+
+import jsonschema
+import numpy as np
+import pytest
+import xarray
+from apex_algorithm_qa_tools.common import get_project_root
+
+BIOPAR_UDP = get_project_root() / "algorithm_catalog" / "vito" / "biopar" / "openeo_udp" / "biopar.json"
+BIOPAR_INPUTS = get_project_root() / "utils" / "udf_helpers" / "biopar_inputs.py"
+
+
+@pytest.fixture
+def biopar_udp() -> dict:
+    return json.loads(BIOPAR_UDP.read_text(encoding="utf8"))
+
+
+@pytest.fixture
+def biopar_inputs():
+    spec = importlib.util.spec_from_file_location("biopar_inputs", BIOPAR_INPUTS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _cube(size: int = 4) -> xarray.DataArray:
+    """Synthetic (bands, y, x) cube with the BioPAR input bands, with one nodata pixel."""
+    rng = np.random.default_rng(42)
+    bands = ["B03", "B04", "B08", "sunAzimuthAngles", "sunZenithAngles", "viewAzimuthMean", "viewZenithMean"]
+    data = np.stack(
+        [
+            rng.uniform(200, 600, size=(size, size)),
+            rng.uniform(100, 500, size=(size, size)),
+            rng.uniform(2000, 4000, size=(size, size)),
+            rng.uniform(140, 160, size=(size, size)),
+            rng.uniform(30, 40, size=(size, size)),
+            rng.uniform(100, 110, size=(size, size)),
+            rng.uniform(2, 8, size=(size, size)),
+        ]
+    ).astype(np.float32)
+    data[:3, 0, 0] = np.nan
+    return xarray.DataArray(
+        data, dims=["bands", "y", "x"], coords={"bands": bands, "y": np.arange(size), "x": np.arange(size)}
+    )
+
+
+@pytest.mark.parametrize(
+    ["value", "valid"],
+    [
+        ("LAI", True),
+        (["FAPAR", "LAI", "FCOVER"], True),
+        ("NDVI", False),
+        (["FAPAR", "NDVI"], False),
+        ([], False),
+    ],
+)
+def test_biopar_type_parameter(biopar_udp, value, valid):
+    (parameter,) = [p for p in biopar_udp["parameters"] if p["name"] == "biopar_type"]
+    assert parameter["default"] == "FAPAR"
+    validator = jsonschema.Draft7Validator({"anyOf": parameter["schema"]})
+    assert validator.is_valid(value) == valid
+
+
+def test_biopar_process_graph(biopar_udp):
+    """The UDF is applied along the bands, so a list of BIOPAR types gives one band per type."""
+    nodes = biopar_udp["process_graph"]
+    (node,) = [n for n in nodes.values() if n.get("result")]
+    assert node["process_id"] == "apply_dimension"
+    assert node["arguments"]["dimension"] == "bands"
+    (udf,) = node["arguments"]["process"]["process_graph"].values()
+    assert udf["process_id"] == "run_udf"
+    assert udf["arguments"]["context"] == {"biopar_type": {"from_parameter": "biopar_type"}, "output_bands": True}
+    assert "def apply_metadata" in udf["arguments"]["udf"]
+    assert {n["process_id"] for n in nodes.values()}.isdisjoint({"reduce_dimension", "add_dimension"})
+
+
+def test_to_biopar_array_labels(biopar_inputs):
+    cube = _cube().transpose("y", "bands", "x")
+    inputs, nodata = biopar_inputs.get_biopar_inputs(cube)
+    images = np.stack([inputs[0] * 2, inputs[1] * 3])
+    result = biopar_inputs.to_biopar_array(images, nodata, cube, labels=["FAPAR", "LAI"])
+    assert result.dims == ("y", "bands", "x")
+    assert list(result.bands.values) == ["FAPAR", "LAI"]
+    assert np.isnan(result.values[0, :, 0]).all()
+    np.testing.assert_allclose(result.sel(bands="LAI").values[1:], cube.sel(bands="B04").values[1:] * 0.0003, rtol=1e-6)
+
+
+class TestBioparUdf:
+    """Run the UDF code as published in the UDP (requires the BioPAR library of the UDF environment)."""
+
+    @pytest.fixture
+    def udf(self, biopar_udp) -> dict:
+        pytest.importorskip("biopar.bioparnp")
+        (node,) = [n for n in biopar_udp["process_graph"].values() if n.get("result")]
+        (run_udf,) = node["arguments"]["process"]["process_graph"].values()
+        namespace = {}
+        exec(run_udf["arguments"]["udf"], namespace)
+        return namespace
+
+    def _run(self, udf, cube, context) -> xarray.DataArray:
+        from openeo.udf import XarrayDataCube
+
+        return udf["apply_datacube"](XarrayDataCube(cube), context).get_array()
+
+    def test_multi_output(self, udf):
+        cube = _cube()
+        result = self._run(udf, cube, {"biopar_type": ["FAPAR", "LAI", "FCOVER"], "output_bands": True})
+        assert result.dims == ("bands", "y", "x")
+        assert list(result.bands.values) == ["FAPAR", "LAI", "FCOVER"]
+        assert np.isnan(result.values[:, 0, 0]).all()
+        # Same as computing each parameter on its own
+        for biopar in ["FAPAR", "LAI", "FCOVER"]:
+            single = self._run(udf, cube, {"biopar_type": biopar})
+            assert single.dims == ("y", "x")
+            np.testing.assert_allclose(result.sel(bands=biopar).values, single.values)
+
+    def test_single_output_bands(self, udf):
+        result = self._run(udf, _cube(), {"biopar_type": "LAI", "output_bands": True})
+        assert list(result.bands.values) == ["LAI"]
+
+    def test_apply_metadata(self, udf):
+        from openeo.metadata import Band, BandDimension, CollectionMetadata
+
+        bands = BandDimension(name="bands", bands=[Band(name) for name in _cube().bands.values])
+        metadata = CollectionMetadata({}, dimensions=[bands])
+        result = udf["apply_metadata"](metadata, {"biopar_type": ["FAPAR", "LAI"], "output_bands": True})
+        assert result.band_names == ["FAPAR", "LAI"]
+        # Reducing the bands: metadata unchanged
+        assert udf["apply_metadata"](metadata, {"biopar_type": "FAPAR"}) is metadata
@@ -1,6 +1,10 @@
+import json
+import os
+
 import pytest
 from apex_algorithm_qa_tools.common import (
     assert_no_github_feature_branch_refs,
+    get_json_schema_validator,
     get_project_root,
 )
 
@@ -38,3 +42,19 @@ def test_assert_no_github_feature_branch_refs_ok(href):
 def test_assert_no_github_feature_branch_refs_not_ok(href, expected_error):
     with pytest.raises(ValueError, match=expected_error):
         assert_no_github_feature_branch_refs(href)
+
+
+def test_get_json_schema_validator(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps({"type": "object", "required": ["foo"]}))
+    validator = get_json_schema_validator(path)
+    assert get_json_schema_validator(path) is validator
+    assert validator.is_valid({"foo": 1})
+    assert not validator.is_valid({"bar": 1})
+
+    # Modified schema file: reloaded
+    path.write_text(json.dumps({"type": "object", "required": ["bar"]}))
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    validator = get_json_schema_validator(path)
+    assert validator.is_valid({"bar": 1})
+    assert not validator.is_valid({"foo": 1})
@@ -0,0 +1,282 @@
+import fcntl
+import json
+import threading
+
+import botocore.exceptions
+import pytest
+import requests
+from apex_algorithm_qa_tools.downloads import DownloadCache, DownloadError
+from apex_algorithm_qa_tools.scenarios import BenchmarkScenario, download_reference_data
+
+DATA = bytes(range(256)) * 1000
+
+
+@pytest.fixture
+def cache(tmp_path) -> DownloadCache:
+    return DownloadCache(cache_dir=tmp_path / "cache", chunk_size=1000)
+
+
+class TestDownloadCache:
+    def test_download(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        path = cache.download(f"{http_server.url}/data.bin", tmp_path / "out" / "data.bin")
+        assert path == tmp_path / "out" / "data.bin"
+        assert path.read_bytes() == DATA
+        assert http_server.statuses("/data.bin") == [200]
+
+    def test_cached(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        url = f"{http_server.url}/data.bin"
+        cache.download(url, tmp_path / "a.bin")
+        # Other cache instance on same directory (e.g. next CI run)
+        DownloadCache(cache_dir=cache.cache_dir).download(url, tmp_path / "b.bin")
+        assert (tmp_path / "b.bin").read_bytes() == DATA
+        assert http_server.statuses("/data.bin") == [200, 304]
+
+    def test_changed(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        url = f"{http_server.url}/data.bin"
+        cache.download(url, tmp_path / "data.bin")
+        http_server.files["/data.bin"] = b"changed"
+        cache.download(url, tmp_path / "data.bin")
+        assert (tmp_path / "data.bin").read_bytes() == b"changed"
+        assert http_server.statuses("/data.bin") == [200, 200]
+
+    def test_corrupt_cache_entry(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        url = f"{http_server.url}/data.bin"
+        cached = cache.fetch(url)
+        # Size mismatch with the recorded metadata: not revalidated but downloaded again
+        cached.write_bytes(b"oops")
+        assert cache.fetch(url).read_bytes() == DATA
+        assert http_server.statuses("/data.bin") == [200, 200]
+        assert "If-None-Match" not in http_server.log[-1][3]
+
+    def test_resume(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        http_server.truncate["/data.bin"] = 100_000
+        url = f"{http_server.url}/data.bin"
+        with pytest.raises((requests.RequestException, DownloadError)):
+            cache.download(url, tmp_path / "data.bin")
+
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+        assert http_server.statuses("/data.bin") == [200, 206]
+        assert http_server.log[-1][3]["Range"] == "bytes=100000-"
+
+    def test_resume_changed(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        http_server.truncate["/data.bin"] = 100_000
+        url = f"{http_server.url}/data.bin"
+        with pytest.raises((requests.RequestException, DownloadError)):
+            cache.download(url, tmp_path / "data.bin")
+
+        # If-Range does not match anymore: full download
+        http_server.files["/data.bin"] = DATA[::-1]
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA[::-1]
+        assert http_server.statuses("/data.bin") == [200, 200]
+
+    def test_no_compression(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        http_server.gzip.add("/data.bin")
+        assert cache.download(f"{http_server.url}/data.bin", tmp_path / "data.bin").read_bytes() == DATA
+        assert http_server.log[-1][3]["Accept-Encoding"] == "identity"
+
+    def test_compressed_anyway(self, http_server, cache, tmp_path):
+        # Server that ignores "Accept-Encoding: identity"
+        http_server.files["/data.bin"] = DATA
+        http_server.gzip.add("/data.bin")
+        http_server.force_gzip = True
+        url = f"{http_server.url}/data.bin"
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+        # Cached with the decoded size
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+        assert http_server.statuses("/data.bin") == [200, 304]
+
+    def test_compressed_anyway_interrupted(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        http_server.gzip.add("/data.bin")
+        http_server.force_gzip = True
+        http_server.truncate["/data.bin"] = 1000
+        url = f"{http_server.url}/data.bin"
+        with pytest.raises((requests.RequestException, DownloadError)):
+            cache.download(url, tmp_path / "data.bin")
+
+        # Decoded partial download is not resumed with a Range request
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+        assert http_server.statuses("/data.bin") == [200, 200]
+        assert "Range" not in http_server.log[-1][3]
+
+    def test_locked_by_other_process(self, http_server, cache, tmp_path):
+        http_server.files["/data.bin"] = DATA
+        url = f"{http_server.url}/data.bin"
+        # Lock of another process (own open file description, so it is not shared with the cache)
+        lock_path = cache.cache_dir / (cache._key(url) + ".lock")
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            fetch = threading.Thread(target=cache.fetch, args=(url,))
+            fetch.start()
+            fetch.join(timeout=0.5)
+            assert fetch.is_alive()
+            assert http_server.statuses("/data.bin") == []
+        fetch.join(timeout=10)
+        assert not fetch.is_alive()
+        assert http_server.statuses("/data.bin") == [200]
+
+    def test_leftover_lock_file(self, http_server, cache, tmp_path):
+        """Lock file of a killed process (without lock held) does not block."""
+        http_server.files["/data.bin"] = DATA
+        url = f"{http_server.url}/data.bin"
+        (cache.cache_dir / (cache._key(url) + ".lock")).touch()
+        assert cache.fetch(url).read_bytes() == DATA
+
+    def test_not_found(self, http_server, cache, tmp_path):
+        with pytest.raises(requests.HTTPError, match="404"):
+            cache.download(f"{http_server.url}/nope.bin", tmp_path / "nope.bin")
+        assert not (tmp_path / "nope.bin").exists()
+
+    def test_download_many(self, http_server, cache, tmp_path):
+        http_server.files["/a.bin"] = b"a" * 5000
+        http_server.files["/b.bin"] = b"b" * 5000
+        results = cache.download_many(
+            {
+                tmp_path / "a.bin": f"{http_server.url}/a.bin",
+                tmp_path / "b.bin": f"{http_server.url}/b.bin",
+                tmp_path / "c.bin": f"{http_server.url}/c.bin",
+                tmp_path / "a2.bin": f"{http_server.url}/a.bin",
+            }
+        )
+        assert list(results) == [tmp_path / n for n in ["a.bin", "b.bin", "c.bin", "a2.bin"]]
+        assert (tmp_path / "a2.bin").read_bytes() == b"a" * 5000
+        assert isinstance(results[tmp_path / "c.bin"], requests.HTTPError)
+        # Same URL is only downloaded once, the other target is served from the cache
+        assert http_server.statuses("/a.bin") == [200, 304]
+
+
+class TestS3Source:
+    @pytest.fixture
+    def cache(self, tmp_path, s3_client) -> DownloadCache:
+        return DownloadCache(cache_dir=tmp_path / "cache", chunk_size=1000, s3_client=s3_client)
+
+    def test_download(self, cache, s3_client, s3_bucket, tmp_path):
+        s3_client.put_object(Bucket=s3_bucket, Key="ref/data.bin", Body=DATA)
+        url = f"s3://{s3_bucket}/ref/data.bin"
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+
+        # Cached: not downloaded again
+        (cache.cache_dir / cache._key(url)).write_bytes(DATA[::-1])
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA[::-1]
+
+        # Changed object
+        s3_client.put_object(Bucket=s3_bucket, Key="ref/data.bin", Body=b"changed")
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == b"changed"
+
+    def test_resume(self, cache, s3_client, s3_bucket, tmp_path):
+        s3_client.put_object(Bucket=s3_bucket, Key="data.bin", Body=DATA)
+        url = f"s3://{s3_bucket}/data.bin"
+        etag = s3_client.head_object(Bucket=s3_bucket, Key="data.bin")["ETag"]
+        # Simulate interrupted download
+        key = cache._key(url)
+        (cache.cache_dir / f"{key}.part").write_bytes(DATA[:12345])
+        (cache.cache_dir / f"{key}.part.json").write_text(json.dumps({"url": url, "etag": etag}))
+
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+        assert not (cache.cache_dir / f"{key}.part").exists()
+
+    def test_not_found(self, cache, s3_bucket, tmp_path):
+        with pytest.raises(botocore.exceptions.ClientError):
+            cache.download(f"s3://{s3_bucket}/nope.bin", tmp_path / "nope.bin")
+
+    def test_default_client_from_env(self, tmp_path, moto_server, s3_client, s3_bucket, monkeypatch):
+        monkeypatch.setenv("APEX_ALGORITHMS_S3_ENDPOINT_URL", moto_server)
+        s3_client.put_object(Bucket=s3_bucket, Key="data.bin", Body=b"hello")
+        cache = DownloadCache(cache_dir=tmp_path / "cache")
+        assert cache.download(f"s3://{s3_bucket}/data.bin", tmp_path / "data.bin").read_bytes() == b"hello"
+
+
+class TestLocalSource:
+    def test_path(self, cache, tmp_path):
+        (tmp_path / "source.bin").write_bytes(DATA)
+        assert cache.download(str(tmp_path / "source.bin"), tmp_path / "out/data.bin").read_bytes() == DATA
+        # Copied directly, without cache
+        assert list(cache.cache_dir.iterdir()) == []
+
+    def test_file_url(self, cache, tmp_path):
+        (tmp_path / "source file.bin").write_bytes(DATA)
+        url = (tmp_path / "source file.bin").as_uri()
+        assert cache.download(url, tmp_path / "data.bin").read_bytes() == DATA
+
+    def test_not_found(self, cache, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            cache.download(str(tmp_path / "nope.bin"), tmp_path / "data.bin")
+
+    def test_unsupported(self, cache, tmp_path):
+        with pytest.raises(ValueError, match="Unsupported download source"):
+            cache.download("ftp://example.test/data.bin", tmp_path / "data.bin")
+
+
+def test_download_reference_data(http_server, cache, tmp_path):
+    http_server.files["/job-results.json"] = b"{}"
+    http_server.files["/openEO.tif"] = DATA
+    scenario = BenchmarkScenario(
+        id="foo",
+        backend="openeo.test",
+        process_graph={},
+        reference_data={
+            "job-results.json": f"{http_server.url}/job-results.json",
+            "openEO.tif": f"{http_server.url}/openEO.tif",
+        },
+    )
+    reference_dir = tmp_path / "reference"
+    assert download_reference_data(scenario, reference_dir, download_cache=cache) == reference_dir
+    assert (reference_dir / "openEO.tif").read_bytes() == DATA
+    assert (reference_dir / "job-results.json").read_bytes() == b"{}"
+
+    # Second run: everything from cache
+    download_reference_data(scenario, tmp_path / "reference2", download_cache=cache)
+    assert (tmp_path / "reference2" / "openEO.tif").read_bytes() == DATA
+    assert [s for _, _, s, _ in http_server.log] == [200, 200, 304, 304]
+
+
+def test_download_reference_data_failure(http_server, cache, tmp_path):
+    scenario = BenchmarkScenario(
+        id="foo",
+        backend="openeo.test",
+        process_graph={},
+        reference_data={"openEO.tif": f"{http_server.url}/openEO.tif"},
+    )
+    with pytest.raises(DownloadError, match="(?s)Failed to download reference data.*openEO.tif.*404"):
+        download_reference_data(scenario, tmp_path / "reference", download_cache=cache)
+
+
+def test_download_reference_data_outside(cache, tmp_path):
+    scenario = BenchmarkScenario(
+        id="foo",
+        backend="openeo.test",
+        process_graph={},
+        reference_data={"../openEO.tif": "https://example.test/openEO.tif"},
+    )
+    with pytest.raises(ValueError, match="is not relative to"):
+        download_reference_data(scenario, tmp_path / "reference", download_cache=cache)
+
+
+def test_download_reference_data_sources(s3_client, s3_bucket, tmp_path):
+    cache = DownloadCache(cache_dir=tmp_path / "cache", s3_client=s3_client)
+    s3_client.put_object(Bucket=s3_bucket, Key="openEO.tif", Body=DATA)
+    (tmp_path / "benchmark_scenarios").mkdir()
+    (tmp_path / "benchmark_scenarios" / "job-results.json").write_text("{}")
+    (tmp_path / "openEO.nc").write_bytes(b"netcdf")
+    scenario = BenchmarkScenario(
+        id="foo",
+        backend="openeo.test",
+        process_graph={},
+        reference_data={
+            "openEO.tif": f"s3://{s3_bucket}/openEO.tif",
+            "job-results.json": "job-results.json",
+            "openEO.nc": (tmp_path / "openEO.nc").as_uri(),
+        },
+        source=tmp_path / "benchmark_scenarios" / "foo.json",
+    )
+    reference_dir = download_reference_data(scenario, tmp_path / "reference", download_cache=cache)
+    assert (reference_dir / "openEO.tif").read_bytes() == DATA
+    assert (reference_dir / "job-results.json").read_text() == "{}"
+    assert (reference_dir / "openEO.nc").read_bytes() == b"netcdf"
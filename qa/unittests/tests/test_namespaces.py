@@ -0,0 +1,134 @@
+import json
+
+import pytest
+from apex_algorithm_qa_tools.namespaces import (
+    JsonDocumentCache,
+    check_process_definition,
+    verify_namespaces,
+)
+from apex_algorithm_qa_tools.scenarios import BenchmarkScenario, lint_benchmark_scenario
+
+FOO_UDP = {
+    "id": "foo",
+    "parameters": [
+        {"name": "spatial_extent", "schema": {"type": "object"}},
+        {"name": "size", "schema": {"type": "integer"}, "default": 32},
+        {"name": "mode", "schema": {"type": "string"}, "optional": True},
+    ],
+    "process_graph": {},
+}
+
+
+@pytest.fixture
+def process_server(http_server):
+    http_server.files["/foo.json"] = json.dumps(FOO_UDP).encode("utf8")
+    return http_server
+
+
+@pytest.fixture
+def cache(tmp_path) -> JsonDocumentCache:
+    return JsonDocumentCache(cache_dir=tmp_path / "cache")
+
+
+def _scenario(id: str, namespace: str, arguments: dict, process_id="foo"):
+    return BenchmarkScenario(
+        id=id,
+        backend="openeo.dataspace.copernicus.eu",
+        process_graph={
+            "foo1": {
+                "process_id": process_id,
+                "namespace": namespace,
+                "arguments": arguments,
+                "result": True,
+            }
+        },
+    )
+
+
+class TestJsonDocumentCache:
+    def test_get(self, process_server, cache):
+        url = f"{process_server.url}/foo.json"
+        assert cache.get(url) == FOO_UDP
+        assert cache.get(url) == FOO_UDP
+        assert process_server.statuses("/foo.json") == [200]
+
+    def test_get_error(self, process_server, cache):
+        with pytest.raises(Exception, match="404"):
+            cache.get(f"{process_server.url}/bar.json")
+
+    def test_revalidate_on_disk(self, process_server, tmp_path):
+        url = f"{process_server.url}/foo.json"
+        assert JsonDocumentCache(cache_dir=tmp_path).get(url) == FOO_UDP
+        assert list(tmp_path.glob("*.json"))
+
+        # New cache instance (e.g. next run): conditional request, document not downloaded again
+        assert JsonDocumentCache(cache_dir=tmp_path).get(url) == FOO_UDP
+        assert process_server.statuses("/foo.json") == [200, 304]
+
+        # Changed document
+        process_server.files["/foo.json"] = json.dumps({**FOO_UDP, "summary": "Foo"}).encode("utf8")
+        assert JsonDocumentCache(cache_dir=tmp_path).get(url)["summary"] == "Foo"
+        assert process_server.statuses("/foo.json") == [200, 304, 200]
+
+    def test_get_many(self, process_server, cache):
+        process_server.files["/bar.json"] = b'{"id": "bar"}'
+        urls = [f"{process_server.url}/{name}.json" for name in ["foo", "bar", "foo", "baz", "bar"]]
+        results = cache.get_many(urls)
+        assert list(results) == [f"{process_server.url}/{name}.json" for name in ["foo", "bar", "baz"]]
+        assert results[f"{process_server.url}/foo.json"] == FOO_UDP
+        assert results[f"{process_server.url}/bar.json"] == {"id": "bar"}
+        assert isinstance(results[f"{process_server.url}/baz.json"], Exception)
+        assert sorted(p for _, p, _, _ in process_server.log) == ["/bar.json", "/baz.json", "/foo.json"]
+
+
+@pytest.mark.parametrize(
+    ["node", "expected"],
+    [
+        ({"process_id": "foo", "arguments": {"spatial_extent": {}}}, []),
+        ({"process_id": "foo", "arguments": {"spatial_extent": {}, "size": 8, "mode": "x"}}, []),
+        (
+            {"process_id": "bar", "arguments": {"spatial_extent": {}}},
+            ["process id 'bar' does not match process definition id 'foo'"],
+        ),
+        (
+            {"process_id": "foo", "arguments": {"bbox": {}}},
+            ["argument 'bbox' is not a parameter of 'foo'", "missing required parameter 'spatial_extent' of 'foo'"],
+        ),
+    ],
+)
+def test_check_process_definition(node, expected):
+    assert check_process_definition(node, FOO_UDP) == expected
+
+
+def test_verify_namespaces(requests_mock, cache):
+    foo_mock = requests_mock.get("https://example.test/foo.json", json=FOO_UDP)
+    bar_mock = requests_mock.get("https://example.test/bar.json", status_code=404)
+    scenarios = [
+        _scenario("ok", "https://example.test/foo.json", {"spatial_extent": {}}),
+        _scenario("ok2", "https://example.test/foo.json", {"spatial_extent": {}, "size": 4}),
+        _scenario("wrong", "https://example.test/foo.json", {"bbox": {}, "spatial_extent": {}}),
+        _scenario("missing", "https://example.test/bar.json", {}),
+        _scenario("local", "backend", {"bbox": {}}),
+    ]
+    problems = verify_namespaces(scenarios, cache=cache)
+    assert problems.keys() == {"wrong", "missing"}
+    assert problems["wrong"] == ["node 'foo1': argument 'bbox' is not a parameter of 'foo'"]
+    assert problems["missing"][0].startswith(
+        "node 'foo1': failed to get process definition 'https://example.test/bar.json'"
+    )
+    assert (foo_mock.call_count, bar_mock.call_count) == (1, 1)
+
+
+class TestLintNamespace:
+    URL = "https://example.test/foo.json"
+
+    def test_ok(self, requests_mock, cache):
+        requests_mock.get(self.URL, json=FOO_UDP)
+        lint_benchmark_scenario(_scenario("ok", self.URL, {"spatial_extent": {}}), namespace_cache=cache)
+
+    def test_invalid_arguments(self, requests_mock, cache):
+        requests_mock.get(self.URL, json=FOO_UDP)
+        with pytest.raises(ValueError, match="argument 'bbox' is not a parameter of 'foo'"):
+            lint_benchmark_scenario(
+                _scenario("wrong", self.URL, {"bbox": {}, "spatial_extent": {}}), namespace_cache=cache
+            )
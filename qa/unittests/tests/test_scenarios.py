@@ -2,10 +2,17 @@ from pathlib import Path
 
 import jsonschema
 import pytest
+from apex_algorithm_qa_tools.namespaces import get_namespace_cache, iter_namespace_nodes
 from apex_algorithm_qa_tools.scenarios import (
     BenchmarkScenario,
+    DuplicateScenarioError,
+    ScenarioRegistry,
+    ScenarioValidationError,
+    get_benchmark_scenario_validator,
     get_benchmark_scenarios,
+    get_scenario_registry,
     lint_benchmark_scenario,
+    validate_benchmark_scenarios,
 )
 
 
@@ -14,7 +21,21 @@ def test_get_benchmark_scenarios():
     assert len(scenarios) > 0
 
 
-# TODO: tests to check uniqueness of scenario ids?
+def test_get_scenario_registry():
+    registry = get_scenario_registry()
+    # Unique scenario ids are checked on load
+    assert len(registry) > 0
+    assert get_scenario_registry() is registry
+
+
+@pytest.fixture(scope="module")
+def prefetched_namespaces():
+    """Fetch all namespace URLs of the registry at once (concurrently) before linting."""
+    get_namespace_cache().get_many(
+        node["namespace"]
+        for scenario in get_scenario_registry()
+        for _, node in iter_namespace_nodes(scenario)
+    )
 
 
 @pytest.mark.parametrize(
@@ -22,10 +43,10 @@ def test_get_benchmark_scenarios():
     [
         # Use scenario id as parameterization id to give nicer test names.
         pytest.param(uc, id=uc.id)
-        for uc in get_benchmark_scenarios()
+        for uc in get_scenario_registry()
     ],
 )
-def test_lint_scenario(scenario: BenchmarkScenario):
+def test_lint_scenario(scenario: BenchmarkScenario, prefetched_namespaces):
     lint_benchmark_scenario(scenario)
 
     assert isinstance(scenario.source, Path) and scenario.source.exists()
@@ -66,3 +87,105 @@ class TestBenchmarkScenario:
     def test_validation_missing_essentials(self):
         with pytest.raises(jsonschema.ValidationError):
             BenchmarkScenario.from_dict({})
+
+
+def test_get_benchmark_scenario_validator():
+    assert get_benchmark_scenario_validator() is get_benchmark_scenario_validator()
+
+
+class TestValidateBenchmarkScenarios:
+    def test_valid(self):
+        validate_benchmark_scenarios(
+            [
+                {"id": "foo", "type": "openeo", "backend": "openeo.test", "process_graph": {}},
+                {"id": "bar", "type": "openeo", "backend": "openeo.test", "process_graph": {}},
+            ]
+        )
+
+    def test_all_errors(self):
+        with pytest.raises(ScenarioValidationError) as exc_info:
+            validate_benchmark_scenarios(
+                [
+                    {"id": "foo", "type": "openeo", "backend": "openeo.test"},
+                    {"id": "bar", "type": "openeo", "backend": "openeo.test", "process_graph": {}},
+                    {"id": 123, "type": "openeo", "backend": "openeo.test", "process_graph": {}},
+                ],
+                source="scenarios.json",
+            )
+        error = exc_info.value
+        assert isinstance(error, jsonschema.ValidationError)
+        assert len(error.errors) == 2
+        assert str(error).startswith("2 benchmark scenario validation error(s) in scenarios.json:\n")
+        assert "- $[0]: 'process_graph' is a required property" in str(error)
+        assert "- $[2].id: 123 is not of type 'string'" in str(error)
+
+    def test_read_scenarios_file(self, tmp_path):
+        path = tmp_path / "scenarios.json"
+        path.write_text('[{"id": "foo", "type": "openeo"}, {"id": "bar", "type": "openeo"}]')
+        with pytest.raises(ScenarioValidationError, match="4 benchmark scenario validation error"):
+            BenchmarkScenario.read_scenarios_file(path)
+
+
+class TestScenarioRegistry:
+    @pytest.fixture
+    def scenarios(self) -> list:
+        return [
+            BenchmarkScenario(
+                id=id,
+                backend=backend,
+                process_graph={},
+                source=Path(f"algorithm_catalog/{org}/{algorithm}/benchmark_scenarios/{algorithm}.json"),
+            )
+            for id, backend, org, algorithm in [
+                ("foo1", "openeo.test", "foorg", "foo"),
+                ("foo2", "openeo.other", "foorg", "foo"),
+                ("bar1", "openeo.test", "foorg", "bar"),
+                ("baz1", "openeo.test", "bazorg", "baz"),
+            ]
+        ]
+
+    def test_lookup(self, scenarios):
+        registry = ScenarioRegistry(scenarios)
+        assert len(registry) == 4
+        assert registry.ids == ["foo1", "foo2", "bar1", "baz1"]
+        assert "foo2" in registry
+        assert "foo3" not in registry
+        assert registry["foo2"] is scenarios[1]
+        assert registry.get("bar1") is scenarios[2]
+        assert registry.get("foo3") is None
+        with pytest.raises(KeyError):
+            _ = registry["foo3"]
+        assert [s.id for s in registry] == ["foo1", "foo2", "bar1", "baz1"]
+
+    def test_indexes(self, scenarios):
+        registry = ScenarioRegistry(scenarios)
+        assert registry.backends == ["openeo.test", "openeo.other"]
+        assert registry.organizations == ["foorg", "bazorg"]
+        assert registry.algorithms == ["foo", "bar", "baz"]
+
+    @pytest.mark.parametrize(
+        ["filters", "expected"],
+        [
+            ({}, ["foo1", "foo2", "bar1", "baz1"]),
+            ({"backend": "openeo.test"}, ["foo1", "bar1", "baz1"]),
+            ({"organization": "foorg"}, ["foo1", "foo2", "bar1"]),
+            ({"algorithm": "foo"}, ["foo1", "foo2"]),
+            ({"backend": "openeo.test", "organization": "foorg"}, ["foo1", "bar1"]),
+            ({"backend": "openeo.other", "algorithm": "bar"}, []),
+            ({"backend": "openeo.nope"}, []),
+        ],
+    )
+    def test_filter(self, scenarios, filters, expected):
+        registry = ScenarioRegistry(scenarios)
+        assert [s.id for s in registry.filter(**filters)] == expected
+
+    def test_duplicate_ids(self, scenarios):
+        scenarios.append(BenchmarkScenario(id="foo1", backend="openeo.test", process_graph={}))
+        with pytest.raises(DuplicateScenarioError, match="Duplicate benchmark scenario id 'foo1'"):
+            ScenarioRegistry(scenarios)
+
+    def test_from_root(self, test_data_root):
+        registry = ScenarioRegistry.from_root(test_data_root)
+        assert registry.ids == ["add35", "add3555"]
+        assert registry["add35"].organization == "foorg"
+        assert registry["add35"].algorithm == "add35"
@@ -0,0 +1,138 @@
+import json
+from pathlib import Path
+
+import pytest
+from apex_algorithm_qa_tools.udp_generation import (
+    STATE_FILENAME,
+    UdpGenerator,
+    discover_generators,
+    regenerate,
+    run_generator,
+    write_process,
+)
+
+GENERATE_PY = """
+from pathlib import Path
+
+from helpers import process_id
+
+
+def generate() -> dict:
+    return {
+        "id": process_id(),
+        "description": (Path(__file__).parent / "README.md").read_text(),
+        "udf": Path("udf.py").read_text(),
+    }
+"""
+
+
+def _add_generator(project_root: Path, name: str, readme: str = "Lorem ipsum") -> Path:
+    folder = project_root / "algorithm_catalog" / "foorg" / name / "openeo_udp"
+    folder.mkdir(parents=True)
+    (folder / "generate.py").write_text(GENERATE_PY)
+    (folder / "helpers.py").write_text(f"def process_id():\n    return {name!r}\n")
+    (folder / "README.md").write_text(readme)
+    (folder / "udf.py").write_text("def apply_datacube(cube, context):\n    return cube\n")
+    return folder
+
+
+@pytest.fixture
+def project_root(tmp_path) -> Path:
+    _add_generator(tmp_path, "foo")
+    _add_generator(tmp_path, "bar")
+    return tmp_path
+
+
+def test_discover_generators(project_root):
+    generators = discover_generators(project_root)
+    assert [g.name for g in generators] == ["bar", "foo"]
+
+
+def test_get_output_path(project_root):
+    folder = project_root / "algorithm_catalog/foorg/foo/openeo_udp"
+    generator = UdpGenerator(script=folder / "generate.py")
+    assert generator.get_output_path("foo") == folder / "foo.json"
+    (folder / "foo_udp.json").write_text(json.dumps({"id": "foo"}))
+    assert generator.get_output_path("foo") == folder / "foo_udp.json"
+
+
+def test_run_generator(project_root):
+    folder = project_root / "algorithm_catalog/foorg/foo/openeo_udp"
+    result = run_generator(folder / "generate.py", project_root)
+    assert result.error is None
+    assert result.process["id"] == "foo"
+    assert set(result.inputs) == {
+        "algorithm_catalog/foorg/foo/openeo_udp/generate.py",
+        "algorithm_catalog/foorg/foo/openeo_udp/helpers.py",
+        "algorithm_catalog/foorg/foo/openeo_udp/README.md",
+        "algorithm_catalog/foorg/foo/openeo_udp/udf.py",
+    }
+
+    # Same helper module name in another generator
+    result = run_generator(project_root / "algorithm_catalog/foorg/bar/openeo_udp/generate.py", project_root)
+    assert result.process["id"] == "bar"
+
+
+def test_run_generator_error(project_root):
+    folder = project_root / "algorithm_catalog/foorg/foo/openeo_udp"
+    (folder / "udf.py").unlink()
+    result = run_generator(folder / "generate.py", project_root)
+    assert result.process is None
+    assert result.error.startswith("FileNotFoundError")
+
+
+def test_write_process(tmp_path):
+    path = tmp_path / "foo.json"
+    assert write_process({"id": "foo"}, path)
+    assert path.read_text() == '{\n  "id": "foo"\n}'
+
+    # Same content, other formatting: not written
+    path.write_text('{\n    "id": "foo"\n}\n')
+    assert not write_process({"id": "foo"}, path)
+
+    # Keep formatting of existing file
+    assert write_process({"id": "foo", "summary": "Foo"}, path)
+    assert path.read_text() == '{\n    "id": "foo",\n    "summary": "Foo"\n}\n'
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_regenerate(project_root, workers):
+    assert regenerate(project_root, workers=workers) == {"bar": "written", "foo": "written"}
+    foo_json = project_root / "algorithm_catalog/foorg/foo/openeo_udp/foo.json"
+    assert json.loads(foo_json.read_text())["description"] == "Lorem ipsum"
+    assert (project_root / STATE_FILENAME).exists()
+
+    assert regenerate(project_root, workers=workers) == {"bar": "up-to-date", "foo": "up-to-date"}
+
+    # Input change, without effect on the output
+    (project_root / "algorithm_catalog/foorg/foo/openeo_udp/generate.py").write_text(GENERATE_PY + "\n# Comment\n")
+    assert regenerate(project_root, workers=workers) == {"bar": "up-to-date", "foo": "unchanged"}
+
+    # Input change with effect on the output
+    (project_root / "algorithm_catalog/foorg/foo/openeo_udp/README.md").write_text("Dolor sit amet")
+    assert regenerate(project_root, workers=workers) == {"bar": "up-to-date", "foo": "written"}
+    assert json.loads(foo_json.read_text())["description"] == "Dolor sit amet"
+
+    assert regenerate(project_root, workers=workers, force=True) == {"bar": "unchanged", "foo": "unchanged"}
+
+
+def test_regenerate_names(project_root):
+    assert regenerate(project_root, names=["foo"]) == {"foo": "written"}
+
+
+def test_regenerate_failure(project_root):
+    (project_root / "algorithm_catalog/foorg/foo/openeo_udp/helpers.py").write_text("1/0\n")
+    statuses = regenerate(project_root, workers=2)
+    assert statuses["bar"] == "written"
+    assert statuses["foo"] == "failed: ZeroDivisionError: division by zero"
+    # Failed generators are retried on the next run
+    assert regenerate(project_root) == {"bar": "up-to-date", "foo": "failed: ZeroDivisionError: division by zero"}
+
+
+def test_regenerate_output_path(project_root):
+    """Output is written to the existing UDP file with the same id."""
+    folder = project_root / "algorithm_catalog/foorg/foo/openeo_udp"
+    (folder / "foo_udp.json").write_text(json.dumps({"id": "foo"}, indent=2) + "\n")
+    regenerate(project_root, names=["foo"])
+    assert not (folder / "foo.json").exists()
+    assert json.loads((folder / "foo_udp.json").read_text())["udf"].startswith("def apply_datacube")
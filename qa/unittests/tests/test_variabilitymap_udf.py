@@ -0,0 +1,103 @@
+import importlib.util
+
+import numpy as np
+import pytest
+import xarray
+from apex_algorithm_qa_tools.common import get_project_root
+
+VARIABILITYMAP_UDF = (
+    get_project_root() / "algorithm_catalog" / "vito" / "variabilitymap" / "openeo_udp" / "variabilitymap_udf.py"
+)
+
+MASK = 999.0
+
+
+@pytest.fixture
+def udf():
+    spec = importlib.util.spec_from_file_location("variabilitymap_udf", VARIABILITYMAP_UDF)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _fields(size: int = 12) -> np.ndarray:
+    """Field ids: a couple of fields (one with id equal to the mask value), and pixels outside the fields."""
+    fields = np.zeros((size, size), dtype=np.int64)
+    fields[:6, :6] = 1
+    fields[:6, 6:] = 999
+    fields[6:, :6] = 2**24 + 1
+    fields[6:, 6:9] = 2**24 + 2
+    fields[6:, 9:] = -1
+    return fields
+
+
+def _cube(fields: np.ndarray, times: int = 2) -> xarray.DataArray:
+    """(t, bands, y, x) cube with a value band (with masked and nan pixels) and the field id band."""
+    rng = np.random.default_rng(42)
+    values = rng.uniform(0.2, 0.8, size=(times,) + fields.shape)
+    values[:, 0, 0] = MASK
+    values[0, 1, 1] = np.nan
+    data = np.stack([values, np.broadcast_to(fields, values.shape)], axis=1)
+    return xarray.DataArray(
+        data,
+        dims=["t", "bands", "y", "x"],
+        coords={"t": np.arange(times), "bands": ["FAPAR", "fields"]},
+    )
+
+
+def test_grouped_nanmedian(udf):
+    rng = np.random.default_rng(42)
+    values = rng.uniform(0, 1, size=(20, 20)).astype(np.float32)
+    values[rng.uniform(size=values.shape) < 0.2] = np.nan
+    fields = rng.integers(-2, 6, size=values.shape).astype(np.float32)
+    fields[0, 0] = np.nan
+    # Field without valid pixels
+    fields[5, :] = 7
+    values[5, :] = np.nan
+
+    result = udf.grouped_nanmedian(values, fields)
+
+    expected = np.full(values.shape, np.nan, dtype=np.float32)
+    with np.errstate(all="ignore"):
+        for field_id in np.unique(fields[fields > 0]):
+            in_field = fields == field_id
+            valid = in_field & ~np.isnan(values)
+            if valid.any():
+                expected[valid] = np.nanmedian(values[in_field])
+    assert result.dtype == values.dtype
+    np.testing.assert_allclose(result, expected, rtol=1e-6)
+    assert np.isnan(result[fields <= 0]).all()
+    assert np.isnan(result[5, :]).all()
+
+
+@pytest.mark.parametrize("raw", [False, True])
+def test_generate_map_multi_field(udf, raw):
+    fields = _fields()
+    cube = _cube(fields)
+
+    result = udf.generate_map(cube, band="FAPAR", mask=MASK, raw=raw, field_band="fields").get_array()
+
+    assert result.dims == cube.dims
+    # Field band passed through (only cast to the float32 output)
+    np.testing.assert_array_equal(result.sel(bands="fields").values[0], fields.astype(np.float32))
+    multi = result.sel(bands="FAPAR").values
+    assert np.isnan(multi[:, fields <= 0]).all()
+    for field_id in np.unique(fields[fields > 0]):
+        # Same as a single-field run on the pixels of this field only
+        single_cube = cube.sel(bands=["FAPAR"]).where(fields == field_id, MASK)
+        single = udf.generate_map(single_cube, band="FAPAR", mask=MASK, raw=raw).get_array()
+        in_field = fields == field_id
+        assert not np.isnan(multi[:, in_field]).all()
+        np.testing.assert_allclose(multi[:, in_field], single.values[:, 0][:, in_field], rtol=1e-5)
+
+
+def test_apply_datacube_field_band(udf):
+    from openeo.udf import XarrayDataCube
+
+    cube = _cube(_fields())
+    multi = udf.apply_datacube(XarrayDataCube(cube), {"field_band": "fields"}).get_array()
+    expected = udf.generate_map(cube, band="FAPAR", mask=MASK, raw=False, field_band="fields").get_array()
+    np.testing.assert_array_equal(multi.values, expected.values)
+    # Unknown field band: single field mode
+    single = udf.apply_datacube(XarrayDataCube(cube.sel(bands=["FAPAR"])), {"field_band": "fields"}).get_array()
+    assert single.shape == (2, 1, 12, 12)
@@ -0,0 +1,135 @@
+"""
+Offline stand-in for an openEO connection, to build UDP process graphs without network access or authentication.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import openeo
+import requests
+from openeo.rest import OpenEoClientException
+
+# Cached (trimmed) collection metadata documents, one `<collection_id>.json` file per collection
+COLLECTIONS_DIR = Path(__file__).parent / "data" / "collections"
+
+# Collection metadata fields that are used to build process graphs (band names, dimensions)
+_COLLECTION_FIELDS = ["id", "cube:dimensions", "summaries"]
+_SUMMARY_FIELDS = ["eo:bands", "raster:bands"]
+
+
+def _capabilities(url: str) -> dict:
+    return {
+        "api_version": "1.2.0",
+        "backend_version": "offline",
+        "stac_version": "1.0.0",
+        "id": "offline",
+        "title": f"Offline stand-in for {url}",
+        "description": "Offline openEO connection with cached collection metadata.",
+        "endpoints": [
+            {"path": "/collections", "methods": ["GET"]},
+            {"path": "/collections/{collection_id}", "methods": ["GET"]},
+            {"path": "/processes", "methods": ["GET"]},
+            {"path": "/udf_runtimes", "methods": ["GET"]},
+            {"path": "/file_formats", "methods": ["GET"]},
+        ],
+        "links": [],
+    }
+
+
+class OfflineConnection(openeo.Connection):
+    """
+    openEO connection that answers the (GET) metadata requests needed to build process graphs
+    from cached documents, instead of from the back-end:
+
+    - capabilities, UDF runtimes and file formats: static minimal documents
+    - collection metadata: the cached documents in `collections_dir` (see `record_collection_metadata`)
+
+    Any other request (e.g. job management, synchronous processing) fails with an `OpenEoClientException`.
+    Authentication is a no-op, so generators can keep calling `authenticate_oidc()`.
+
+    Usage (in a `generate.py` script)::
+
+        connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
+        cube = connection.load_collection("SENTINEL2_L2A", bands=["B04", "B08"])
+    """
+
+    def __init__(self, url: str = "openeofed.dataspace.copernicus.eu", collections_dir: Optional[Path] = None):
+        self._collections_dir = Path(collections_dir or COLLECTIONS_DIR)
+        self._documents = {
+            "/": _capabilities(url),
+            "/udf_runtimes": {"Python": {"type": "language", "default": "3", "versions": {"3": {"libraries": {}}}}},
+            "/file_formats": {"input": {}, "output": {}},
+            "/processes": {"processes": [], "links": []},
+        }
+        super().__init__(url)
+
+    @classmethod
+    def version_discovery(cls, url: str, session: Optional[requests.Session] = None, **kwargs) -> str:
+        # No well-known document lookup: use the url as is
+        return url
+
+    def authenticate_oidc(self, *args, **kwargs) -> OfflineConnection:
+        return self
+
+    def authenticate_basic(self, *args, **kwargs) -> OfflineConnection:
+        return self
+
+    def _get_document(self, path: str) -> dict:
+        if path in self._documents:
+            return self._documents[path]
+        if path == "/collections":
+            return {
+                "collections": [
+                    self._get_document(f"/collections/{p.stem}") for p in sorted(self._collections_dir.glob("*.json"))
+                ],
+                "links": [],
+            }
+        if path.startswith("/collections/") and path.count("/") == 2:
+            collection_path = self._collections_dir / f"{path.split('/')[2]}.json"
+            if collection_path.exists():
+                return json.loads(collection_path.read_text(encoding="utf8"))
+            raise OpenEoClientException(
+                f"No cached metadata for collection {path.split('/')[2]!r} in {self._collections_dir}"
+                " (see `record_collection_metadata`)"
+            )
+        raise OpenEoClientException(f"Request {path!r} is not supported by the offline connection")
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        if method.upper() != "GET":
+            raise OpenEoClientException(f"Request {method} {path!r} is not supported by the offline connection")
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.build_url(path)
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(self._get_document(path)).encode("utf8")
+        return response
+
+
+def trim_collection_metadata(metadata: dict) -> dict:
+    """Only keep the collection metadata fields that are used to build process graphs."""
+    trimmed = {k: metadata[k] for k in _COLLECTION_FIELDS if k in metadata}
+    if "summaries" in trimmed:
+        trimmed["summaries"] = {k: v for k, v in trimmed["summaries"].items() if k in _SUMMARY_FIELDS}
+    return trimmed
+
+
+def record_collection_metadata(
+    connection: openeo.Connection,
+    collection_ids: Iterable[str],
+    collections_dir: Union[Path, str, None] = None,
+) -> None:
+    """
+    (Re)fill the offline collection metadata cache from a real back-end connection, e.g.::
+
+        record_collection_metadata(openeo.connect("openeofed.dataspace.copernicus.eu"), ["SENTINEL2_L2A"])
+    """
+    collections_dir = Path(collections_dir or COLLECTIONS_DIR)
+    collections_dir.mkdir(parents=True, exist_ok=True)
+    for collection_id in collection_ids:
+        metadata = trim_collection_metadata(dict(connection.describe_collection(collection_id)))
+        with open(collections_dir / f"{collection_id}.json", "w", encoding="utf8") as f:
+            json.dump(metadata, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,73 @@
+import json
+
+import openeo
+import pytest
+from openeo.rest import OpenEoClientException
+
+from esa_apex_toolbox.offline import (
+    OfflineConnection,
+    record_collection_metadata,
+    trim_collection_metadata,
+)
+
+
+class TestOfflineConnection:
+    def test_load_collection(self):
+        connection = OfflineConnection("openeofed.dataspace.copernicus.eu")
+        cube = connection.load_collection("SENTINEL2_L2A", bands=["B04", "B08"], max_cloud_cover=10)
+        assert cube.metadata.band_names == ["B04", "B08"]
+        b08 = cube.band("B08")
+        assert b08.flat_graph()["reducedimension1"]["arguments"]["reducer"]["process_graph"]["arrayelement1"][
+            "arguments"
+        ]["index"] == 1
+
+    def test_authenticate_is_noop(self):
+        connection = OfflineConnection()
+        assert connection.authenticate_oidc() is connection
+
+    def test_list_collection_ids(self):
+        assert set(OfflineConnection().list_collection_ids()) >= {"SENTINEL1_GRD", "SENTINEL2_L2A"}
+
+    def test_udf_runtime(self):
+        udf = openeo.UDF("def apply_datacube(cube, context):\n    return cube\n")
+        cube = OfflineConnection().load_collection("SENTINEL2_L2A", bands=["B04"]).apply(udf)
+        assert cube.flat_graph()["apply1"]["arguments"]["process"]["process_graph"]["runudf1"]["arguments"][
+            "runtime"
+        ] == "Python"
+
+    def test_unknown_collection(self):
+        with pytest.raises(OpenEoClientException, match="No cached metadata for collection 'FOOBAR'"):
+            OfflineConnection().load_collection("FOOBAR")
+
+    def test_no_processing(self):
+        cube = OfflineConnection().load_collection("SENTINEL2_L2A", bands=["B04"])
+        with pytest.raises(OpenEoClientException, match="not supported by the offline connection"):
+            cube.execute()
+
+    def test_collections_dir(self, tmp_path):
+        (tmp_path / "FOO.json").write_text(
+            json.dumps({"id": "FOO", "cube:dimensions": {"bands": {"type": "bands", "values": ["a", "b"]}}})
+        )
+        cube = OfflineConnection(collections_dir=tmp_path).load_collection("FOO")
+        assert cube.metadata.band_names == ["a", "b"]
+
+
+def test_trim_collection_metadata():
+    metadata = {
+        "id": "FOO",
+        "description": "Lorem ipsum",
+        "cube:dimensions": {"bands": {"type": "bands", "values": ["a"]}},
+        "summaries": {"eo:bands": [{"name": "a"}], "platform": ["sentinel-2a"]},
+        "links": [],
+    }
+    assert trim_collection_metadata(metadata) == {
+        "id": "FOO",
+        "cube:dimensions": {"bands": {"type": "bands", "values": ["a"]}},
+        "summaries": {"eo:bands": [{"name": "a"}]},
+    }
+
+
+def test_record_collection_metadata(tmp_path):
+    record_collection_metadata(OfflineConnection(), ["SENTINEL1_GRD"], collections_dir=tmp_path)
+    recorded = json.loads((tmp_path / "SENTINEL1_GRD.json").read_text())
+    assert recorded["cube:dimensions"]["bands"]["values"] == ["VV", "VH", "HV", "HH"]
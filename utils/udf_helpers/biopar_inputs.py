@@ -0,0 +1,70 @@
+"""
+Shared input/output handling of the BioPAR UDF (`biopar_udf.py`).
+
+UDFs are shipped as a single code string, so the `generate.py` scripts prepend this file
+to the UDF code.
+
+The bands and the geometry cosines are written straight into one preallocated (6, pixels)
+float32 array: the band selections are views on the input chunk, so the only copy
+of the data is the input array of `BioParNp.run` itself.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import xarray as xr
+
+# Scaling of the Sentinel-2 digital numbers to reflectances
+BIOPAR_BAND_SCALING = 0.0001
+BIOPAR_REFLECTANCE_BANDS = ["B03", "B04", "B08"]
+
+
+def get_biopar_inputs(cube: xr.DataArray) -> tuple:
+    """
+    Build the input array of `BioParNp.run`: the scaled B03, B04 and B08 reflectances
+    and the cosines of the view zenith, sun zenith and relative azimuth angles.
+
+    :param cube: Data cube with (at least) the reflectance and angle bands along the "bands" dimension
+    :return: (6, pixels) float32 input array and (pixels,) boolean nodata mask
+    """
+    template = cube.sel(bands="viewZenithMean")
+    inputs = np.empty((6, template.size), dtype=np.float32)
+    # Reshaping the contiguous rows gives views with the spatial shape of the chunk
+    rows = inputs.reshape((6,) + template.shape)
+
+    def band(name: str) -> np.ndarray:
+        return cube.sel(bands=name).values
+
+    for row, name in zip(rows, BIOPAR_REFLECTANCE_BANDS):
+        np.multiply(band(name), BIOPAR_BAND_SCALING, out=row, casting="same_kind")
+    np.radians(template.values, out=rows[3], casting="same_kind")
+    np.radians(band("sunZenithAngles"), out=rows[4], casting="same_kind")
+    np.subtract(band("sunAzimuthAngles"), band("viewAzimuthMean"), out=rows[5], casting="same_kind")
+    np.radians(rows[5], out=rows[5])
+    np.cos(inputs[3:], out=inputs[3:])
+
+    return inputs, np.isnan(inputs[0])
+
+
+def to_biopar_array(
+    image: np.ndarray, nodata: np.ndarray, cube: xr.DataArray, labels: Optional[List[str]] = None
+) -> xr.DataArray:
+    """
+    Wrap the flat `BioParNp.run` output as a DataArray with the spatial dimensions of the cube,
+    with nan at the nodata pixels (set in place, through a boolean mask).
+
+    With `labels`, `image` is a (parameters, pixels) stack, which is returned along a "bands"
+    dimension with these labels (at the position of the "bands" dimension of the cube).
+    """
+    image[..., nodata] = np.nan
+    template = cube.sel(bands="viewZenithMean")
+    if labels is None:
+        return xr.DataArray(image.reshape(template.shape), dims=template.dims, coords=template.coords)
+
+    band_axis = cube.dims.index("bands")
+    data = np.moveaxis(image.reshape((len(labels),) + template.shape), 0, band_axis)
+    dims = list(template.dims)
+    dims.insert(band_axis, "bands")
+    coords = {name: coord for name, coord in template.coords.items() if name != "bands"}
+    coords["bands"] = labels
+    return xr.DataArray(data, dims=dims, coords=coords)
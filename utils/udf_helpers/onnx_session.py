@@ -0,0 +1,211 @@
+"""
+Shared helpers to create ONNX runtime inference sessions in openEO UDFs.
+
+UDFs are shipped as a single code string, so the `generate.py` scripts prepend this file
+to the UDF code. The session setup is driven by the "onnx_session_options" entry of the
+UDF context, e.g.:
+
+    context = {
+        "onnx_session_options": {
+            "intra_op_num_threads": 2,
+            "graph_optimization_level": "extended",
+            "optimized_model_dir": "/tmp/onnx_cache",
+        }
+    }
+
+Under Spark, many Python UDF processes share one node (one per executor core),
+so by default each session is limited to a single thread. A UDF can pass other defaults
+to `OnnxSessionSettings.from_context` (e.g. 0 threads: the onnxruntime default of all cores).
+
+Note that `onnxruntime` is only imported when creating sessions, because UDFs
+typically make it importable (e.g. from a dependency archive) after this code runs.
+"""
+
+import dataclasses
+import functools
+import hashlib
+import os
+from typing import Optional
+
+from openeo.udf import inspect
+
+GRAPH_OPTIMIZATION_LEVELS = ["disable", "basic", "extended", "all"]
+
+
+@dataclasses.dataclass(frozen=True)
+class OnnxSessionSettings:
+    """Hashable ONNX runtime session settings, to use as `lru_cache` key."""
+
+    intra_op_num_threads: int = 1
+    inter_op_num_threads: int = 1
+    graph_optimization_level: str = "all"
+    enable_mem_pattern: bool = True
+    enable_cpu_mem_arena: bool = True
+    # Directory to cache optimized models, to skip graph optimization in later processes.
+    # Should be node-local (e.g. under /tmp): "all" optimizations can be hardware specific.
+    optimized_model_dir: Optional[str] = None
+
+    @classmethod
+    def from_context(cls, context: Optional[dict], **defaults) -> "OnnxSessionSettings":
+        """
+        Build the settings from the "onnx_session_options" entry of the UDF context.
+
+        :param defaults: Default settings of the UDF, overridden by the context options
+        """
+        options = {**defaults, **((context or {}).get("onnx_session_options") or {})}
+        unknown = set(options).difference(f.name for f in dataclasses.fields(cls))
+        if unknown:
+            raise ValueError(f"Unknown ONNX session options: {sorted(unknown)}")
+        settings = cls(**options)
+        if settings.graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                f"Invalid graph_optimization_level {settings.graph_optimization_level!r}:"
+                f" should be one of {GRAPH_OPTIMIZATION_LEVELS}"
+            )
+        return settings
+
+    def to_session_options(
+        self,
+        graph_optimization_level: Optional[str] = None,
+        use_global_thread_pool: bool = False,
+        config_entries: Optional[dict] = None,
+    ):
+        """
+        Build `onnxruntime.SessionOptions` from these settings.
+
+        :param graph_optimization_level: Override of the graph optimization level
+        :param use_global_thread_pool: Use the process-wide thread pools instead of per-session ones
+            (which must be set up beforehand, e.g. with `init_global_thread_pool`)
+        :param config_entries: Additional session config entries
+        """
+        import onnxruntime as ort
+
+        levels = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }
+        options = ort.SessionOptions()
+        if use_global_thread_pool:
+            options.use_per_session_threads = False
+        else:
+            options.intra_op_num_threads = self.intra_op_num_threads
+            options.inter_op_num_threads = self.inter_op_num_threads
+        options.graph_optimization_level = levels[graph_optimization_level or self.graph_optimization_level]
+        options.enable_mem_pattern = self.enable_mem_pattern
+        options.enable_cpu_mem_arena = self.enable_cpu_mem_arena
+        for key, value in (config_entries or {}).items():
+            options.add_session_config_entry(key, value)
+        return options
+
+
+def init_global_thread_pool(settings: OnnxSessionSettings) -> bool:
+    """
+    Size the process-wide ONNX runtime thread pools to the thread budget of the settings.
+
+    :return: True if sessions can use the global thread pools
+    """
+    import onnxruntime as ort
+
+    # Not part of the public onnxruntime API: only rely on it when available
+    set_global_thread_pool_sizes = getattr(
+        getattr(ort.capi, "_pybind_state", None), "set_global_thread_pool_sizes", None
+    )
+    if set_global_thread_pool_sizes is None:
+        inspect(message="ONNX runtime without global thread pool support, using per-session threads")
+        return False
+    try:
+        set_global_thread_pool_sizes(settings.intra_op_num_threads, settings.inter_op_num_threads)
+        return True
+    except Exception as e:
+        if "already been created" in str(e):
+            # Global thread pools were already created in this process (e.g. by a previous UDF): reuse them
+            return True
+        inspect(message=f"Failed to set up global ONNX thread pools, using per-session threads: {e!r}")
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def register_shared_allocator() -> bool:
+    """
+    Register one CPU arena allocator in the ONNX runtime environment, to be shared by all sessions
+    of the process that set the "session.use_env_allocators" config entry (instead of one arena per session).
+    The registration is done once per process: the result is cached.
+
+    :return: True if the shared allocator is available
+    """
+    import onnxruntime as ort
+
+    try:
+        memory_info = ort.OrtMemoryInfo("Cpu", ort.OrtAllocatorType.ORT_ARENA_ALLOCATOR, 0, ort.OrtMemType.DEFAULT)
+        ort.create_and_register_allocator(memory_info, ort.OrtArenaCfg(0, -1, -1, -1))
+        return True
+    except Exception as e:
+        if "already been registered" in str(e):
+            # Registered before in this process (e.g. by a previous UDF): sessions can share it
+            return True
+        inspect(message=f"Shared ONNX allocator not available, using per-session arenas: {e!r}")
+        return False
+
+
+def get_optimized_model_path(model_path: str, settings: OnnxSessionSettings) -> str:
+    """
+    Path of the cached optimized model: keyed on the model file (path, size and modification time),
+    the optimization level and the ONNX runtime version.
+    """
+    import onnxruntime as ort
+
+    stat = os.stat(model_path)
+    key = "|".join(
+        [
+            os.path.abspath(model_path),
+            str(stat.st_size),
+            str(stat.st_mtime_ns),
+            settings.graph_optimization_level,
+            ort.__version__,
+        ]
+    )
+    digest = hashlib.sha256(key.encode("utf8")).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(settings.optimized_model_dir, f"{name}-{digest}.onnx")
+
+
+def create_onnx_session(
+    model_path: str,
+    settings: OnnxSessionSettings,
+    use_global_thread_pool: bool = False,
+    config_entries: Optional[dict] = None,
+):
+    """
+    Create an ONNX runtime inference session for the given model.
+
+    When `settings.optimized_model_dir` is set, the graph-optimized model is stored there
+    on first use and loaded as-is (without optimization pass) by later sessions/processes.
+
+    :param model_path: Path to the ONNX model file
+    :param settings: Session settings
+    :param use_global_thread_pool: Use the process-wide thread pools (see `init_global_thread_pool`)
+    :param config_entries: Additional session config entries
+    :return: Inference session
+    """
+    import onnxruntime as ort
+
+    options_kwargs = {"use_global_thread_pool": use_global_thread_pool, "config_entries": config_entries}
+    if not settings.optimized_model_dir or settings.graph_optimization_level == "disable":
+        return ort.InferenceSession(model_path, sess_options=settings.to_session_options(**options_kwargs))
+
+    optimized_path = get_optimized_model_path(model_path, settings)
+    if os.path.exists(optimized_path):
+        options = settings.to_session_options(graph_optimization_level="disable", **options_kwargs)
+        return ort.InferenceSession(optimized_path, sess_options=options)
+
+    # Write to process-specific file first, so concurrent processes never see a partial model
+    os.makedirs(settings.optimized_model_dir, exist_ok=True)
+    tmp_path = f"{optimized_path}.{os.getpid()}.tmp"
+    options = settings.to_session_options(**options_kwargs)
+    options.optimized_model_filepath = tmp_path
+    session = ort.InferenceSession(model_path, sess_options=options)
+    if os.path.exists(tmp_path):
+        os.replace(tmp_path, optimized_path)
+    return session